@@ -5,7 +5,7 @@
 'use client';
 
 import { useState, useEffect, useRef } from 'react';
-import { Repository, QodexChatResponse, ChatMessage } from '@/types';
+import { Repository, QodexChatResponse, ChatMessage, QodexChatHistoryResponse } from '@/types';
 import { useAuth } from '@/hooks/useAuth';
 import { canSendMessage } from '@/lib/quota';
 import { AlertCircle, Send, Crown } from 'lucide-react';
@@ -20,6 +20,8 @@ interface ChatInterfaceProps {
   repository: Repository;
 }
 
+const HISTORY_PAGE_SIZE = 50;
+
 export default function ChatInterface({ repository }: ChatInterfaceProps) {
   const { user, userProfile } = useAuth();
   const [messages, setMessages] = useState<ChatMessage[]>([]);
@@ -29,6 +31,8 @@ export default function ChatInterface({ repository }: ChatInterfaceProps) {
   const [canSend, setCanSend] = useState(true);
   const [showScrollButton, setShowScrollButton] = useState(false);
   const [conversationId, setConversationId] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [isNewRepository, setIsNewRepository] = useState(false);
   const [showQuote, setShowQuote] = useState(true);
   const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -51,6 +55,7 @@ export default function ChatInterface({ repository }: ChatInterfaceProps) {
       setMessages([]);
       setMessageCount(0);
       setConversationId(null);
+      setNextCursor(null);
       setShowQuote(true);
       setLoadingMessages(true);
 
@@ -146,41 +151,53 @@ export default function ChatInterface({ repository }: ChatInterfaceProps) {
     return () => clearTimeout(timer);
   }, [messages]); 
 
+  const fetchHistoryPage = async (cursor?: string | null): Promise<Response> => {
+    const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE.toString() });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+
+    return fetch(`${process.env.NEXT_PUBLIC_QODEX_API_URL}/api/v1/chat/${repository.repository_id}/messages?${params}`, {
+      headers: {
+        'X-Client-Secret': process.env.NEXT_PUBLIC_QODEX_CLIENT_SECRET!,
+        'X-User-ID': user!.$id,
+      },
+    });
+  };
+
+  const formatHistoryMessages = (chatData: QodexChatHistoryResponse): ChatMessage[] =>
+    chatData.messages.map((msg: any) => ({
+      id: msg.id.toString(),
+      role: msg.role,
+      content: msg.content,
+      sources: msg.citations || msg.sources || [],
+      timestamp: new Date(msg.created_at),
+    }));
+
   const loadChatHistory = async () => {
     setLoadingMessages(true);
     try {
       console.log('🔄 Loading chat history for repository:', repository.repository_id);
 
-      const response = await fetch(`${process.env.NEXT_PUBLIC_QODEX_API_URL}/api/v1/chat/${repository.repository_id}/messages`, {
-        headers: {
-          'X-Client-Secret': process.env.NEXT_PUBLIC_QODEX_CLIENT_SECRET!,
-          'X-User-ID': user!.$id,
-        },
-      });
+      const response = await fetchHistoryPage();
 
       if (response.ok) {
-        const chatData = await response.json();
+        const chatData: QodexChatHistoryResponse = await response.json();
         console.log('✅ Chat history loaded:', chatData);
 
         if (chatData.conversation_id) {
           setConversationId(chatData.conversation_id);
         }
+        setNextCursor(chatData.next_cursor);
 
         if (chatData.messages && chatData.messages.length > 0) {
-          const formattedMessages: ChatMessage[] = chatData.messages.map((msg: any) => ({
-            id: msg.id.toString(),
-            role: msg.role,
-            content: msg.content,
-            sources: msg.citations || msg.sources || [],
-            timestamp: new Date(msg.created_at),
-          }));
+          const formattedMessages = formatHistoryMessages(chatData);
 
           setMessages(formattedMessages);
-          const userMessages = formattedMessages.filter(msg => msg.role === 'user');
-          setMessageCount(userMessages.length);
+          setMessageCount(chatData.user_message_count);
           setShowQuote(false);
 
-          console.log(`📊 Loaded ${formattedMessages.length} messages, ${userMessages.length} from user`);
+          console.log(`📊 Loaded ${formattedMessages.length} of ${chatData.total_messages} messages, ${chatData.user_message_count} from user`);
         } else {
           setShowQuote(true);
         }
@@ -196,6 +213,28 @@ export default function ChatInterface({ repository }: ChatInterfaceProps) {
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!nextCursor || loadingOlder) return;
+
+    setLoadingOlder(true);
+    try {
+      const response = await fetchHistoryPage(nextCursor);
+
+      if (response.ok) {
+        const chatData: QodexChatHistoryResponse = await response.json();
+        const olderMessages = formatHistoryMessages(chatData);
+        setMessages(prev => [...olderMessages, ...prev]);
+        setNextCursor(chatData.next_cursor);
+      } else {
+        console.warn('❌ Failed to load older messages:', response.status);
+      }
+    } catch (error) {
+      console.error('❌ Error loading older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const handleSendMessage = async () => {
     const inputValue = inputRef.current?.value || '';
     if (!inputValue.trim() || loading || !canSend) return;
@@ -425,6 +464,18 @@ export default function ChatInterface({ repository }: ChatInterfaceProps) {
           </div>
         )}
 
+        {nextCursor && (
+          <div className="flex justify-center">
+            <button
+              onClick={loadOlderMessages}
+              disabled={loadingOlder}
+              className="text-xs md:text-sm text-gray-600 dark:text-white/60 hover:text-gray-900 dark:hover:text-white border border-gray-300 dark:border-white/20 rounded-full px-4 py-1.5 transition-colors disabled:opacity-50"
+            >
+              {loadingOlder ? 'Loading…' : 'Load earlier messages'}
+            </button>
+          </div>
+        )}
+
         {messages.map((message) => (
           <div key={message.id} className={`flex ${message.role === 'user' ? 'justify-end' : 'justify-start'}`}>
             <div className={`max-w-[90%] md:max-w-[calc(100%-2rem)] ${message.role === 'user'
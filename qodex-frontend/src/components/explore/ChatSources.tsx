@@ -10,6 +10,7 @@ interface Source {
   similarity?: number;
   preview?: string;
   content?: string;
+  aliases?: string[];
 }
 
 interface ChatSourcesProps {
@@ -48,6 +49,14 @@ export default function ChatSources({ sources }: ChatSourcesProps) {
                 <span className="text-xs text-gray-500 dark:text-white/50 whitespace-nowrap">
                   Lines {source.start_line || 0}-{source.end_line || 0}
                 </span>
+                {source.aliases && source.aliases.length > 0 && (
+                  <span
+                    className="text-xs text-gray-500 dark:text-white/50 whitespace-nowrap"
+                    title={source.aliases.join('\n')}
+                  >
+                    +{source.aliases.length} identical {source.aliases.length === 1 ? 'copy' : 'copies'}
+                  </span>
+                )}
               </div>
               <button
                 onClick={() => copyToClipboard(source.preview || source.content || '', index)}
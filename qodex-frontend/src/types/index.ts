@@ -101,6 +101,8 @@ export interface QodexChatResponse {
     content?: string;
     preview?: string;
     similarity: number;
+    aliases?: string[];
+    match?: 'vector' | 'keyword' | 'both';
   }>;
   repository_name: string;
   context_chunks_used: number;
@@ -119,6 +121,8 @@ export interface ChatMessage {
     content?: string;
     preview?: string;
     similarity: number;
+    aliases?: string[];
+    match?: 'vector' | 'keyword' | 'both';
   }>;
   timestamp: Date;
   model_used?: string;
@@ -126,8 +130,9 @@ export interface ChatMessage {
 }
 
 export interface QodexChatHistoryResponse {
-  conversation_id: number;
+  conversation_id: number | null;
   repository_id: number;
+  repository_name?: string;
   user_id: string;
   messages: Array<{
     role: 'user' | 'assistant';
@@ -138,12 +143,16 @@ export interface QodexChatHistoryResponse {
       end_line: number;
       similarity: number;
       preview: string;
+      aliases?: string[];
+      match?: 'vector' | 'keyword' | 'both';
     }> | null;
     id: number;
     content: string;
     created_at: string;
   }>;
+  next_cursor: string | null;
   total_messages: number;
+  user_message_count: number;
 }
 
 export interface RepositoryUploadProps {
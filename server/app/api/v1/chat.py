@@ -1,18 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from app.core.database import get_db, AsyncSessionLocal
 from app.models.repository import Repository, RepositoryStatusEnum
 from app.models.conversation import Conversation, Message
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.registry import get_embedding_service, get_vector_service, get_chat_service, get_query_cache, get_reranker
 from app.services import EmbeddingService, VectorService, ChatService
+from app.services.embedding_pool import EmbeddingPoolBusy
+from app.services.query_cache import QueryCache
+from app.services.reranker import Reranker
+from app.utils.pagination import DEFAULT_PAGE_SIZE, clamp_limit, keyset_before, page_of
 from pydantic import BaseModel
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+first_token_seconds = metrics.histogram("chat_stream_first_token_seconds", "Time from request to the first streamed answer token")
+stream_seconds = metrics.histogram("chat_stream_seconds", "Total duration of streamed chat responses")
+stage_seconds = {
+    stage: metrics.histogram(f"chat_stage_seconds.{stage}", f"Time spent in the {stage} stage of chat retrieval")
+    for stage in ("embed", "search", "rerank")
+}
+
 class ChatRequest(BaseModel):
     """Request model for chat with repository"""
     query: str
@@ -26,6 +43,7 @@ class ChatResponse(BaseModel):
     context_chunks_used: int
     model_used: str
     success: bool
+    timings: Optional[dict] = None
 
 def verify_client_secret(x_client_secret: str = Header(..., alias="X-Client-Secret")):
     """Verify request comes from authorized Next.js client"""
@@ -42,30 +60,22 @@ def get_user_id(x_user_id: str = Header(..., alias="X-User-ID")):
         raise HTTPException(status_code=400, detail="User ID required")
     return x_user_id.strip()
 
-def verify_repository_ownership(repository_id: int, user_id: str, db: Session):
+async def verify_repository_ownership(repository_id: int, user_id: str, db: AsyncSession):
     """Verify user owns the repository"""
-    repository = db.query(Repository).filter(
+    repository = await db.scalar(select(Repository).where(
         Repository.id == repository_id,
         Repository.user_id == user_id
-    ).first()
+    ))
     
     if not repository:
         raise HTTPException(status_code=404, detail="Repository not found or access denied")
     
     return repository
 
-@router.post("/", response_model=ChatResponse)
-async def chat_with_repository(
-    request: ChatRequest,
-    db: Session = Depends(get_db),
-    user_id: str = Depends(get_user_id),
-    _: bool = Depends(verify_client_secret)
-):
-    """Chat with a repository using QODEX AI"""
-    logger.info(f"💬 QODEX Chat: '{request.query[:60]}...' for repo {request.repository_id} (user: {user_id})")
-    
-    repository = verify_repository_ownership(request.repository_id, user_id, db)
-    
+NO_RESULTS_MESSAGE = "I couldn't find any relevant code chunks for your question. Try asking about something more specific to this repository, or check if the repository was processed correctly."
+
+def ensure_repository_ready(repository: Repository):
+    """Reject chat on repositories that are not indexed yet"""
     if repository.status != RepositoryStatusEnum.READY:
         status_messages = {
             RepositoryStatusEnum.PENDING: "Repository is pending processing. Please wait.",
@@ -76,77 +86,177 @@ async def chat_with_repository(
             status_code=400, 
             detail=status_messages.get(repository.status, "Repository not ready for chat")
         )
+
+async def retrieve_chunks(
+    query: str,
+    repository: Repository,
+    embedding_service: EmbeddingService,
+    vector_service: VectorService,
+    query_cache: Optional[QueryCache],
+    reranker: Optional[Reranker] = None,
+    top_k: Optional[int] = None
+) -> Tuple[List[dict], Optional[str], dict]:
+    """Embed the query, fetch candidates through the retrieval cache and re-rank them.
+
+    Without a reranker the top_k retrieved chunks are used as they are.
+    Returns the chunks, the cache version to key the answer cache with, and
+    per-stage timings.
+    """
+    top_k = top_k or settings.rerank_top_k
+    timings = {}
+    
+    logger.info(f"🔍 Generating embedding for query...")
+    stage_started = time.perf_counter()
+    query_embedding = await embedding_service.generate_query_embedding(query)
+    timings['embed_ms'] = record_stage("embed", stage_started)
+    
+    cache_version = await query_cache.repository_version(repository) if query_cache else None
+    # Over-fetch when a reranker will pick the best of the candidates
+    depth = max(top_k, settings.rerank_candidates) if reranker else top_k
+    
+    stage_started = time.perf_counter()
+    similar_chunks = None
+    if query_cache:
+        mode = "hybrid" if settings.hybrid_search_enabled else "vector"
+        retrieval_key = query_cache.retrieval_key(repository.id, cache_version, query_embedding, depth, mode)
+        similar_chunks = await query_cache.get_retrieval(retrieval_key)
+    
+    if similar_chunks is None:
+        logger.info(f"🔎 Searching for relevant code chunks...")
+        similar_chunks = await vector_service.hybrid_search(
+            namespace=VectorService.namespace_for(repository),
+            query=query,
+            query_embedding=query_embedding,
+            top_k=depth
+        )
+        if query_cache and similar_chunks:
+            await query_cache.set_retrieval(retrieval_key, similar_chunks)
+    else:
+        logger.info(f"⚡ Retrieval cache hit for repo {repository.id}")
+    # Full chunk text is looked up after the cache so cached retrievals stay small
+    similar_chunks = await vector_service.hydrate(similar_chunks or [])
+    timings['search_ms'] = record_stage("search", stage_started)
+    
+    if reranker and similar_chunks:
+        stage_started = time.perf_counter()
+        try:
+            similar_chunks, rerank_timings = await reranker.rerank(query, similar_chunks, top_k)
+            timings.update(rerank_timings)
+            logger.info(f"🎯 Re-ranked {rerank_timings['rerank_scored']}/{rerank_timings['rerank_candidates']} candidates, kept {len(similar_chunks)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Re-ranking failed, using retrieval order: {e}")
+            similar_chunks = similar_chunks[:top_k]
+        timings['rerank_ms'] = record_stage("rerank", stage_started)
+    else:
+        similar_chunks = similar_chunks[:top_k]
     
+    return similar_chunks, cache_version, timings
+
+def record_stage(stage: str, started: float) -> float:
+    """Observe a retrieval stage and return its duration in milliseconds"""
+    elapsed = time.perf_counter() - started
+    stage_seconds[stage].observe(elapsed)
+    return round(elapsed * 1000, 1)
+
+def is_cacheable_answer(ai_response: dict) -> bool:
+    # Only real model answers are worth replaying; fallbacks may succeed next time
+    return ai_response['success'] and ai_response['model_used'] not in ('fallback', 'quota_exceeded', 'no_results')
+
+async def save_chat_messages(db: AsyncSession, repository_id: int, repository_name: str, query: str, ai_response: dict, user_id: str):
+    """Append the question and answer to the repository's conversation"""
     try:
-        embedding_service = EmbeddingService()
-        vector_service = VectorService()
-        chat_service = ChatService()
+        conversation = await db.scalar(select(Conversation).where(
+            Conversation.repository_id == repository_id
+        ).limit(1))
         
-        logger.info(f"🔍 Generating embedding for query...")
-        query_embedding = await embedding_service.generate_query_embedding(request.query)
+        if not conversation:
+            conversation = Conversation(
+                repository_id=repository_id,
+                title=f"Chat about {repository_name}"
+            )
+            db.add(conversation)
+            await db.flush()
         
-        logger.info(f"🔎 Searching for relevant code chunks...")
-        similar_chunks = await vector_service.search_similar_code(
-            repository_id=request.repository_id,
-            query_embedding=query_embedding,
-            top_k=5
+        user_message = Message(
+            conversation_id=conversation.id,
+            role="user",
+            content=query
+        )
+        db.add(user_message)
+        
+        assistant_message = Message(
+            conversation_id=conversation.id,
+            role="assistant",
+            content=ai_response['response'],
+            citations=ai_response['sources']
+        )
+        db.add(assistant_message)
+        
+        await db.commit()
+        logger.info(f"💾 Saved conversation for repo {repository_id} (user: {user_id})")
+        
+    except Exception as save_error:
+        await db.rollback()
+        logger.warning(f"⚠️ Failed to save conversation: {save_error}")
+
+@router.post("/", response_model=ChatResponse)
+async def chat_with_repository(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_id),
+    _: bool = Depends(verify_client_secret),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    chat_service: ChatService = Depends(get_chat_service),
+    query_cache: Optional[QueryCache] = Depends(get_query_cache),
+    reranker: Optional[Reranker] = Depends(get_reranker)
+):
+    """Chat with a repository using QODEX AI"""
+    logger.info(f"💬 QODEX Chat: '{request.query[:60]}...' for repo {request.repository_id} (user: {user_id})")
+    
+    repository = await verify_repository_ownership(request.repository_id, user_id, db)
+    ensure_repository_ready(repository)
+    
+    try:
+        similar_chunks, cache_version, timings = await retrieve_chunks(
+            request.query, repository, embedding_service, vector_service, query_cache, reranker
         )
         
         if not similar_chunks:
             logger.warning(f"⚠️ No relevant chunks found for query in repo {request.repository_id}")
             return ChatResponse(
-                response="I couldn't find any relevant code chunks for your question. Try asking about something more specific to this repository, or check if the repository was processed correctly.",
+                response=NO_RESULTS_MESSAGE,
                 sources=[],
                 repository_name=repository.name,
                 context_chunks_used=0,
                 model_used="no_results",
-                success=False
+                success=False,
+                timings=timings
             )
         
         logger.info(f"✅ Found {len(similar_chunks)} relevant code chunks")
         
-        logger.info(f"🤖 Generating AI response with Gemini...")
-        ai_response = await chat_service.generate_response(
-            query=request.query,
-            code_chunks=similar_chunks,
-            repository_name=repository.name
-        )
+        ai_response = None
+        if query_cache:
+            answer_key = query_cache.answer_key(request.repository_id, cache_version, request.query, similar_chunks)
+            ai_response = await query_cache.get_answer(answer_key)
+            if ai_response:
+                logger.info(f"⚡ Answer cache hit for repo {request.repository_id}")
+        
+        if ai_response is None:
+            logger.info(f"🤖 Generating AI response with Gemini...")
+            generation_started = time.perf_counter()
+            ai_response = await chat_service.generate_response(
+                query=request.query,
+                code_chunks=similar_chunks,
+                repository_name=repository.name
+            )
+            timings['generation_ms'] = round((time.perf_counter() - generation_started) * 1000, 1)
+            if query_cache and is_cacheable_answer(ai_response):
+                await query_cache.set_answer(answer_key, ai_response)
         
         if ai_response['success']:
-            try:
-                conversation = db.query(Conversation).filter(
-                    Conversation.repository_id == request.repository_id
-                ).first()
-                
-                if not conversation:
-                    conversation = Conversation(
-                        repository_id=request.repository_id,
-                        title=f"Chat about {repository.name}"
-                    )
-                    db.add(conversation)
-                    db.commit()
-                    db.refresh(conversation)
-                
-                user_message = Message(
-                    conversation_id=conversation.id,
-                    role="user",
-                    content=request.query
-                )
-                db.add(user_message)
-                
-                assistant_message = Message(
-                    conversation_id=conversation.id,
-                    role="assistant",
-                    content=ai_response['response'],
-                    citations=ai_response['sources']
-                )
-                db.add(assistant_message)
-                
-                db.commit()
-                logger.info(f"💾 Saved conversation for repo {request.repository_id} (user: {user_id})")
-                
-            except Exception as save_error:
-                logger.warning(f"⚠️ Failed to save conversation: {save_error}")
+            await save_chat_messages(db, request.repository_id, repository.name, request.query, ai_response, user_id)
         
         logger.info(f"🎉 QODEX chat successful for repo {request.repository_id} (user: {user_id})")
         
@@ -156,9 +266,13 @@ async def chat_with_repository(
             repository_name=repository.name,
             context_chunks_used=len(similar_chunks),
             model_used=ai_response['model_used'],
-            success=ai_response['success']
+            success=ai_response['success'],
+            timings=timings
         )
         
+    except EmbeddingPoolBusy as e:
+        logger.warning(f"⚠️ Embedding queue full, rejecting chat request: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error in QODEX chat processing: {e}")
         raise HTTPException(
@@ -166,20 +280,191 @@ async def chat_with_repository(
             detail=f"Failed to process chat request: {str(e)}"
         )
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/stream")
+async def stream_chat_with_repository(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_id),
+    _: bool = Depends(verify_client_secret),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_service: VectorService = Depends(get_vector_service),
+    chat_service: ChatService = Depends(get_chat_service),
+    query_cache: Optional[QueryCache] = Depends(get_query_cache),
+    reranker: Optional[Reranker] = Depends(get_reranker)
+):
+    """Chat with a repository, streaming the answer as server-sent events.
+
+    Events, in order: ``sources`` (retrieved chunks), any number of ``delta``
+    (answer text), then ``done`` (usage and timings) or ``error``.
+    """
+    logger.info(f"💬 QODEX Stream: '{request.query[:60]}...' for repo {request.repository_id} (user: {user_id})")
+    started = time.perf_counter()
+    
+    repository = await verify_repository_ownership(request.repository_id, user_id, db)
+    ensure_repository_ready(repository)
+    repository_id, repository_name = repository.id, repository.name
+    
+    # Retrieval happens before the response starts so its errors are still plain HTTP errors
+    try:
+        similar_chunks, cache_version, retrieval_timings = await retrieve_chunks(
+            request.query, repository, embedding_service, vector_service, query_cache, reranker
+        )
+    except EmbeddingPoolBusy as e:
+        logger.warning(f"⚠️ Embedding queue full, rejecting chat request: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Error in QODEX chat retrieval: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to process chat request: {str(e)}")
+    
+    retrieval_seconds = time.perf_counter() - started
+    
+    async def event_stream():
+        timings = {**retrieval_timings, 'retrieval_ms': round(retrieval_seconds * 1000, 1)}
+        sources = chat_service.build_sources(similar_chunks)
+        yield sse_event("sources", {
+            "sources": sources,
+            "repository_name": repository_name,
+            "context_chunks_used": len(similar_chunks)
+        })
+        
+        if not similar_chunks:
+            yield sse_event("delta", {"text": NO_RESULTS_MESSAGE})
+            timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            yield sse_event("done", {"model_used": "no_results", "success": False, "cached": False, "usage": None, "timings": timings})
+            return
+        
+        generation_started = time.perf_counter()
+        first_token_at = None
+        ai_response, usage, cached = None, None, False
+        
+        answer_key = query_cache.answer_key(repository_id, cache_version, request.query, similar_chunks) if query_cache else None
+        if query_cache:
+            ai_response = await query_cache.get_answer(answer_key)
+        
+        try:
+            if ai_response:
+                cached = True
+                first_token_at = time.perf_counter()
+                yield sse_event("delta", {"text": ai_response['response']})
+            else:
+                async for event in chat_service.stream_response(request.query, similar_chunks, repository_name):
+                    if event['type'] == 'delta':
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            first_token_seconds.observe(first_token_at - started)
+                        yield sse_event("delta", {"text": event['text']})
+                    else:
+                        ai_response, usage = event['result'], event['usage']
+        except Exception as e:
+            logger.error(f"❌ Error streaming QODEX chat for repo {repository_id}: {e}")
+            yield sse_event("error", {"detail": f"Failed to generate response: {str(e)}"})
+            return
+
+        if ai_response is None:
+            logger.error(f"❌ QODEX stream for repo {repository_id} ended without a final result")
+            yield sse_event("error", {"detail": "Failed to generate response: the stream ended without a result"})
+            return
+
+        if query_cache and not cached and is_cacheable_answer(ai_response):
+            await query_cache.set_answer(answer_key, ai_response)
+        
+        if ai_response['success']:
+            # The request's session is not guaranteed to outlive the streaming response
+            async with AsyncSessionLocal() as save_db:
+                await save_chat_messages(save_db, repository_id, repository_name, request.query, ai_response, user_id)
+        
+        finished = time.perf_counter()
+        timings.update({
+            'time_to_first_token_ms': round(((first_token_at or finished) - started) * 1000, 1),
+            'generation_ms': round((finished - generation_started) * 1000, 1),
+            'total_ms': round((finished - started) * 1000, 1)
+        })
+        stream_seconds.observe(finished - started)
+        logger.info(f"🎉 QODEX stream finished for repo {repository_id} in {timings['total_ms']}ms (first token {timings['time_to_first_token_ms']}ms)")
+        
+        yield sse_event("done", {
+            "model_used": ai_response['model_used'],
+            "success": ai_response['success'],
+            "cached": cached,
+            "usage": usage,
+            "timings": timings
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def serialize_message(msg: Message) -> dict:
+    return {
+        "id": msg.id,
+        "conversation_id": msg.conversation_id,
+        "role": msg.role,
+        "content": msg.content,
+        "citations": msg.citations,
+        "created_at": msg.created_at
+    }
+
+async def load_message_page(db: AsyncSession, conversation_id: int, limit: int, cursor: Optional[str]) -> dict:
+    """Newest page of a conversation (returned oldest-first for display) plus aggregate counts.
+
+    ``next_cursor`` points at older messages.
+    """
+    limit = clamp_limit(limit)
+    stmt = select(Message).where(Message.conversation_id == conversation_id)
+    before = keyset_before(Message.created_at, Message.id, cursor)
+    if before is not None:
+        stmt = stmt.where(before)
+    rows = (await db.scalars(
+        stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+    )).all()
+    page, next_cursor = page_of(rows, limit)
+    page.reverse()
+    
+    total_messages, user_message_count = (await db.execute(
+        select(
+            func.count(Message.id),
+            func.count(case((Message.role == "user", 1)))
+        ).where(Message.conversation_id == conversation_id)
+    )).one()
+    
+    return {
+        "messages": [serialize_message(msg) for msg in page],
+        "next_cursor": next_cursor,
+        "total_messages": total_messages,
+        "user_message_count": user_message_count
+    }
+
+async def count_messages_by_conversation(db: AsyncSession, conversation_ids: List[int]) -> dict:
+    if not conversation_ids:
+        return {}
+    rows = await db.execute(
+        select(Message.conversation_id, func.count(Message.id))
+        .where(Message.conversation_id.in_(conversation_ids))
+        .group_by(Message.conversation_id)
+    )
+    return dict(rows.all())
+
 @router.get("/{repository_id}/messages")
 async def get_repository_chat_messages(
     repository_id: int,
-    db: Session = Depends(get_db),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
-    """Get all chat messages for a repository directly - SINGLE API CALL!"""
+    """Get the latest chat messages for a repository; pass ``next_cursor`` back as ``cursor`` for older ones"""
     
-    repository = verify_repository_ownership(repository_id, user_id, db)
+    repository = await verify_repository_ownership(repository_id, user_id, db)
     
-    conversation = db.query(Conversation).filter(
+    conversation = await db.scalar(select(Conversation).where(
         Conversation.repository_id == repository_id
-    ).first()
+    ).order_by(Conversation.id.asc()).limit(1))
     
     if not conversation:
         return {
@@ -188,118 +473,142 @@ async def get_repository_chat_messages(
             "user_id": user_id,
             "conversation_id": None,
             "messages": [],
-            "total_messages": 0
+            "next_cursor": None,
+            "total_messages": 0,
+            "user_message_count": 0
         }
     
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation.id
-    ).order_by(Message.created_at.asc()).all()
+    page = await load_message_page(db, conversation.id, limit, cursor)
     
     return {
         "repository_id": repository_id,
         "repository_name": repository.name,
         "user_id": user_id,
         "conversation_id": conversation.id,
-        "messages": [
-            {
-                "id": msg.id,
-                "role": msg.role,
-                "content": msg.content,
-                "citations": msg.citations,
-                "created_at": msg.created_at
-            }
-            for msg in messages
-        ],
-        "total_messages": len(messages)
+        **page
     }
 
 @router.get("/{repository_id}/conversations")
 async def get_repository_conversations(
     repository_id: int,
-    db: Session = Depends(get_db),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
-    """Get all conversations for a repository (user must own it)"""
+    """Get conversations for a repository, newest first (user must own it)"""
     
-    repository = verify_repository_ownership(repository_id, user_id, db)
+    repository = await verify_repository_ownership(repository_id, user_id, db)
+    limit = clamp_limit(limit)
     
-    conversations = db.query(Conversation).filter(
+    stmt = select(Conversation).where(Conversation.repository_id == repository_id)
+    before = keyset_before(Conversation.created_at, Conversation.id, cursor)
+    if before is not None:
+        stmt = stmt.where(before)
+    rows = (await db.scalars(
+        stmt.order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(limit + 1)
+    )).all()
+    conversations, next_cursor = page_of(rows, limit)
+    
+    message_counts = await count_messages_by_conversation(db, [conv.id for conv in conversations])
+    total_conversations = await db.scalar(select(func.count(Conversation.id)).where(
         Conversation.repository_id == repository_id
-    ).order_by(Conversation.created_at.desc()).all()
+    ))
     
     return {
         "repository_id": repository_id,
         "repository_name": repository.name,
         "user_id": user_id,
-        "conversations": conversations,
-        "total_conversations": len(conversations)
+        "conversations": [
+            {
+                "id": conv.id,
+                "repository_id": conv.repository_id,
+                "title": conv.title,
+                "created_at": conv.created_at,
+                "updated_at": conv.updated_at,
+                "message_count": message_counts.get(conv.id, 0)
+            }
+            for conv in conversations
+        ],
+        "next_cursor": next_cursor,
+        "total_conversations": total_conversations
     }
 
 @router.get("/conversations/{conversation_id}/messages")
 async def get_conversation_messages(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
-    """Get all messages in a conversation (user must own the repository)"""
+    """Get the latest messages in a conversation (user must own the repository)"""
     
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    conversation = await db.scalar(select(Conversation).where(Conversation.id == conversation_id))
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    verify_repository_ownership(conversation.repository_id, user_id, db)
+    await verify_repository_ownership(conversation.repository_id, user_id, db)
     
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at.asc()).all()
+    page = await load_message_page(db, conversation_id, limit, cursor)
     
     return {
         "conversation_id": conversation_id,
         "repository_id": conversation.repository_id,
         "user_id": user_id,
-        "messages": messages,
-        "total_messages": len(messages)
+        **page
     }
 
 @router.get("/users/{target_user_id}/conversations")
 async def get_user_all_conversations(
     target_user_id: str,
-    db: Session = Depends(get_db),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
-    """Get all conversations for a specific user across all their repositories"""
+    """Get conversations for a specific user across all their repositories, newest first"""
     
     if user_id != target_user_id:
         raise HTTPException(status_code=403, detail="Access denied - can only access your own conversations")
     
-    user_repos = db.query(Repository).filter(Repository.user_id == target_user_id).all()
-    repo_ids = [repo.id for repo in user_repos]
+    limit = clamp_limit(limit)
     
-    if not repo_ids:
-        return {
-            "user_id": target_user_id,
-            "total_conversations": 0,
-            "conversations": []
-        }
+    stmt = select(Conversation, Repository.name).join(
+        Repository, Repository.id == Conversation.repository_id
+    ).where(Repository.user_id == target_user_id)
+    before = keyset_before(Conversation.created_at, Conversation.id, cursor)
+    if before is not None:
+        stmt = stmt.where(before)
+    rows = (await db.execute(
+        stmt.order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(limit + 1)
+    )).all()
     
-    conversations = db.query(Conversation).filter(
-        Conversation.repository_id.in_(repo_ids)
-    ).order_by(Conversation.created_at.desc()).all()
+    conversations, next_cursor = page_of([conv for conv, _name in rows], limit)
+    repository_names = {conv.id: name for conv, name in rows}
+    
+    message_counts = await count_messages_by_conversation(db, [conv.id for conv in conversations])
+    total_conversations = await db.scalar(
+        select(func.count(Conversation.id))
+        .join(Repository, Repository.id == Conversation.repository_id)
+        .where(Repository.user_id == target_user_id)
+    )
     
     return {
         "user_id": target_user_id,
-        "total_conversations": len(conversations),
+        "total_conversations": total_conversations,
+        "next_cursor": next_cursor,
         "conversations": [
             {
                 "id": conv.id,
                 "repository_id": conv.repository_id,
-                "repository_name": conv.repository.name,
+                "repository_name": repository_names[conv.id],
                 "title": conv.title,
                 "created_at": conv.created_at,
-                "message_count": len(conv.messages)
+                "message_count": message_counts.get(conv.id, 0)
             }
             for conv in conversations
         ]
@@ -309,23 +618,23 @@ async def get_user_all_conversations(
 async def test_repository_search(
     repository_id: int,
     query: str = "main function",
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
-    _: bool = Depends(verify_client_secret)
+    _: bool = Depends(verify_client_secret),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    vector_service: VectorService = Depends(get_vector_service)
 ):
     """Test endpoint to verify repository search functionality (user must own it)"""
     
-    repository = verify_repository_ownership(repository_id, user_id, db)
+    repository = await verify_repository_ownership(repository_id, user_id, db)
     
     if repository.status != RepositoryStatusEnum.READY:
         raise HTTPException(status_code=400, detail="Repository not ready")
     
     try:
-        embedding_service = EmbeddingService()
-        vector_service = VectorService()
-        
         query_embedding = await embedding_service.generate_query_embedding(query)
-        results = await vector_service.search_similar_code(repository_id, query_embedding, top_k=3)
+        results = await vector_service.hybrid_search(VectorService.namespace_for(repository), query, query_embedding, top_k=3)
+        results = await vector_service.hydrate(results)
         
         return {
             "repository": repository.name,
@@ -337,6 +646,7 @@ async def test_repository_search(
                     "file": result['file_path'],
                     "lines": f"{result['start_line']}-{result['end_line']}",
                     "similarity": round(result['similarity'], 3),
+                    "match": result.get('match', 'vector'),
                     "preview": result['content'][:200] + "..."
                 }
                 for result in results
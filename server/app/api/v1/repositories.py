@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Header
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.database import get_db
+from app.core.database import get_db
 from app.models.repository import Repository, RepositoryStatusEnum
 from app.schemas.repository import RepositoryCreate, RepositoryResponse
 from app.core.config import settings
-from app.services import GitHubService, EmbeddingService, VectorService
-import logging
+from app.core.registry import registry, get_query_cache, get_vector_service
+from app.models.ingestion_job import IngestionJobKindEnum
+from app.services.vector_service import VectorService
+from app.workers.index_sharing import release_index
+from app.workers.queue import enqueue_job, get_active_job
 import logging
 import sys
 
@@ -26,86 +31,6 @@ for handler in logging.root.handlers:
 
 router = APIRouter()
 
-async def process_repository_background(repository_id: int, user_id: str):
-    """Background task to process repository with hybrid RAG"""
-    
-    import sys
-    
-    def force_log(message):
-        """Force log to stdout and flush immediately"""
-        print(f"[QODEX-BG] {message}", file=sys.stdout, flush=True)
-        logger.info(message)
-    
-    force_log(f"🚀 Starting QODEX HYBRID RAG processing for repository {repository_id} (user: {user_id})")
-    
-    from app.database import SessionLocal
-    db = SessionLocal()
-    
-    github_service = GitHubService()
-    embedding_service = EmbeddingService()
-    vector_service = VectorService()
-    
-    temp_dir = None
-    
-    try:
-        repository = db.query(Repository).filter(
-            Repository.id == repository_id,
-            Repository.user_id == user_id
-        ).first()
-        
-        if not repository:
-            force_log(f"❌ Repository {repository_id} not found for user {user_id}")
-            return
-        
-        repository.status = RepositoryStatusEnum.PROCESSING
-        db.commit()
-        force_log(f"📊 Repository {repository_id} status: PROCESSING")
-        
-        force_log(f"📥 Step 1: Cloning repository {repository.github_url}")
-        temp_dir = await github_service.clone_repository(repository.github_url)
-        
-        force_log(f"📁 Step 2: Extracting code files from {repository.name}")
-        code_chunks = await github_service.extract_code_files(temp_dir)
-        
-        if not code_chunks:
-            raise Exception("No supported code files found in repository")
-        
-        force_log(f"✅ Found {len(code_chunks)} code chunks")
-        
-        force_log(f"⚡ Step 3: Generating embeddings with LOCAL SentenceTransformers")
-        embedded_chunks = await embedding_service.generate_embeddings_batch(code_chunks)
-        
-        if not embedded_chunks:
-            raise Exception("Failed to generate local embeddings")
-        
-        force_log(f"💾 Step 4: Storing embeddings in ChromaDB")
-        await vector_service.store_embeddings(repository_id, embedded_chunks)
-        
-        repository.status = RepositoryStatusEnum.READY
-        repository.error_message = None
-        db.commit()
-        
-        force_log(f"🎉 SUCCESS! QODEX Repository {repository_id} is READY for chat! (user: {user_id})")
-        
-    except Exception as e:
-        error_message = str(e)
-        force_log(f"❌ Error processing repository {repository_id}: {error_message}")
-        
-        try:
-            repository = db.query(Repository).filter(Repository.id == repository_id).first()
-            if repository:
-                repository.status = RepositoryStatusEnum.FAILED
-                repository.error_message = error_message[:500]
-                db.commit()
-        except Exception as db_error:
-            force_log(f"❌ Failed to update repository status: {str(db_error)}")
-    
-    finally:
-        if temp_dir:
-            github_service.cleanup_temp_dir(temp_dir)
-        db.close()
-        force_log(f"🏁 Finished processing repository {repository_id}")
-        
 def verify_client_secret(x_client_secret: str = Header(..., alias="X-Client-Secret")):
     """Verify request comes from authorized Next.js client"""
     if x_client_secret != settings.nextjs_secret:
@@ -124,8 +49,7 @@ def get_user_id(x_user_id: str = Header(..., alias="X-User-ID")):
 @router.post("/", response_model=RepositoryResponse)
 async def add_repository(
     repository: RepositoryCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
@@ -139,10 +63,10 @@ async def add_repository(
     if not repository.github_url.startswith(('https://github.com/', 'git@github.com:')):
         raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
     
-    existing = db.query(Repository).filter(
+    existing = await db.scalar(select(Repository).where(
         Repository.github_url == repository.github_url,
         Repository.user_id == user_id
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -157,24 +81,25 @@ async def add_repository(
         status=RepositoryStatusEnum.PENDING
     )
     db.add(db_repository)
-    db.commit()
-    db.refresh(db_repository)
+    await db.flush()
     
-    background_tasks.add_task(process_repository_background, db_repository.id, user_id)
+    await enqueue_job(db, db_repository.id, user_id, IngestionJobKindEnum.INDEX)
+    await db.commit()
+    await db.refresh(db_repository)
     
     logger.info(f"✅ Repository {db_repository.id} created and queued for processing (user: {user_id})")
     return db_repository
 
 @router.get("/", response_model=List[RepositoryResponse])
 async def get_user_repositories(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
     """Get all repositories for the authenticated user"""
-    repositories = db.query(Repository).filter(
+    repositories = (await db.scalars(select(Repository).where(
         Repository.user_id == user_id
-    ).order_by(Repository.created_at.desc()).all()
+    ).order_by(Repository.created_at.desc()))).all()
     
     logger.info(f"📋 Retrieved {len(repositories)} repositories for user {user_id}")
     return repositories
@@ -182,15 +107,15 @@ async def get_user_repositories(
 @router.get("/{repository_id}", response_model=RepositoryResponse)
 async def get_repository(
     repository_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
     """Get specific repository by ID (user must own it)"""
-    repository = db.query(Repository).filter(
+    repository = await db.scalar(select(Repository).where(
         Repository.id == repository_id,
         Repository.user_id == user_id
-    ).first()
+    ))
     
     if not repository:
         raise HTTPException(status_code=404, detail="Repository not found or access denied")
@@ -200,34 +125,51 @@ async def get_repository(
 @router.delete("/{repository_id}")
 async def delete_repository(
     repository_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
     """Delete repository and all associated data (user must own it)"""
-    repository = db.query(Repository).filter(
+    repository = await db.scalar(select(Repository).where(
         Repository.id == repository_id,
         Repository.user_id == user_id
-    ).first()
+    ))
     
     if not repository:
         raise HTTPException(status_code=404, detail="Repository not found or access denied")
     
-    try:
-        vector_service = VectorService()
-        await vector_service.delete_repository_data(repository_id)
-        logger.info(f"🗑️ Deleted vector data for repository {repository_id}")
-    except Exception as e:
-        logger.warning(f"⚠️ Error deleting vector data for repo {repository_id}: {e}")
+    embedding_service = registry.get_loaded("embedding")
+    if embedding_service and embedding_service.cancel_job(f"repo_{repository_id}"):
+        logger.info(f"🛑 Cancelled in-flight embedding job for repository {repository_id}")
+    
+    vector_index_id = repository.vector_index_id
+    # Raises 503 if the vector service cannot load, before anything is deleted
+    vector_service = await get_vector_service()
+    if vector_index_id is None:
+        try:
+            await vector_service.delete_namespace(VectorService.legacy_namespace(repository_id))
+            logger.info(f"🗑️ Deleted vector data for repository {repository_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Error deleting vector data for repo {repository_id}: {e}")
+    
+    query_cache = await get_query_cache()
+    if query_cache:
+        await query_cache.invalidate(repository_id)
     
     try:
-        db.delete(repository)
-        db.commit()
+        await db.delete(repository)
+        await db.commit()
         logger.info(f"🗑️ Successfully deleted repository {repository_id} (user: {user_id})")
     except Exception as e:
         logger.error(f"❌ Error deleting repository {repository_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete repository")
     
+    # Shared indexes outlive the repository while other repositories still use them
+    try:
+        await release_index(db, vector_service, vector_index_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Error releasing shared index {vector_index_id} of repo {repository_id}: {e}")
+    
     return {
         "message": f"Repository {repository_id} deleted successfully",
         "repository_id": repository_id,
@@ -235,26 +177,58 @@ async def delete_repository(
         "success": True
     }
 
+@router.post("/{repository_id}/sync", response_model=RepositoryResponse)
+async def sync_repository(
+    repository_id: int,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_id),
+    _: bool = Depends(verify_client_secret)
+):
+    """Re-index only what changed since the last indexed commit (user must own it)"""
+    repository = await db.scalar(select(Repository).where(
+        Repository.id == repository_id,
+        Repository.user_id == user_id
+    ))
+    
+    if not repository:
+        raise HTTPException(status_code=404, detail="Repository not found or access denied")
+    
+    if await get_active_job(db, repository_id):
+        raise HTTPException(status_code=409, detail="Repository is already being processed")
+    
+    try:
+        await enqueue_job(db, repository_id, user_id, IngestionJobKindEnum.SYNC)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Repository is already being processed")
+    await db.refresh(repository)
+    
+    logger.info(f"🔄 Repository {repository_id} queued for sync from {repository.last_indexed_commit or 'scratch'} (user: {user_id})")
+    return repository
+
 @router.get("/{repository_id}/status")
 async def get_repository_status(
     repository_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
     """Get detailed repository status (user must own it)"""
-    repository = db.query(Repository).filter(
+    repository = await db.scalar(select(Repository).where(
         Repository.id == repository_id,
         Repository.user_id == user_id
-    ).first()
+    ))
     
     if not repository:
         raise HTTPException(status_code=404, detail="Repository not found or access denied")
     
     from app.models.conversation import Conversation
-    conversation_count = db.query(Conversation).filter(
+    conversation_count = await db.scalar(select(func.count(Conversation.id)).where(
         Conversation.repository_id == repository_id
-    ).count()
+    ))
+    
+    active_job = await get_active_job(db, repository_id)
     
     return {
         "id": repository.id,
@@ -263,17 +237,26 @@ async def get_repository_status(
         "github_url": repository.github_url,
         "status": repository.status.value,
         "error_message": repository.error_message,
+        "last_indexed_commit": repository.last_indexed_commit,
         "created_at": repository.created_at,
         "updated_at": repository.updated_at,
         "is_ready_for_chat": repository.status == RepositoryStatusEnum.READY,
         "conversation_count": conversation_count,
+        "job": {
+            "id": active_job.id,
+            "kind": active_job.kind.value,
+            "status": active_job.status.value,
+            "attempts": active_job.attempts,
+            "max_attempts": active_job.max_attempts,
+            "last_error": active_job.last_error
+        } if active_job else None,
         "processing_complete": repository.status in [RepositoryStatusEnum.READY, RepositoryStatusEnum.FAILED]
     }
 
 @router.get("/users/{target_user_id}/repositories", response_model=List[RepositoryResponse])
 async def get_specific_user_repositories(
     target_user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_user_id),
     _: bool = Depends(verify_client_secret)
 ):
@@ -282,8 +265,8 @@ async def get_specific_user_repositories(
     if user_id != target_user_id:
         raise HTTPException(status_code=403, detail="Access denied - can only access your own repositories")
     
-    repositories = db.query(Repository).filter(
+    repositories = (await db.scalars(select(Repository).where(
         Repository.user_id == target_user_id
-    ).order_by(Repository.created_at.desc()).all()
+    ).order_by(Repository.created_at.desc()))).all()
     
     return repositories
\ No newline at end of file
@@ -1,9 +1,18 @@
 import os
+import tempfile
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = os.getenv("DATABASE_URL") 
     
+    # Connection pool (per process)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 disables
+    db_echo: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+    
     secret_key: str = os.getenv("SECRET_KEY") 
     nextjs_secret: str = os.getenv("NEXTJS_SECRET") 
     algorithm: str = "HS256"
@@ -16,11 +25,121 @@ class Settings(BaseSettings):
     # Pinecone Configuration
     pinecone_index_name: str = os.getenv("PINECONE_INDEX_NAME", "qodex")  
     pinecone_environment: str = os.getenv("PINECONE_ENVIRONMENT", "gcp-starter")
+    pinecone_upsert_concurrency: int = int(os.getenv("PINECONE_UPSERT_CONCURRENCY", "4"))
+    pinecone_upsert_max_bytes: int = int(os.getenv("PINECONE_UPSERT_MAX_BYTES", str(1536 * 1024)))  # API limit is 2 MB
+    pinecone_upsert_max_vectors: int = int(os.getenv("PINECONE_UPSERT_MAX_VECTORS", "1000"))
+    pinecone_upsert_max_retries: int = int(os.getenv("PINECONE_UPSERT_MAX_RETRIES", "4"))
+    pinecone_upsert_backoff_seconds: float = float(os.getenv("PINECONE_UPSERT_BACKOFF_SECONDS", "0.5"))
+    
+    # Vector backend: "pinecone" or "local"
+    vector_backend: str = os.getenv("VECTOR_BACKEND", "pinecone")
+    local_vector_dir: str = os.getenv("LOCAL_VECTOR_DIR", "/app/vector_store")
+    local_vector_exact_threshold: int = int(os.getenv("LOCAL_VECTOR_EXACT_THRESHOLD", "50000"))
+    local_vector_nprobe: int = int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+    local_vector_dtype: str = os.getenv("LOCAL_VECTOR_DTYPE", "float32")  # float32, float16 or int8; applies to new namespaces
+    
+    # Hybrid retrieval: BM25 over code identifiers fused with vector results
+    hybrid_search_enabled: bool = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+    lexical_index_dir: str = os.getenv("LEXICAL_INDEX_DIR", "/app/lexical_index")  # shared by the API and ingestion workers
+    lexical_index_max_namespaces: int = int(os.getenv("LEXICAL_INDEX_MAX_NAMESPACES", "64"))  # loaded in memory at once
+    hybrid_candidates: int = int(os.getenv("HYBRID_CANDIDATES", "20"))  # results fetched from each retriever before fusion
+    hybrid_rrf_k: int = int(os.getenv("HYBRID_RRF_K", "60"))
+    
+    # Cross-encoder re-ranking between retrieval and generation
+    rerank_enabled: bool = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+    rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = int(os.getenv("RERANK_CANDIDATES", "20"))  # chunks retrieved for re-ranking
+    rerank_top_k: int = int(os.getenv("RERANK_TOP_K", "5"))  # most chunks sent to the LLM
+    rerank_min_score: float = float(os.getenv("RERANK_MIN_SCORE", "-4.0"))  # logit; unrelated passages score around -10
+    rerank_budget_ms: float = float(os.getenv("RERANK_BUDGET_MS", "150"))
+    rerank_batch_size: int = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+    rerank_max_length: int = int(os.getenv("RERANK_MAX_LENGTH", "384"))  # tokens per query + chunk pair
+    rerank_threads: int = int(os.getenv("RERANK_THREADS", "2"))
+    
+    # Full chunk text, looked up by vector ID when building the prompt
+    chunk_store_enabled: bool = os.getenv("CHUNK_STORE_ENABLED", "true").lower() == "true"
+    chunk_store_backend: str = os.getenv("CHUNK_STORE_BACKEND", "sqlite")  # sqlite (shared volume) or postgres
+    chunk_store_path: str = os.getenv("CHUNK_STORE_PATH", "/app/chunk_store/chunks.sqlite3")  # shared by the API and ingestion workers
+    chunk_cache_mb: int = int(os.getenv("CHUNK_CACHE_MB", "64"))  # hot chunk texts kept in memory per process
+    
+    # Prompt context packing
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+    context_min_section_tokens: int = int(os.getenv("CONTEXT_MIN_SECTION_TOKENS", "120"))  # smallest truncated section worth sending
     
     # App
     environment: str = os.getenv("ENVIRONMENT", "production")
     debug: bool = os.getenv("DEBUG", "false").lower() == "true"
     
+    # Service registry
+    service_warmup: bool = os.getenv("SERVICE_WARMUP", "true").lower() == "true"
+    
+    # Embedding execution pool
+    embedding_query_threads: int = int(os.getenv("EMBEDDING_QUERY_THREADS", "2"))
+    embedding_max_pending_queries: int = int(os.getenv("EMBEDDING_MAX_PENDING_QUERIES", "64"))
+    embedding_queue_timeout: float = float(os.getenv("EMBEDDING_QUEUE_TIMEOUT", "10"))
+    embedding_bulk_executor: str = os.getenv("EMBEDDING_BULK_EXECUTOR", "process")  # "process" or "thread"
+    embedding_bulk_workers: int = int(os.getenv("EMBEDDING_BULK_WORKERS", "1"))
+    embedding_max_bulk_jobs: int = int(os.getenv("EMBEDDING_MAX_BULK_JOBS", "2"))
+    embedding_bulk_sub_batch: int = int(os.getenv("EMBEDDING_BULK_SUB_BATCH", "256"))
+    
+    # Query micro-batching
+    query_batching_enabled: bool = os.getenv("QUERY_BATCHING_ENABLED", "true").lower() == "true"
+    query_batch_window_ms: float = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+    query_batch_max_size: int = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+    
+    # Embedding cache
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "/app/embedding_cache/embeddings.sqlite3")
+    embedding_cache_max_mb: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+    
+    # Chunking
+    ast_chunking_enabled: bool = os.getenv("AST_CHUNKING_ENABLED", "true").lower() == "true"
+    chunk_max_chars: int = int(os.getenv("CHUNK_MAX_CHARS", "1000"))
+    chunk_min_chars: int = int(os.getenv("CHUNK_MIN_CHARS", "200"))
+    
+    # Repository cloning
+    partial_clone_enabled: bool = os.getenv("PARTIAL_CLONE_ENABLED", "true").lower() == "true"
+    clone_blob_limit_bytes: int = int(os.getenv("CLONE_BLOB_LIMIT_BYTES", str(1024 * 1024)))  # also the max indexed file size
+    mirror_cache_enabled: bool = os.getenv("MIRROR_CACHE_ENABLED", "true").lower() == "true"
+    mirror_cache_dir: str = os.getenv("MIRROR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "qodex_mirrors"))
+    mirror_cache_max_bytes: int = int(os.getenv("MIRROR_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+    mirror_cache_fetch_ttl: float = float(os.getenv("MIRROR_CACHE_FETCH_TTL", "30"))  # reuse a fetch this recent instead of fetching again
+    
+    # File extraction (read + chunk) pool
+    extraction_executor: str = os.getenv("EXTRACTION_EXECUTOR", "process")  # "process" or "thread"
+    extraction_workers: int = int(os.getenv("EXTRACTION_WORKERS", "0"))  # 0 = min(4, cpu count)
+    extraction_shard_bytes: int = int(os.getenv("EXTRACTION_SHARD_BYTES", str(512 * 1024)))
+    extraction_shard_files: int = int(os.getenv("EXTRACTION_SHARD_FILES", "200"))
+    blob_dedup_enabled: bool = os.getenv("BLOB_DEDUP_ENABLED", "true").lower() == "true"
+    
+    # Shared vector indexes (one index per repository URL + commit + chunker + model)
+    shared_index_enabled: bool = os.getenv("SHARED_INDEX_ENABLED", "true").lower() == "true"
+    shared_index_wait_seconds: float = float(os.getenv("SHARED_INDEX_WAIT_SECONDS", "900"))  # how long to wait for another job's build
+    shared_index_poll_seconds: float = float(os.getenv("SHARED_INDEX_POLL_SECONDS", "5"))
+    shared_index_stale_seconds: float = float(os.getenv("SHARED_INDEX_STALE_SECONDS", "7200"))  # unreferenced builds older than this are presumed crashed
+    
+    # Ingestion pipeline
+    ingestion_batch_size: int = int(os.getenv("INGESTION_BATCH_SIZE", "128"))
+    ingestion_queue_depth: int = int(os.getenv("INGESTION_QUEUE_DEPTH", "4"))
+    
+    # Ingestion job queue / workers
+    ingestion_embedded_worker: bool = os.getenv("INGESTION_EMBEDDED_WORKER", "true").lower() == "true"
+    ingestion_worker_processes: int = int(os.getenv("INGESTION_WORKER_PROCESSES", "1"))
+    ingestion_worker_concurrency: int = int(os.getenv("INGESTION_WORKER_CONCURRENCY", "2"))
+    ingestion_lease_seconds: int = int(os.getenv("INGESTION_LEASE_SECONDS", "120"))
+    ingestion_heartbeat_seconds: int = int(os.getenv("INGESTION_HEARTBEAT_SECONDS", "30"))
+    ingestion_max_attempts: int = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+    ingestion_retry_base_seconds: float = float(os.getenv("INGESTION_RETRY_BASE_SECONDS", "30"))
+    ingestion_poll_seconds: float = float(os.getenv("INGESTION_POLL_SECONDS", "2"))
+    
+    # Chat query cache
+    query_cache_enabled: bool = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+    query_cache_backend: str = os.getenv("QUERY_CACHE_BACKEND", "memory")  # "memory" or "redis"
+    query_cache_redis_url: str = os.getenv("QUERY_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    query_cache_max_entries: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+    query_cache_retrieval_ttl: float = float(os.getenv("QUERY_CACHE_RETRIEVAL_TTL", "3600"))
+    query_cache_answer_ttl: float = float(os.getenv("QUERY_CACHE_ANSWER_TTL", "86400"))
+    
     class Config:
         env_file = ".env"
 
@@ -1,28 +1,118 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import time
+from typing import AsyncIterator, Dict, Tuple
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import settings
+from .metrics import metrics
 
 
-engine = create_engine(
-    settings.database_url,
-    pool_size=5,           
-    max_overflow=10,       
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False,            
-    pool_timeout=30,
-    connect_args={
-        "sslmode": "require" 
-    } if settings.database_url.startswith("postgresql") else {}
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-def get_db():
-    db = SessionLocal()
-    try:
+def async_database_url(database_url: str) -> Tuple[URL, Dict]:
+    """Map the configured (sync-style) URL onto its async driver.
+
+    asyncpg does not understand libpq query options such as ``sslmode``, so they
+    are moved into connect_args.
+    """
+    url = make_url(database_url)
+    connect_args = {}
+
+    if url.get_backend_name() in ("postgresql", "postgres"):
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", "require")
+        query.pop("channel_binding", None)
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+        if sslmode != "disable":
+            connect_args["ssl"] = sslmode
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+
+    return url, connect_args
+
+
+_checkout_wait = metrics.histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection")
+_checkout_timeouts = metrics.counter("db_pool_checkout_timeouts", "Checkouts that gave up after pool_timeout")
+_in_use = metrics.gauge("db_pool_in_use", "Connections currently checked out")
+_overflow = metrics.gauge("db_pool_overflow", "Connections open beyond pool_size")
+_capacity = metrics.gauge("db_pool_capacity", "pool_size + max_overflow for this process")
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a free connection.
+
+    Only the wait on the pool's queue is timed; opening a new connection for
+    an overflow checkout is connect latency, not pool pressure.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        get = self._pool.get
+
+        def timed_get(*get_args, **get_kwargs):
+            start = time.perf_counter()
+            try:
+                return get(*get_args, **get_kwargs)
+            finally:
+                _checkout_wait.observe(time.perf_counter() - start)
+
+        self._pool.get = timed_get
+
+    def _do_get(self):
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            _checkout_timeouts.inc()
+            raise
+
+
+def _track_pool_usage(engine: AsyncEngine):
+    if not hasattr(engine.sync_engine.pool, "checkedout"):
+        return
+
+    # Read from the pool on each snapshot; dispose() swaps in a new pool, so look it up every time
+    _in_use.set_function(lambda: engine.sync_engine.pool.checkedout())
+    _overflow.set_function(lambda: max(0, engine.sync_engine.pool.overflow()))
+
+
+def create_database_engine(database_url: str = None) -> AsyncEngine:
+    """Build the process-wide engine; every session in the app comes from it.
+
+    Each uvicorn worker and ingestion worker process gets its own pool, so the
+    Postgres connection budget is processes x (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+    """
+    url, connect_args = async_database_url(database_url or settings.database_url)
+    options = {}
+
+    if url.get_backend_name() == "postgresql":
+        if settings.db_statement_timeout_ms:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+        options = {
+            "poolclass": InstrumentedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_timeout": settings.db_pool_timeout,
+        }
+        _capacity.set(settings.db_pool_size + settings.db_max_overflow)
+
+    engine = create_async_engine(
+        url,
+        echo=settings.db_echo,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+        **options
+    )
+    _track_pool_usage(engine)
+    return engine
+
+
+engine = create_database_engine()
+
+# expire_on_commit=False: attribute access after commit must not trigger implicit IO
+AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+Base = declarative_base(cls=AsyncAttrs)
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _build_embedding_service():
+    from app.services.embedding_service import EmbeddingService
+    return EmbeddingService()
+
+
+def _build_vector_service():
+    from app.services.vector_service import VectorService
+    return VectorService()
+
+
+def _build_chat_service():
+    from app.services.chat_service import ChatService
+    return ChatService()
+
+
+def _build_query_cache():
+    from app.services.query_cache import QueryCache
+    return QueryCache()
+
+
+def _build_reranker():
+    from app.services.reranker import Reranker
+    return Reranker()
+
+
+class ServiceRegistry:
+    """Process-wide holder of the heavyweight services.
+
+    Each service is constructed once (model load, Pinecone handshake, Gemini
+    configuration) and then shared by every request and background job.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable] = {
+            "embedding": _build_embedding_service,
+            "vector": _build_vector_service,
+            "chat": _build_chat_service,
+            "query_cache": _build_query_cache,
+        }
+        if settings.rerank_enabled:
+            self._factories["rerank"] = _build_reranker
+        # Chat degrades gracefully without these, so they do not gate readiness
+        self._optional = {"rerank"}
+        self._services: Dict[str, object] = {}
+        self._errors: Dict[str, str] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._warmed_up = False
+        self._started = False
+
+    def _lock_for(self, name: str) -> asyncio.Lock:
+        if name not in self._locks:
+            self._locks[name] = asyncio.Lock()
+        return self._locks[name]
+
+    async def get(self, name: str):
+        """Return the shared instance, loading it on first use"""
+        service = self._services.get(name)
+        if service is not None:
+            return service
+
+        async with self._lock_for(name):
+            service = self._services.get(name)
+            if service is not None:
+                return service
+
+            start = time.perf_counter()
+            try:
+                service = await asyncio.to_thread(self._factories[name])
+            except Exception as e:
+                self._errors[name] = str(e)
+                logger.error(f"❌ Failed to load {name} service: {e}")
+                raise
+
+            elapsed = time.perf_counter() - start
+            metrics.gauge(f"service_load_seconds.{name}", f"Time spent constructing the {name} service").set(elapsed)
+            self._services[name] = service
+            self._errors.pop(name, None)
+            logger.info(f"✅ Loaded {name} service in {elapsed:.2f}s")
+            return service
+
+    def get_loaded(self, name: str):
+        """Return the instance if it is already loaded, without triggering a load"""
+        return self._services.get(name)
+
+    async def warm_up(self):
+        """Run one throwaway query through the embedding model so the first real request is not the slow one"""
+        embedding_service = self._services.get("embedding")
+        if embedding_service is None:
+            return
+
+        start = time.perf_counter()
+        try:
+            await embedding_service.generate_query_embedding("warm up")
+            self._warmed_up = True
+            elapsed = time.perf_counter() - start
+            metrics.gauge("service_warmup_seconds.embedding", "Time spent on the embedding warm-up query").set(elapsed)
+            logger.info(f"🔥 Embedding model warmed up in {elapsed:.2f}s")
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding warm-up failed: {e}")
+
+    async def startup(self):
+        """Load every service and warm up the embedding model"""
+        logger.info("🚀 Loading shared services...")
+        for name in self._factories:
+            try:
+                await self.get(name)
+            except Exception:
+                continue
+
+        if settings.service_warmup:
+            await self.warm_up()
+
+        self._started = True
+        logger.info(f"🏁 Service registry startup finished (ready: {self.ready})")
+
+    async def shutdown(self):
+        for name, service in list(self._services.items()):
+            close = getattr(service, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"⚠️ Error closing {name} service: {e}")
+        self._services.clear()
+        self._started = False
+
+    @property
+    def ready(self) -> bool:
+        return self._started and all(name in self._services for name in self._factories if name not in self._optional)
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "warmed_up": self._warmed_up,
+            "services": {
+                name: "loaded" if name in self._services else ("failed" if name in self._errors else "loading")
+                for name in self._factories
+            },
+            "errors": dict(self._errors)
+        }
+
+    async def get_embedding_service(self):
+        return await self.get("embedding")
+
+    async def get_vector_service(self):
+        return await self.get("vector")
+
+    async def get_chat_service(self):
+        return await self.get("chat")
+
+    async def get_query_cache(self):
+        return await self.get("query_cache")
+
+
+registry = ServiceRegistry()
+
+
+async def _resolve(name: str):
+    try:
+        return await registry.get(name)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"{name.capitalize()} service unavailable: {str(e)}")
+
+
+async def get_embedding_service():
+    """FastAPI dependency returning the shared EmbeddingService"""
+    return await _resolve("embedding")
+
+
+async def get_vector_service():
+    """FastAPI dependency returning the shared VectorService"""
+    return await _resolve("vector")
+
+
+async def get_chat_service():
+    """FastAPI dependency returning the shared ChatService"""
+    return await _resolve("chat")
+
+
+async def get_query_cache():
+    """FastAPI dependency returning the shared QueryCache, or None when it failed to load.
+
+    The cache is an optimisation, so chat keeps working without it.
+    """
+    try:
+        return await registry.get("query_cache")
+    except Exception:
+        return None
+
+
+async def get_reranker():
+    """FastAPI dependency returning the shared Reranker, or None until startup has loaded it.
+
+    Never loads the model on a request: a missing or failed cross-encoder just
+    means answers use the retrieval order.
+    """
+    return registry.get_loaded("rerank")
@@ -1,8 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from app.api.v1 import repositories, chat
 from app.core.database import engine, Base
+from app.core.metrics import metrics
+from app.core.registry import registry
+from app.core.config import settings
+from app.workers.ingestion_worker import IngestionWorker
 from datetime import datetime
+import asyncio
 import os
 import logging
 
@@ -10,12 +16,42 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create database tables and load shared services once per process"""
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        logger.info("🗄️ Database tables created successfully")
+    except Exception as e:
+        logger.error(f"❌ Error creating database tables: {e}")
+    
+    # Load models in the background so /health answers while they warm up
+    startup_task = asyncio.create_task(registry.startup())
+    
+    # Single-process deployments run ingestion here; scale out with `python -m app.workers.ingestion_worker`
+    worker = IngestionWorker() if settings.ingestion_embedded_worker else None
+    worker_task = asyncio.create_task(worker.run()) if worker else None
+    
+    yield
+    
+    if worker:
+        worker.stop()
+        await asyncio.gather(worker_task, return_exceptions=True)
+    if not startup_task.done():
+        startup_task.cancel()
+    # Let the cancellation land before closing services it may still be loading
+    await asyncio.gather(startup_task, return_exceptions=True)
+    await registry.shutdown()
+    await engine.dispose()
+
 app = FastAPI(
     title="QODEX API",
     description="AI-powered code repository chat system",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -31,15 +67,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.on_event("startup")
-async def startup_event():
-    """Create database tables on startup"""
-    try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("🗄️ Database tables created successfully")
-    except Exception as e:
-        logger.error(f"❌ Error creating database tables: {e}")
-
 @app.get("/health")
 @app.head("/health")
 async def health_check():
@@ -50,9 +77,19 @@ async def health_check():
         "service": "QODEX API",
         "version": "1.0.0",
         "environment": os.getenv("ENVIRONMENT", "production"),
+        "ready": registry.ready,
+        "services": registry.status(),
         "message": "QODEX is running smoothly! 🚀"
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process service metrics (model load time, etc.)"""
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "metrics": metrics.snapshot()
+    }
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -61,6 +98,7 @@ async def root():
         "description": "AI-powered code repository chat system",
         "docs": "/docs",
         "health": "/health",
+        "metrics": "/metrics",
         "status": "running",
         "version": "1.0.0"
     }
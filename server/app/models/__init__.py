@@ -1,5 +1,8 @@
 # app/models/__init__.py
 from .repository import Repository
 from .conversation import Conversation, Message
+from .ingestion_job import IngestionJob
+from .vector_index import VectorIndex
+from .chunk_content import ChunkContent
 
-__all__ = ["Repository", "Conversation", "Message"]
\ No newline at end of file
+__all__ = ["Repository", "Conversation", "Message", "IngestionJob", "VectorIndex", "ChunkContent"]
\ No newline at end of file
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, LargeBinary, Index
+from app.core.database import Base
+
+class ChunkContent(Base):
+    """Zlib-compressed text of one indexed chunk, keyed by its vector ID.
+
+    Used by the Postgres chunk store; vector metadata only carries the ID.
+    IDs start with ``<namespace>_<file key>_``, and the pattern index lets a
+    file's or a namespace's chunks be deleted by prefix.
+    """
+    __tablename__ = "chunk_contents"
+    __table_args__ = (
+        Index("ix_chunk_contents_vector_id_pattern", "vector_id", postgresql_ops={"vector_id": "text_pattern_ops"}),
+    )
+    
+    vector_id = Column(String, primary_key=True)
+    content = Column(LargeBinary, nullable=False)
+    
+    def __repr__(self):
+        return f"<ChunkContent(vector_id='{self.vector_id}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -6,6 +6,11 @@ from app.core.database import Base
 class Conversation(Base):
     """Conversation model - linked to repository only"""
     __tablename__ = "conversations"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # Keyset pagination: newest-first conversations per repository
+        Index("ix_conversations_repository_created_id", "repository_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     repository_id = Column(Integer, ForeignKey("repositories.id"), nullable=False)
@@ -22,6 +27,10 @@ class Conversation(Base):
 class Message(Base):
     """Message model for chat history"""
     __tablename__ = "messages"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
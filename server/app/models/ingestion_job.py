@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Index, text
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+import enum
+
+class IngestionJobKindEnum(enum.Enum):
+    """What the worker should do with the repository"""
+    INDEX = "INDEX"
+    SYNC = "SYNC"
+
+class IngestionJobStatusEnum(enum.Enum):
+    """Ingestion job lifecycle"""
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+class IngestionJob(Base):
+    """Durable ingestion work item claimed by workers with a heartbeat lease"""
+    __tablename__ = "ingestion_jobs"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_ingestion_jobs_status_run_after", "status", "run_after"),
+        # At most one queued or running job per repository
+        Index(
+            "uq_ingestion_jobs_active_repository",
+            "repository_id",
+            unique=True,
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')"),
+            sqlite_where=text("status IN ('QUEUED', 'RUNNING')")
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    repository_id = Column(Integer, ForeignKey("repositories.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(String, nullable=False)
+    kind = Column(Enum(IngestionJobKindEnum), nullable=False, default=IngestionJobKindEnum.INDEX)
+    status = Column(Enum(IngestionJobStatusEnum), nullable=False, default=IngestionJobStatusEnum.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    repository = relationship("Repository", back_populates="ingestion_jobs")
+    
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, repository_id={self.repository_id}, kind={self.kind.value}, status={self.status.value})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -14,17 +14,26 @@ class RepositoryStatusEnum(enum.Enum):
 class Repository(Base):
     """Repository model with user ownership"""
     __tablename__ = "repositories"
+    # Fetch server-generated timestamps with RETURNING instead of lazily after the flush
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        UniqueConstraint("user_id", "github_url", name="uq_repositories_user_github_url"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, nullable=False, index=True)  
-    github_url = Column(String, nullable=False, unique=True)
+    github_url = Column(String, nullable=False)
     name = Column(String, nullable=False)
     status = Column(Enum(RepositoryStatusEnum), default=RepositoryStatusEnum.PENDING)
     error_message = Column(String, nullable=True)
+    last_indexed_commit = Column(String(40), nullable=True)
+    # Shared index this repository reads from; NULL for repositories indexed into their own repo_{id} namespace
+    vector_index_id = Column(Integer, ForeignKey("vector_indexes.id", ondelete="SET NULL"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     conversations = relationship("Conversation", back_populates="repository", cascade="all, delete-orphan")
+    ingestion_jobs = relationship("IngestionJob", back_populates="repository", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<Repository(id={self.id}, user_id='{self.user_id}', name='{self.name}', status={self.status.value})>"
\ No newline at end of file
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+import enum
+
+class VectorIndexStatusEnum(enum.Enum):
+    """Vector index build status"""
+    BUILDING = "BUILDING"
+    READY = "READY"
+
+class VectorIndex(Base):
+    """Vectors of one repository commit, shared by every Repository row that indexed it.
+
+    Rows are reference counted by ``Repository.vector_index_id``; the vectors
+    live in the ``idx_{id}`` namespace of the vector backend.
+    """
+    __tablename__ = "vector_indexes"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        UniqueConstraint("normalized_url", "commit_sha", "chunker_version", "embedding_model", name="uq_vector_indexes_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    normalized_url = Column(String, nullable=False)
+    commit_sha = Column(String(40), nullable=False)
+    chunker_version = Column(String, nullable=False)
+    embedding_model = Column(String, nullable=False)
+    status = Column(Enum(VectorIndexStatusEnum), nullable=False, default=VectorIndexStatusEnum.BUILDING)
+    chunk_count = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    @property
+    def namespace(self) -> str:
+        return f"idx_{self.id}"
+    
+    def __repr__(self):
+        return f"<VectorIndex(id={self.id}, url='{self.normalized_url}', commit='{self.commit_sha[:8]}', status={self.status.value})>"
@@ -21,6 +21,7 @@ class RepositoryResponse(BaseModel):
     github_url: str
     status: RepositoryStatus
     error_message: Optional[str] = None
+    last_indexed_commit: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -3,5 +3,6 @@ from .embedding_service import EmbeddingService
 from .vector_service import VectorService
 from .chat_service import ChatService
 from .pinecone_service import PineconeService
+from .local_vector_store import LocalVectorStore
 
-__all__ = ['GitHubService', 'EmbeddingService', 'VectorService', 'ChatService', 'PineconeService']
+__all__ = ['GitHubService', 'EmbeddingService', 'VectorService', 'ChatService', 'PineconeService', 'LocalVectorStore']
@@ -1,8 +1,10 @@
 import google.generativeai as genai
 import os
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
 import logging
 from dotenv import load_dotenv
+from app.core.config import settings
+from .context_builder import ContextBuilder
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -24,15 +26,13 @@ class ChatService:
                 logger.error(f"❌ Failed to initialize Gemini: {e}")
                 self.model = None
                 self.gemini_available = False
+        
+        self.context_builder = ContextBuilder(settings.context_token_budget, settings.context_min_section_tokens)
     
-    async def generate_response(self, query: str, code_chunks: List[Dict], repository_name: str) -> Dict:
-        if not self.gemini_available:
-            return self.generate_fallback_response(query, code_chunks, repository_name)
+    def build_prompt(self, query: str, code_chunks: List[Dict], repository_name: str) -> str:
+        context = self.prepare_context(code_chunks)
         
-        try:
-            context = self.prepare_context(code_chunks)
-            
-            prompt = f"""You are an expert code assistant analyzing the {repository_name} repository.
+        return f"""You are an expert code assistant analyzing the {repository_name} repository.
 User Question: {query}
 Code Context:
 {context}
@@ -96,34 +96,61 @@ UNIVERSAL FORMATTING RULES (MANDATORY):
 CRITICAL: Every code reference MUST include the file path and line numbers from the context provided above.
 
 Your detailed markdown response:"""
+    
+    def build_sources(self, code_chunks: List[Dict]) -> List[Dict]:
+        sources = []
+        for chunk in code_chunks:
+            sources.append({
+                'file_path': chunk['file_path'],
+                'start_line': chunk['start_line'],
+                'end_line': chunk['end_line'],
+                'similarity': round(chunk['similarity'], 3),
+                'preview': chunk['content'][:200] + "...",
+                'aliases': chunk.get('aliases', []),
+                'match': chunk.get('match', 'vector')
+            })
+        return sources
+    
+    @staticmethod
+    def clean_response_text(response_text: str) -> str:
+        if response_text.startswith("```markdown"):
+            response_text = response_text[len("```markdown"):]
+        elif response_text.startswith("```"):
+            response_text = response_text[len("```"):]
             
-            response = self.model.generate_content(prompt)
-           
-            response_text = response.text
+        if response_text.endswith("```"):
+            response_text = response_text[:-len("```")]
             
-            if response_text.startswith("```markdown"):
-                response_text = response_text[len("```markdown"):]
-            elif response_text.startswith("```"):
-                response_text = response_text[len("```"):]
-                
-            if response_text.endswith("```"):
-                response_text = response_text[:-len("```")]
-                
-            response_text = response_text.strip() 
-
-            sources = []
-            for chunk in code_chunks:
-                sources.append({
-                    'file_path': chunk['file_path'],
-                    'start_line': chunk['start_line'],
-                    'end_line': chunk['end_line'],
-                    'similarity': round(chunk['similarity'], 3),
-                    'preview': chunk['content'][:200] + "..."
-                })
+        return response_text.strip()
+    
+    @staticmethod
+    def _usage_from(response) -> Optional[Dict]:
+        usage = getattr(response, 'usage_metadata', None)
+        if not usage:
+            return None
+        return {
+            'prompt_tokens': getattr(usage, 'prompt_token_count', None),
+            'completion_tokens': getattr(usage, 'candidates_token_count', None),
+            'total_tokens': getattr(usage, 'total_token_count', None)
+        }
+    
+    def _degraded_response(self, error: Exception, query: str, code_chunks: List[Dict], repository_name: str) -> Dict:
+        if "429" in str(error) or "quota" in str(error).lower():
+            return self.generate_quota_response(query, code_chunks, repository_name)
+        return self.generate_fallback_response(query, code_chunks, repository_name)
+    
+    async def generate_response(self, query: str, code_chunks: List[Dict], repository_name: str) -> Dict:
+        if not self.gemini_available:
+            return self.generate_fallback_response(query, code_chunks, repository_name)
+        
+        try:
+            prompt = self.build_prompt(query, code_chunks, repository_name)
+            
+            response = await self.model.generate_content_async(prompt)
             
             return {
-                'response': response_text,  
-                'sources': sources,
+                'response': self.clean_response_text(response.text),
+                'sources': self.build_sources(code_chunks),
                 'context_chunks_used': len(code_chunks),
                 'repository_name': repository_name,
                 'model_used': 'gemini-2.0-flash',
@@ -132,19 +159,91 @@ Your detailed markdown response:"""
             
         except Exception as e:
             logger.error(f"❌ Gemini error: {e}")
-            if "429" in str(e) or "quota" in str(e).lower():
-                return self.generate_quota_response(query, code_chunks, repository_name)
-            return self.generate_fallback_response(query, code_chunks, repository_name)
+            return self._degraded_response(e, query, code_chunks, repository_name)
+    
+    async def stream_response(self, query: str, code_chunks: List[Dict], repository_name: str) -> AsyncIterator[Dict]:
+        """Yield ``{'type': 'delta', 'text': ...}`` events as Gemini produces them,
+        then one ``{'type': 'done', ...}`` event carrying the full response dict and usage.
+        """
+        if not self.gemini_available:
+            result = self.generate_fallback_response(query, code_chunks, repository_name)
+            yield {'type': 'delta', 'text': result['response']}
+            yield {'type': 'done', 'result': result, 'usage': None}
+            return
+        
+        prompt = self.build_prompt(query, code_chunks, repository_name)
+        parts = []
+        # Text not yet sent: held back until the opening fence is ruled out, and
+        # the last few characters in case they are the closing fence
+        pending = ""
+        opened = False
+        response = None
+        
+        try:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                text = chunk.text
+                if not text:
+                    continue
+                parts.append(text)
+                pending += text
+                
+                if not opened:
+                    if len(pending) < len("```markdown") and "```markdown".startswith(pending.lstrip()):
+                        continue
+                    pending = pending.lstrip()
+                    if pending.startswith("```markdown"):
+                        pending = pending[len("```markdown"):]
+                    elif pending.startswith("```"):
+                        pending = pending[len("```"):]
+                    pending = pending.lstrip()
+                    opened = True
+                
+                if len(pending) > 3:
+                    yield {'type': 'delta', 'text': pending[:-3]}
+                    pending = pending[-3:]
+        
+        except Exception as e:
+            logger.error(f"❌ Gemini streaming error: {e}")
+            if not parts:
+                result = self._degraded_response(e, query, code_chunks, repository_name)
+                yield {'type': 'delta', 'text': result['response']}
+                yield {'type': 'done', 'result': result, 'usage': None}
+                return
+            raise
+        
+        if not opened:
+            pending = self.clean_response_text(pending)
+        elif pending.endswith("```"):
+            pending = pending[:-3]
+        pending = pending.rstrip()
+        if pending:
+            yield {'type': 'delta', 'text': pending}
+        
+        result = {
+            'response': self.clean_response_text("".join(parts)),
+            'sources': self.build_sources(code_chunks),
+            'context_chunks_used': len(code_chunks),
+            'repository_name': repository_name,
+            'model_used': 'gemini-2.0-flash',
+            'success': True
+        }
+        yield {'type': 'done', 'result': result, 'usage': self._usage_from(response)}
     
     def prepare_context(self, code_chunks: List[Dict]) -> str:
+        """Context for the prompt: retrieved chunks merged per file and packed into CONTEXT_TOKEN_BUDGET"""
         context_sections = []
-        for i, chunk in enumerate(code_chunks, 1):
+        for i, section in enumerate(self.context_builder.build(code_chunks), 1):
+            aliases = f"\nIdentical copies: {', '.join(section.aliases)}" if section.aliases else ""
+            # Keyword-only hits have no cosine score; say why they were retrieved instead
+            relevance = "Match: exact keyword" if section.match == 'keyword' else f"Similarity: {section.similarity:.2f}"
+            truncated = " (truncated)" if section.truncated else ""
             context_sections.append(f"""
 Code Reference {i}:
-File: {chunk['file_path']}
-Lines: {chunk['start_line']}-{chunk['end_line']}
-Similarity: {chunk['similarity']:.2f}
-{chunk['content']}
+File: {section.file_path}{aliases}
+Lines: {section.start_line}-{section.end_line}{truncated}
+{relevance}
+{section.content}
 """)
         return "\n".join(context_sections)
     
@@ -165,19 +264,9 @@ Note: AI analysis requires API configuration. The search results above show the
         return self.create_response_dict(response, code_chunks, repository_name, 'fallback')
     
     def create_response_dict(self, response: str, code_chunks: List[Dict], repository_name: str, model_used: str) -> Dict:
-        sources = []
-        for chunk in code_chunks:
-            sources.append({
-                'file_path': chunk['file_path'],
-                'start_line': chunk['start_line'],
-                'end_line': chunk['end_line'],
-                'similarity': round(chunk['similarity'], 3),
-                'preview': chunk['content'][:200] + "..."
-            })
-        
         return {
             'response': response,
-            'sources': sources,
+            'sources': self.build_sources(code_chunks),
             'context_chunks_used': len(code_chunks),
             'repository_name': repository_name,
             'model_used': model_used,
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.core.metrics import metrics
+from .vector_backend import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Rows per statement; stays well below SQLite's and asyncpg's bound parameter caps
+_LOOKUP_BATCH = 500
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix, for a key range scan"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class ChunkStore(ABC):
+    """Full chunk text keyed by vector ID, zlib-compressed, behind an LRU of hot chunks.
+
+    Vector metadata only carries IDs, line ranges and a content hash; this is
+    where retrieval gets the text back. Vector IDs start with
+    ``<namespace>_<file key>_``, so a file's or a namespace's chunks share an
+    ID prefix. Cached texts are keyed by (vector ID, content hash): when a
+    worker re-indexes a file under the same IDs, the new hashes in the vector
+    metadata miss the API's stale cache entries instead of serving them.
+    """
+
+    name: str = "base"
+
+    def __init__(self, cache_bytes: int):
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._cache_limit = cache_bytes
+        self._cache_size = 0
+        self._cache_lock = threading.Lock()
+
+        self._hits = metrics.counter("chunk_store_hits", "Chunk texts found in the chunk store")
+        self._misses = metrics.counter("chunk_store_misses", "Chunk texts missing from the chunk store")
+        self._cache_hits = metrics.counter("chunk_cache_hits", "Chunk texts served from the in-memory LRU")
+        self._cache_bytes = metrics.gauge("chunk_cache_bytes", "Approximate size of the chunk texts held in the in-memory LRU")
+
+    @abstractmethod
+    async def _put(self, rows: List[Tuple[str, bytes]]):
+        """Upsert (vector ID, compressed text) rows"""
+
+    @abstractmethod
+    async def _get(self, vector_ids: List[str]) -> Dict[str, bytes]:
+        """Compressed text of the stored IDs among vector_ids"""
+
+    @abstractmethod
+    async def _delete_prefixes(self, prefixes: List[str]) -> int:
+        """Delete every row whose ID starts with one of the prefixes"""
+
+    async def put_many(self, items: List[Tuple[str, str]]):
+        """Store (vector ID, text) pairs, replacing earlier text under the same ID"""
+        if not items:
+            return
+        await self._put([(vector_id, zlib.compress(text.encode("utf-8"), 6)) for vector_id, text in items])
+
+    async def get_many(self, keys: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """Text of every stored (vector ID, content hash); missing IDs are left out.
+
+        An empty hash (vectors indexed before hashes existed) skips the cache
+        and always reads the store.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        with self._cache_lock:
+            for key in keys:
+                text = self._cache.get(key) if key[1] else None
+                if text is not None:
+                    self._cache.move_to_end(key)
+                    found[key[0]] = text
+        self._cache_hits.inc(len(found))
+
+        missing = [vector_id for vector_id, _ in keys if vector_id not in found]
+        if not missing:
+            return found
+        blobs = await self._get(missing)
+        self._hits.inc(len(blobs))
+        self._misses.inc(len(missing) - len(blobs))
+
+        fetched = {vector_id: zlib.decompress(blob).decode("utf-8") for vector_id, blob in blobs.items()}
+        self._remember(fetched)
+        found.update(fetched)
+        return found
+
+    def _remember(self, texts: Dict[str, str]):
+        if self._cache_limit <= 0:
+            return
+        with self._cache_lock:
+            for vector_id, text in texts.items():
+                key = (vector_id, content_hash(text))
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    continue
+                self._cache[key] = text
+                self._cache_size += len(text)
+            while self._cache_size > self._cache_limit and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+            self._cache_bytes.set(self._cache_size)
+
+    async def delete_prefixes(self, prefixes: Iterable[str]) -> int:
+        prefixes = [prefix for prefix in prefixes if prefix]
+        if not prefixes:
+            return 0
+        prefix_tuple = tuple(prefixes)
+        with self._cache_lock:
+            for key in [key for key in self._cache if key[0].startswith(prefix_tuple)]:
+                self._cache_size -= len(self._cache.pop(key))
+            self._cache_bytes.set(self._cache_size)
+        return await self._delete_prefixes(prefixes)
+
+    def close(self):
+        pass
+
+
+class SQLiteChunkStore(ChunkStore):
+    """Chunk store in one SQLite file, which must sit on a volume shared by the API and the ingestion workers"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, cache_bytes: int):
+        super().__init__(cache_bytes)
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                content BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._lock = threading.Lock()
+        logger.info(f"📦 Chunk store at {path}")
+
+    def _put_sync(self, rows: List[Tuple[str, bytes]]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, content) VALUES (?, ?)", rows)
+            self._conn.execute("COMMIT")
+
+    def _get_sync(self, vector_ids: List[str]) -> Dict[str, bytes]:
+        found = {}
+        with self._lock:
+            for i in range(0, len(vector_ids), _LOOKUP_BATCH):
+                batch = vector_ids[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT id, content FROM chunks WHERE id IN ({placeholders})", batch
+                ).fetchall())
+        return found
+
+    def _delete_sync(self, prefixes: List[str]) -> int:
+        ranges = [(prefix, _prefix_upper_bound(prefix)) for prefix in prefixes]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM chunks WHERE id >= ? AND id < ?", ranges)
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    async def _put(self, rows: List[Tuple[str, bytes]]):
+        await asyncio.to_thread(self._put_sync, rows)
+
+    async def _get(self, vector_ids: List[str]) -> Dict[str, bytes]:
+        return await asyncio.to_thread(self._get_sync, vector_ids)
+
+    async def _delete_prefixes(self, prefixes: List[str]) -> int:
+        return await asyncio.to_thread(self._delete_sync, prefixes)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PostgresChunkStore(ChunkStore):
+    """Chunk store in the ``chunk_contents`` table, for deployments without a shared volume"""
+
+    name = "postgres"
+
+    def __init__(self, cache_bytes: int):
+        super().__init__(cache_bytes)
+        # Imported here so the SQLite store and the benchmarks need no database
+        from app.core.database import AsyncSessionLocal
+        from app.models.chunk_content import ChunkContent
+        self._sessions = AsyncSessionLocal
+        self._model = ChunkContent
+        logger.info("📦 Chunk store in Postgres (chunk_contents)")
+
+    async def _put(self, rows: List[Tuple[str, bytes]]):
+        async with self._sessions() as db:
+            for i in range(0, len(rows), _LOOKUP_BATCH):
+                statement = insert(self._model).values([
+                    {"vector_id": vector_id, "content": blob} for vector_id, blob in rows[i:i + _LOOKUP_BATCH]
+                ])
+                await db.execute(statement.on_conflict_do_update(
+                    index_elements=[self._model.vector_id],
+                    set_={"content": statement.excluded.content},
+                ))
+            await db.commit()
+
+    async def _get(self, vector_ids: List[str]) -> Dict[str, bytes]:
+        found = {}
+        async with self._sessions() as db:
+            for i in range(0, len(vector_ids), _LOOKUP_BATCH):
+                result = await db.execute(
+                    select(self._model.vector_id, self._model.content)
+                    .where(self._model.vector_id.in_(vector_ids[i:i + _LOOKUP_BATCH]))
+                )
+                found.update((vector_id, bytes(content)) for vector_id, content in result.all())
+        return found
+
+    async def _delete_prefixes(self, prefixes: List[str]) -> int:
+        async with self._sessions() as db:
+            # IDs contain '_', a LIKE wildcard; autoescape matches it literally
+            result = await db.execute(
+                delete(self._model).where(or_(*(self._model.vector_id.startswith(prefix, autoescape=True) for prefix in prefixes)))
+            )
+            await db.commit()
+            return result.rowcount
+
+
+def create_chunk_store(name: Optional[str] = None) -> ChunkStore:
+    """Instantiate the store selected by settings.chunk_store_backend"""
+    name = (name or settings.chunk_store_backend).lower()
+    cache_bytes = settings.chunk_cache_mb * 1024 * 1024
+
+    if name == "sqlite":
+        return SQLiteChunkStore(settings.chunk_store_path, cache_bytes)
+    if name == "postgres":
+        return PostgresChunkStore(cache_bytes)
+
+    raise ValueError(f"Unknown chunk store backend: {name}")
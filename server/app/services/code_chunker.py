@@ -0,0 +1,291 @@
+import ast
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever chunk boundaries or chunk text change, so indexes built with an
+# older chunker can be told apart from current ones
+CHUNKER_VERSION = "ast-2"
+
+# Extension -> tree-sitter grammar name (tree_sitter_languages naming)
+TREE_SITTER_LANGUAGES = {
+    '.js': 'javascript', '.jsx': 'javascript', '.ts': 'typescript', '.tsx': 'tsx',
+    '.java': 'java', '.c': 'c', '.h': 'c', '.cpp': 'cpp', '.cc': 'cpp', '.cxx': 'cpp',
+    '.hpp': 'cpp', '.cs': 'c_sharp', '.go': 'go', '.rs': 'rust', '.php': 'php',
+    '.rb': 'ruby', '.kt': 'kotlin', '.scala': 'scala', '.dart': 'dart', '.r': 'r',
+    '.m': 'objc', '.mm': 'objc', '.swift': 'swift',
+}
+
+_CLASS_NODE_TYPES = {
+    'class_declaration', 'class_definition', 'class_specifier', 'struct_specifier',
+    'interface_declaration', 'enum_declaration', 'trait_item', 'impl_item', 'struct_item',
+    'enum_item', 'mod_item', 'class', 'module', 'object_declaration', 'object_definition',
+    'trait_definition', 'record_declaration', 'namespace_definition', 'type_declaration',
+}
+_FUNCTION_NODE_TYPES = {
+    'function_declaration', 'function_definition', 'method_definition', 'method_declaration',
+    'constructor_declaration', 'function_item', 'method', 'singleton_method', 'arrow_function',
+    'generator_function_declaration', 'func_literal', 'function_signature_item',
+}
+# Nodes that wrap a single definition and should be kept with it (export, decorators, templates)
+_WRAPPER_NODE_TYPES = {'export_statement', 'decorated_definition', 'template_declaration', 'lexical_declaration'}
+
+
+@dataclass
+class _Span:
+    """A definition in the source: 1-based inclusive line range plus nested definitions"""
+    start: int
+    end: int
+    kind: str
+    name: str
+    children: List["_Span"] = field(default_factory=list)
+
+
+@dataclass
+class _Unit:
+    start: int
+    end: int
+    kind: str
+    scope: List[str]
+
+
+class CodeChunker:
+    """Split source files along function/class/method boundaries.
+
+    Python is parsed with the standard library ``ast``; other languages use
+    tree-sitter when ``tree_sitter_languages`` is installed. Anything that does
+    not parse falls back to the line chunker. Definitions larger than
+    ``max_chunk_size`` are split into their header and members, members that
+    are still too large are split by lines, and runs of tiny neighbours are
+    merged until they reach ``min_chunk_size``.
+    """
+
+    def __init__(self, max_chunk_size: int = 1000, min_chunk_size: int = 200, syntax_aware: bool = True):
+        self.max_chunk_size = max_chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.syntax_aware = syntax_aware
+        self._parsers: Dict[str, object] = {}
+        self._get_parser = None
+
+        if syntax_aware:
+            try:
+                from tree_sitter_languages import get_parser
+                self._get_parser = get_parser
+            except ImportError:
+                logger.info("🌳 tree_sitter_languages not installed; non-Python files use the line chunker")
+
+    def chunk(self, content: str, file_path: str) -> List[Dict]:
+        lines = content.split('\n')
+
+        if len(content) <= self.max_chunk_size:
+            return [{
+                'content': content,
+                'file_path': file_path,
+                'chunk_index': 0,
+                'start_line': 1,
+                'end_line': len(lines),
+                'chunk_type': 'full_file'
+            }]
+
+        spans = self.parse_spans(content, file_path) if self.syntax_aware else None
+        if spans is None:
+            return self.chunk_by_lines(content, file_path)
+
+        units = self._split(lines, spans, 1, len(lines), [])
+        units = self._merge_small(lines, units)
+
+        chunks = []
+        for unit in units:
+            text = '\n'.join(lines[unit.start - 1:unit.end])
+            if not text.strip():
+                continue
+            chunk = {
+                'content': text,
+                'file_path': file_path,
+                'chunk_index': len(chunks),
+                'start_line': unit.start,
+                'end_line': unit.end,
+                'chunk_type': unit.kind
+            }
+            if unit.scope:
+                chunk['scope'] = ' > '.join(unit.scope)
+            chunks.append(chunk)
+        return chunks
+
+    def parse_spans(self, content: str, file_path: str) -> Optional[List[_Span]]:
+        """Top-level definitions of the file, or None when it cannot be parsed"""
+        extension = '.' + file_path.rsplit('.', 1)[-1].lower() if '.' in file_path else ''
+
+        if extension == '.py':
+            try:
+                tree = ast.parse(content)
+            except (SyntaxError, ValueError):
+                return None
+            return self._python_spans(tree.body)
+
+        language = TREE_SITTER_LANGUAGES.get(extension)
+        if language and self._get_parser:
+            try:
+                parser = self._parsers.get(language)
+                if parser is None:
+                    parser = self._parsers[language] = self._get_parser(language)
+                tree = parser.parse(content.encode('utf-8'))
+            except Exception as e:
+                logger.debug(f"tree-sitter failed on {file_path}: {e}")
+                return None
+            if tree.root_node.has_error:
+                return None
+            return self._tree_sitter_spans(tree.root_node)
+
+        return None
+
+    def _python_spans(self, body: List[ast.stmt]) -> List[_Span]:
+        spans = []
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                if isinstance(node, ast.ClassDef):
+                    spans.append(_Span(start, node.end_lineno, 'class', node.name, self._python_spans(node.body)))
+                else:
+                    spans.append(_Span(start, node.end_lineno, 'function', node.name))
+        return spans
+
+    def _tree_sitter_spans(self, node) -> List[_Span]:
+        spans = []
+        for child in node.named_children:
+            if child.type in _CLASS_NODE_TYPES or child.type in _FUNCTION_NODE_TYPES:
+                spans.append(self._tree_sitter_span(child, child))
+                continue
+
+            inner = self._tree_sitter_spans(child)
+            if child.type in _WRAPPER_NODE_TYPES and len(inner) == 1:
+                # Keep `export`, decorators or `template<>` attached to the definition
+                wrapped = inner[0]
+                spans.append(_Span(child.start_point[0] + 1, child.end_point[0] + 1, wrapped.kind, wrapped.name, wrapped.children))
+            else:
+                spans.extend(inner)
+        return spans
+
+    def _tree_sitter_span(self, outer, node) -> _Span:
+        name_node = node.child_by_field_name('name')
+        name = name_node.text.decode('utf-8', errors='ignore') if name_node is not None else ''
+        is_class = node.type in _CLASS_NODE_TYPES
+        children = self._tree_sitter_spans(node) if is_class else []
+        return _Span(outer.start_point[0] + 1, outer.end_point[0] + 1, 'class' if is_class else 'function', name, children)
+
+    def _size(self, lines: List[str], start: int, end: int) -> int:
+        return sum(len(line) + 1 for line in lines[start - 1:end])
+
+    def _split(self, lines: List[str], spans: List[_Span], region_start: int, region_end: int, scope: List[str]) -> List[_Unit]:
+        units = []
+        cursor = region_start
+
+        for span in sorted(spans, key=lambda s: s.start):
+            if span.start < cursor or span.end > region_end:
+                continue
+            if span.start > cursor:
+                units.append(_Unit(cursor, span.start - 1, 'code_block', scope))
+
+            label = f"{span.kind} {span.name}".strip()
+            if self._size(lines, span.start, span.end) <= self.max_chunk_size:
+                units.append(_Unit(span.start, span.end, span.kind, scope))
+            elif span.children:
+                first_child = min(child.start for child in span.children)
+                if first_child > span.start:
+                    if self._size(lines, span.start, first_child - 1) > self.max_chunk_size:
+                        units.extend(self._split_lines(lines, span.start, first_child - 1, f"{span.kind}_header", scope))
+                    else:
+                        units.append(_Unit(span.start, first_child - 1, f"{span.kind}_header", scope))
+                units.extend(self._split(lines, span.children, first_child, span.end, scope + [label]))
+            else:
+                units.extend(self._split_lines(lines, span.start, span.end, f"{span.kind}_part", scope + [label]))
+
+            cursor = span.end + 1
+
+        if cursor <= region_end:
+            units.append(_Unit(cursor, region_end, 'code_block', scope))
+
+        # Module-level code between definitions can be large too
+        result = []
+        for unit in units:
+            if unit.kind == 'code_block' and self._size(lines, unit.start, unit.end) > self.max_chunk_size:
+                result.extend(self._split_lines(lines, unit.start, unit.end, 'code_block', unit.scope))
+            elif any(line.strip() for line in lines[unit.start - 1:unit.end]):
+                result.append(unit)
+        return result
+
+    def _split_lines(self, lines: List[str], start: int, end: int, kind: str, scope: List[str]) -> List[_Unit]:
+        units = []
+        piece_start, size = start, 0
+        for line_no in range(start, end + 1):
+            line_size = len(lines[line_no - 1]) + 1
+            if size and size + line_size > self.max_chunk_size:
+                units.append(_Unit(piece_start, line_no - 1, kind, scope))
+                piece_start, size = line_no, 0
+            size += line_size
+        units.append(_Unit(piece_start, end, kind, scope))
+        return units
+
+    def _merge_small(self, lines: List[str], units: List[_Unit]) -> List[_Unit]:
+        """Fold undersized units into an adjacent unit of the same scope while the result still fits"""
+        merged: List[_Unit] = []
+        for unit in units:
+            if merged:
+                previous = merged[-1]
+                adjacent = previous.end + 1 == unit.start and previous.scope == unit.scope
+                small = (self._size(lines, previous.start, previous.end) < self.min_chunk_size
+                         or self._size(lines, unit.start, unit.end) < self.min_chunk_size)
+                if adjacent and small and self._size(lines, previous.start, unit.end) <= self.max_chunk_size:
+                    kind = previous.kind if previous.kind == unit.kind else (
+                        unit.kind if previous.kind == 'code_block' else 'code_block')
+                    merged[-1] = _Unit(previous.start, unit.end, kind, previous.scope)
+                    continue
+            merged.append(unit)
+        return merged
+
+    def chunk_by_lines(self, content: str, file_path: str) -> List[Dict]:
+        """Line-based fallback: fixed size budget, cutting before obvious definition starts"""
+        chunks = []
+        lines = content.split('\n')
+
+        current_chunk = []
+        current_size = 0
+        chunk_index = 0
+        start_line = 1
+
+        for i, line in enumerate(lines, 1):
+            current_chunk.append(line)
+            current_size += len(line) + 1  # +1 for newline
+
+            is_function_start = any(line.strip().startswith(keyword) for keyword in
+                                  ['def ', 'function ', 'class ', 'interface ', 'public class'])
+
+            if (current_size >= self.max_chunk_size) or (is_function_start and len(current_chunk) > 1):
+                if len(current_chunk) > 1:
+                    chunks.append({
+                        'content': '\n'.join(current_chunk[:-1] if is_function_start else current_chunk),
+                        'file_path': file_path,
+                        'chunk_index': chunk_index,
+                        'start_line': start_line,
+                        'end_line': i - (1 if is_function_start else 0),
+                        'chunk_type': 'code_block'
+                    })
+                    chunk_index += 1
+                    start_line = i if is_function_start else i + 1
+                    current_chunk = [line] if is_function_start else []
+                    current_size = len(line) + 1 if is_function_start else 0
+
+        # Add remaining chunk
+        if current_chunk:
+            chunks.append({
+                'content': '\n'.join(current_chunk),
+                'file_path': file_path,
+                'chunk_index': chunk_index,
+                'start_line': start_line,
+                'end_line': len(lines),
+                'chunk_type': 'code_block'
+            })
+
+        return chunks
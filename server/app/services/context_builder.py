@@ -0,0 +1,154 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Identifier runs and single punctuation marks; code tokenizes roughly this way in BPE vocabularies
+_TOKEN = re.compile(r"[A-Za-z0-9_]+|[^\sA-Za-z0-9_]")
+# Characters per token inside long identifiers and words
+_CHARS_PER_TOKEN = 4
+# File, line range and relevance header the prompt adds to every section
+SECTION_OVERHEAD_TOKENS = 25
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count of text, without a round trip to the model's tokenizer"""
+    return sum(
+        max(1, math.ceil(len(token) / _CHARS_PER_TOKEN)) if token[0].isalnum() or token[0] == '_' else 1
+        for token in _TOKEN.findall(text)
+    )
+
+
+@dataclass
+class ContextSection:
+    """A contiguous span of one file to show the model, made of one or more retrieved chunks"""
+    file_path: str
+    start_line: int
+    end_line: int
+    lines: List[str]
+    value: float
+    similarity: float
+    match: str
+    aliases: List[str] = field(default_factory=list)
+    chunks: int = 1
+    truncated: bool = False
+    # First line and value of the best-ranked chunk in the section; truncation keeps the text from here
+    focus_line: int = 0
+    focus_value: float = 0.0
+
+    @property
+    def content(self) -> str:
+        return '\n'.join(self.lines)
+
+    @property
+    def complete(self) -> bool:
+        """True when the text covers every line of the range, so neighbours can be spliced onto it"""
+        return len(self.lines) == self.end_line - self.start_line + 1
+
+
+class ContextBuilder:
+    """Packs retrieved chunks into a token budget for the prompt.
+
+    Chunks arrive best first. Overlapping or adjacent chunks of the same file
+    are merged into one section (their value adds up), sections are taken by
+    value until the budget is spent, and the first one that does not fit is
+    cut at a line boundary if at least ``min_section_tokens`` remain.
+    """
+
+    def __init__(self, token_budget: int, min_section_tokens: int = 120):
+        self.token_budget = token_budget
+        self.min_section_tokens = min_section_tokens
+
+    def build(self, chunks: List[Dict]) -> List[ContextSection]:
+        # Chunks whose text could not be found have nothing to show
+        chunks = [chunk for chunk in chunks if chunk.get('content')]
+        sections = self._merge([self._section(rank, chunk) for rank, chunk in enumerate(chunks, 1)])
+        sections.sort(key=lambda section: section.value, reverse=True)
+
+        packed: List[ContextSection] = []
+        remaining = self.token_budget
+        for section in sections:
+            cost = estimate_tokens(section.content) + SECTION_OVERHEAD_TOKENS
+            if cost <= remaining:
+                packed.append(section)
+                remaining -= cost
+            elif remaining >= self.min_section_tokens:
+                cut = self._truncate(section, remaining - SECTION_OVERHEAD_TOKENS)
+                if cut is not None:
+                    packed.append(cut)
+                    remaining -= estimate_tokens(cut.content) + SECTION_OVERHEAD_TOKENS
+            if remaining < self.min_section_tokens:
+                break
+        return packed
+
+    @staticmethod
+    def _section(rank: int, chunk: Dict) -> ContextSection:
+        return ContextSection(
+            file_path=chunk['file_path'],
+            start_line=chunk['start_line'],
+            end_line=chunk['end_line'],
+            lines=chunk['content'].split('\n'),
+            # Reciprocal rank: retrievers and the reranker score on unrelated scales
+            value=1.0 / rank,
+            similarity=chunk.get('similarity', 0.0),
+            match=chunk.get('match', 'vector'),
+            aliases=list(chunk.get('aliases') or []),
+            focus_line=chunk['start_line'],
+            focus_value=1.0 / rank,
+        )
+
+    @staticmethod
+    def _merge(sections: List[ContextSection]) -> List[ContextSection]:
+        merged: List[ContextSection] = []
+        for section in sorted(sections, key=lambda s: (s.file_path, s.start_line, s.end_line)):
+            previous = merged[-1] if merged else None
+            if (previous is None or previous.file_path != section.file_path
+                    or section.start_line > previous.end_line + 1
+                    or not (previous.complete and section.complete)):
+                merged.append(section)
+                continue
+
+            if section.end_line > previous.end_line:
+                previous.lines = previous.lines + section.lines[previous.end_line - section.start_line + 1:]
+                previous.end_line = section.end_line
+            if section.focus_value > previous.focus_value:
+                previous.focus_line, previous.focus_value = section.focus_line, section.focus_value
+            previous.value += section.value
+            previous.similarity = max(previous.similarity, section.similarity)
+            previous.match = previous.match if previous.match == section.match else 'both'
+            previous.aliases = list(dict.fromkeys(previous.aliases + section.aliases))
+            previous.chunks += 1
+        return merged
+
+    @staticmethod
+    def _truncate(section: ContextSection, budget: int) -> Optional[ContextSection]:
+        """Longest run of whole lines that fits, grown forward from the focus line and then backward"""
+        focus = min(max(section.focus_line - section.start_line, 0), len(section.lines) - 1)
+        first, last, used = focus, focus - 1, 0
+        for index in range(focus, len(section.lines)):
+            cost = estimate_tokens(section.lines[index]) + 1
+            if used + cost > budget:
+                break
+            last, used = index, used + cost
+        if last == len(section.lines) - 1:
+            for index in range(focus - 1, -1, -1):
+                cost = estimate_tokens(section.lines[index]) + 1
+                if used + cost > budget:
+                    break
+                first, used = index, used + cost
+        if last < first:
+            return None
+        return ContextSection(
+            file_path=section.file_path,
+            start_line=section.start_line + first,
+            end_line=section.start_line + last,
+            lines=section.lines[first:last + 1],
+            value=section.value,
+            similarity=section.similarity,
+            match=section.match,
+            aliases=section.aliases,
+            chunks=section.chunks,
+            truncated=True,
+            focus_line=section.focus_line,
+            focus_value=section.focus_value,
+        )
@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps bound parameters per statement; stay well below it
+_LOOKUP_BATCH = 500
+# Rough per-row overhead of key, timestamp and B-tree bookkeeping
+_ROW_OVERHEAD_BYTES = 96
+
+
+class EmbeddingCache:
+    """Persistent content-addressed embedding cache.
+
+    Keys are SHA-256 of the model name plus the exact text fed to the model,
+    values are raw float32 vectors. The least recently used rows are evicted
+    once the store grows past its size budget.
+    """
+
+    def __init__(self, path: str, model_name: str, dimension: int, max_mb: int = 512):
+        self.path = path
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max(1, (max_mb * 1024 * 1024) // (dimension * 4 + _ROW_OVERHEAD_BYTES))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._lock = threading.Lock()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        self._hits = metrics.counter("embedding_cache_hits", "Chunk embeddings served from the cache")
+        self._misses = metrics.counter("embedding_cache_misses", "Chunk embeddings that had to be computed")
+        self._evictions = metrics.counter("embedding_cache_evictions", "Rows evicted from the embedding cache")
+        self._size = metrics.gauge("embedding_cache_entries", "Rows currently in the embedding cache")
+        self._hit_rate = metrics.gauge("embedding_cache_hit_rate", "Lifetime hit rate of the embedding cache")
+        self._size.set(self._entries)
+
+        logger.info(f"🗃️ Embedding cache at {path} ({self._entries} entries, limit {self.max_entries})")
+
+    def key_for(self, text: str) -> bytes:
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up texts; returns a vector or None per input, in order"""
+        keys = [self.key_for(text) for text in texts]
+        found = {}
+
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+
+        results = []
+        for key in keys:
+            blob = found.get(key)
+            results.append(np.frombuffer(blob, dtype=np.float32) if blob is not None else None)
+
+        hits = sum(1 for r in results if r is not None)
+        self._hits.inc(hits)
+        self._misses.inc(len(results) - hits)
+        total = self._hits.value + self._misses.value
+        if total:
+            self._hit_rate.set(self._hits.value / total)
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (self.key_for(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+            self._entries += self._conn.total_changes - before
+
+            if self._entries > self.max_entries:
+                self._evict()
+
+        self._size.set(self._entries)
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction does not run on every insert
+        target = int(self.max_entries * 0.9)
+        excess = self._entries - target
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._evictions.inc(excess)
+        logger.info(f"🧹 Evicted {excess} embeddings from cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingPoolBusy(Exception):
+    """Raised when the query queue stays full for longer than the configured wait"""
+
+
+class EmbeddingJobCancelled(Exception):
+    """Raised inside a bulk job after cancel_job() was called for it"""
+
+
+def load_sentence_transformer(model_name: str, cache_dir: str):
+    """Load a SentenceTransformer from the shared model cache"""
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ['HUGGINGFACE_HUB_CACHE'] = cache_dir
+    os.environ['TRANSFORMERS_CACHE'] = cache_dir
+    os.environ['HF_HOME'] = cache_dir
+
+    return SentenceTransformer(model_name, cache_folder=cache_dir, device='cpu')
+
+
+# Per-process model used by the bulk process pool workers
+_worker_model = None
+
+
+def _init_worker(model_name: str, cache_dir: str):
+    global _worker_model
+    _worker_model = load_sentence_transformer(model_name, cache_dir)
+
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+
+
+class EmbeddingJob:
+    """Handle for one bulk encoding job"""
+
+    def __init__(self, job_id: str, total: int):
+        self.job_id = job_id
+        self.total = total
+        self.done = 0
+        self.cancelled = False
+        self.created_at = time.time()
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class EmbeddingPool:
+    """Runs SentenceTransformer encoding off the event loop.
+
+    Queries go to a small thread pool sharing the already-loaded model;
+    bulk ingestion goes to a separate pool (processes by default) so a large
+    repository never competes with chat queries for the same workers.
+    """
+
+    def __init__(self, model, model_name: str, cache_dir: str):
+        self.model = model
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+
+        self.query_executor = ThreadPoolExecutor(
+            max_workers=settings.embedding_query_threads,
+            thread_name_prefix="embed-query"
+        )
+        self.bulk_executor = self._create_bulk_executor()
+
+        self._query_slots = asyncio.Semaphore(settings.embedding_max_pending_queries)
+        self._bulk_slots = asyncio.Semaphore(settings.embedding_max_bulk_jobs)
+        self._jobs: Dict[str, EmbeddingJob] = {}
+        # Cancelled job ids stay here so batches submitted later by a streaming ingest are refused too
+        self._cancelled: Dict[str, float] = {}
+
+        self._query_latency = metrics.histogram("embedding_query_seconds", "Query encode latency including queue wait")
+        self._bulk_batch_latency = metrics.histogram("embedding_bulk_batch_seconds", "Latency of one bulk encode sub-batch")
+        self._pending_queries = metrics.gauge("embedding_pending_queries", "Queries waiting for or running on the query pool")
+        self._active_bulk_jobs = metrics.gauge("embedding_active_bulk_jobs", "Bulk jobs currently encoding")
+        self._rejected_queries = metrics.counter("embedding_rejected_queries", "Queries rejected because the queue was full")
+
+    def _create_bulk_executor(self) -> Executor:
+        if settings.embedding_bulk_executor == "process":
+            try:
+                return ProcessPoolExecutor(
+                    max_workers=settings.embedding_bulk_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.cache_dir)
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Could not start embedding process pool, using threads: {e}")
+
+        return self._create_bulk_threads()
+
+    def _create_bulk_threads(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
+            max_workers=settings.embedding_bulk_workers,
+            thread_name_prefix="embed-bulk"
+        )
+
+    def _fall_back_to_threads(self, broken: Executor):
+        """Replace a broken process pool with threads sharing the loaded model"""
+        # Concurrent jobs all see the same broken pool; only the first one swaps it
+        if self.bulk_executor is not broken:
+            return
+        logger.warning("⚠️ Embedding process pool broke (worker died or could not start), using threads")
+        self.bulk_executor = self._create_bulk_threads()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _encode_sub_batch(self, batch: List[str], batch_size: int):
+        loop = asyncio.get_running_loop()
+        executor = self.bulk_executor
+        if isinstance(executor, ProcessPoolExecutor):
+            try:
+                return await loop.run_in_executor(executor, _encode_in_worker, batch, batch_size)
+            except BrokenProcessPool:
+                self._fall_back_to_threads(executor)
+        return await loop.run_in_executor(
+            self.bulk_executor,
+            lambda: self.model.encode(batch, batch_size=batch_size, show_progress_bar=False)
+        )
+
+    @property
+    def uses_processes(self) -> bool:
+        return isinstance(self.bulk_executor, ProcessPoolExecutor)
+
+    async def encode_query(self, texts):
+        """Encode one string (or a short list) on the query pool"""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._query_slots.acquire(), timeout=settings.embedding_queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected_queries.inc()
+            raise EmbeddingPoolBusy("Embedding queue is full, try again shortly")
+
+        self._pending_queries.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.query_executor, self.model.encode, texts)
+        finally:
+            self._pending_queries.dec()
+            self._query_slots.release()
+            self._query_latency.observe(time.perf_counter() - start)
+
+    async def encode_bulk(self, texts: List[str], job_id: Optional[str] = None, batch_size: int = 32) -> np.ndarray:
+        """Encode a large list of texts in sub-batches on the bulk pool.
+
+        Only a limited number of bulk jobs run at once; others wait here.
+        Cancelling the job (or the awaiting task) stops it at the next
+        sub-batch boundary.
+        """
+        job = EmbeddingJob(job_id or uuid.uuid4().hex, len(texts))
+        if job.job_id in self._cancelled:
+            raise EmbeddingJobCancelled(f"Embedding job {job.job_id} was cancelled")
+        self._jobs[job.job_id] = job
+
+        try:
+            async with self._bulk_slots:
+                self._active_bulk_jobs.inc()
+                try:
+                    return await self._run_bulk(job, texts, batch_size)
+                finally:
+                    self._active_bulk_jobs.dec()
+        finally:
+            self._jobs.pop(job.job_id, None)
+
+    async def _run_bulk(self, job: EmbeddingJob, texts: List[str], batch_size: int) -> np.ndarray:
+        sub_batch = settings.embedding_bulk_sub_batch
+        parts = []
+
+        for i in range(0, len(texts), sub_batch):
+            if job.cancelled:
+                raise EmbeddingJobCancelled(f"Embedding job {job.job_id} was cancelled")
+
+            batch = texts[i:i + sub_batch]
+            start = time.perf_counter()
+            result = await self._encode_sub_batch(batch, batch_size)
+            self._bulk_batch_latency.observe(time.perf_counter() - start)
+
+            parts.append(np.asarray(result, dtype=np.float32))
+            job.done += len(batch)
+            print(f"✅ [EMBED] Job {job.job_id}: {job.done}/{job.total} embeddings", flush=True)
+
+        if not parts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.vstack(parts)
+
+    def cancel_job(self, job_id: str) -> bool:
+        self._cancelled[job_id] = time.time()
+        while len(self._cancelled) > 1000:
+            self._cancelled.pop(next(iter(self._cancelled)))
+
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        logger.info(f"🛑 Cancelling embedding job {job_id}")
+        return True
+
+    def reset_job(self, job_id: str):
+        self._cancelled.pop(job_id, None)
+
+    def jobs(self) -> List[Dict]:
+        return [
+            {"job_id": job.job_id, "total": job.total, "done": job.done, "cancelled": job.cancelled}
+            for job in self._jobs.values()
+        ]
+
+    def shutdown(self):
+        for job in self._jobs.values():
+            job.cancel()
+        self.query_executor.shutdown(wait=False, cancel_futures=True)
+        self.bulk_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,31 +1,32 @@
-import os
-from sentence_transformers import SentenceTransformer
+import asyncio
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
+from app.core.config import settings
+from .embedding_cache import EmbeddingCache
+from .embedding_pool import EmbeddingPool, load_sentence_transformer
+from .query_batcher import QueryBatcher
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
     def __init__(self):
         try:
-
             cache_dir = "/app/models_cache"
-            os.makedirs(cache_dir, exist_ok=True)
-            
-
-            os.environ['HUGGINGFACE_HUB_CACHE'] = cache_dir
-            os.environ['TRANSFORMERS_CACHE'] = cache_dir
-            os.environ['HF_HOME'] = cache_dir
+            self.model_name = 'all-MiniLM-L6-v2'
+            self.cache_dir = cache_dir
             
             print(f"🔧 [CACHE] Using cache directory: {cache_dir}", flush=True)
             logger.info(f"🔧 Using cache directory: {cache_dir}")
             
-            self.model = SentenceTransformer(
-                'all-MiniLM-L6-v2',
-                cache_folder=cache_dir,
-                device='cpu'
-            )
+            self.model = load_sentence_transformer(self.model_name, cache_dir)
+            self.pool = EmbeddingPool(self.model, self.model_name, cache_dir)
+            self.batcher = QueryBatcher(
+                self.pool.encode_query,
+                max_batch_size=settings.query_batch_max_size,
+                window_ms=settings.query_batch_window_ms
+            ) if settings.query_batching_enabled else None
+            self.cache = self._create_cache()
             
             print("✅ [MODEL] SentenceTransformer loaded successfully!", flush=True)
             logger.info("🤖 Local embedding service initialized (all-MiniLM-L6-v2)")
@@ -35,44 +36,82 @@ class EmbeddingService:
             logger.error(f"❌ Failed to load SentenceTransformer model: {e}")
             raise Exception(f"Failed to initialize local embedding model: {e}")
     
-    async def generate_embedding(self, text: str, title: str = "") -> List[float]:
+    def _create_cache(self) -> Optional[EmbeddingCache]:
+        if not settings.embedding_cache_enabled:
+            return None
+        try:
+            return EmbeddingCache(
+                settings.embedding_cache_path,
+                self.model_name,
+                self.model.get_sentence_embedding_dimension(),
+                max_mb=settings.embedding_cache_max_mb
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache unavailable, continuing without it: {e}")
+            return None
+    
+    async def _encode_with_cache(self, texts: List[str], job_id: Optional[str]) -> np.ndarray:
+        """Encode texts, reusing cached vectors for any text seen before"""
+        if not self.cache:
+            return await self.pool.encode_bulk(texts, job_id=job_id, batch_size=32)
+        
+        cached = await asyncio.to_thread(self.cache.get_many, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        print(f"🗃️ [EMBED] Cache hits: {len(texts) - len(missing)}/{len(texts)}", flush=True)
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = await self.pool.encode_bulk(missing_texts, job_id=job_id, batch_size=32)
+            await asyncio.to_thread(self.cache.put_many, missing_texts, computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+        
+        if not cached:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.vstack(cached)
+    
+    async def generate_embedding(self, text: str, title: str = "") -> np.ndarray:
         try:
             content = f"File: {title}\n\nCode:\n{text}" if title else text
-            embedding = self.model.encode(content)
-            return embedding.tolist()
+            return np.asarray(await self.pool.encode_query(content), dtype=np.float32)
         except Exception as e:
             logger.error(f"❌ Error generating local embedding: {e}")
             raise
     
-    async def generate_embeddings_batch(self, chunks: List[Dict]) -> List[Dict]:
-        print(f"🧠 [EMBED] Generating LOCAL embeddings for {len(chunks)} chunks...", flush=True)
-        logger.info(f"🔄 Generating LOCAL embeddings for {len(chunks)} chunks...")
-        
-        texts = []
-        for chunk in chunks:
-            content = f"""File: {chunk['file_path']}
+    def build_embedding_text(self, chunk: Dict) -> str:
+        """Exact text fed to the model for a chunk"""
+        scope = f"Scope: {chunk['scope']}\n" if chunk.get('scope') else ""
+        return f"""File: {chunk['file_path']}
 Lines: {chunk['start_line']}-{chunk['end_line']}
 Type: {chunk['chunk_type']}
-Code:
+{scope}Code:
 {chunk['content']}"""
-            texts.append(content)
+    
+    async def embed_chunks(self, chunks: List[Dict], job_id: Optional[str] = None) -> List[Dict]:
+        """Embed one batch of chunks without the progress banners (used per pipeline batch).
+
+        Each chunk's ``embedding`` is a float32 row view of the batch matrix;
+        backends convert it only where their wire format needs it.
+        """
+        texts = [self.build_embedding_text(chunk) for chunk in chunks]
+        embeddings = np.ascontiguousarray(await self._encode_with_cache(texts, job_id), dtype=np.float32)
+        
+        return [
+            {
+                **chunk,
+                'embedding': embedding,
+                'content_length': len(chunk['content'])
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+    
+    async def generate_embeddings_batch(self, chunks: List[Dict], job_id: Optional[str] = None) -> List[Dict]:
+        print(f"🧠 [EMBED] Generating LOCAL embeddings for {len(chunks)} chunks...", flush=True)
+        logger.info(f"🔄 Generating LOCAL embeddings for {len(chunks)} chunks...")
         
         try:
-            print(f"⚡ [EMBED] Processing {len(texts)} texts with SentenceTransformer...", flush=True)
-            embeddings = self.model.encode(texts, show_progress_bar=True, batch_size=32)
-            
-            embedded_chunks = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                embedded_chunk = {
-                    **chunk,
-                    'embedding': embedding.tolist(),
-                    'content_length': len(chunk['content'])
-                }
-                embedded_chunks.append(embedded_chunk)
-                
-                if (i + 1) % 10 == 0:
-                    print(f"✅ [EMBED] Processed {i + 1}/{len(chunks)} embeddings", flush=True)
-                    
+            print(f"⚡ [EMBED] Processing {len(chunks)} texts with SentenceTransformer...", flush=True)
+            embedded_chunks = await self.embed_chunks(chunks, job_id)
         except Exception as e:
             print(f"❌ [EMBED] Failed to generate batch embeddings: {e}", flush=True)
             logger.error(f"❌ Failed to generate batch embeddings: {e}")
@@ -82,10 +121,28 @@ Code:
         logger.info(f"✅ Generated {len(embedded_chunks)} LOCAL embeddings successfully")
         return embedded_chunks
     
-    async def generate_query_embedding(self, query: str) -> List[float]:
+    async def generate_query_embedding(self, query: str) -> np.ndarray:
         try:
-            embedding = self.model.encode(query)
-            return embedding.tolist()
+            if self.batcher:
+                embedding = await self.batcher.submit(query)
+            else:
+                embedding = await self.pool.encode_query(query)
+            return np.asarray(embedding, dtype=np.float32)
         except Exception as e:
             logger.error(f"❌ Error generating query embedding: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def cancel_job(self, job_id: str) -> bool:
+        """Stop a bulk embedding job at its next sub-batch (and refuse later batches of it)"""
+        return self.pool.cancel_job(job_id)
+    
+    def reset_job(self, job_id: str):
+        """Clear an earlier cancellation so the job id can be reused"""
+        self.pool.reset_job(job_id)
+    
+    async def close(self):
+        if self.batcher:
+            await self.batcher.close()
+        self.pool.shutdown()
+        if self.cache:
+            self.cache.close()
\ No newline at end of file
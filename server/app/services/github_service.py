@@ -1,13 +1,97 @@
+import asyncio
 import git
+import multiprocessing
 import os
+import re
 import tempfile
 import shutil
-from typing import List, Dict
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, Optional, Set, Tuple
 from pathlib import Path
 import logging
+from app.core.config import settings
+from app.core.metrics import metrics
+from .code_chunker import CodeChunker
+from .mirror_cache import MirrorCheckout, get_mirror_cache
 
 logger = logging.getLogger(__name__)
 
+_files_extracted = metrics.counter("extraction_files", "Code files read and chunked")
+_bytes_extracted = metrics.counter("extraction_bytes", "Bytes of code files read and chunked")
+_read_errors = metrics.counter("extraction_read_errors", "Code files that could not be read")
+_duplicate_files = metrics.counter("extraction_duplicate_files", "Files skipped because an identical blob was already extracted")
+_files_per_second = metrics.gauge("extraction_files_per_second", "File throughput of the most recent extraction")
+_bytes_per_second = metrics.gauge("extraction_bytes_per_second", "Byte throughput of the most recent extraction")
+
+# Shared by every ingestion job in the process; created on first multi-shard extraction
+_extraction_executor: Optional[Executor] = None
+
+# Per-worker chunkers, keyed by (max_chunk_size, min_chunk_size, syntax_aware)
+_worker_chunkers: Dict[Tuple, CodeChunker] = {}
+
+
+def get_extraction_executor() -> Executor:
+    global _extraction_executor
+    if _extraction_executor is None:
+        workers = settings.extraction_workers or min(4, os.cpu_count() or 1)
+        if settings.extraction_executor == "process":
+            try:
+                _extraction_executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Could not start extraction process pool, using threads: {e}")
+        if _extraction_executor is None:
+            _extraction_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+        logger.info(f"🧵 Extraction pool started with {workers} {settings.extraction_executor} workers")
+    return _extraction_executor
+
+
+def shutdown_extraction_executor():
+    global _extraction_executor
+    if _extraction_executor is not None:
+        _extraction_executor.shutdown(wait=False, cancel_futures=True)
+        _extraction_executor = None
+
+
+def chunk_with_fallback(chunker: CodeChunker, content: str, file_path: str) -> List[Dict]:
+    try:
+        return chunker.chunk(content, file_path)
+    except Exception as e:
+        logger.warning(f"⚠️ Syntax-aware chunking failed for {file_path}, using line chunker: {e}")
+        return chunker.chunk_by_lines(content, file_path)
+
+
+def extract_shard(files: List[Tuple[str, str, int]], max_chunk_size: int, min_chunk_size: int,
+                  syntax_aware: bool) -> List[Tuple[str, List[Dict], int, Optional[str]]]:
+    """Read and chunk one shard of files; runs inside an extraction worker.
+
+    Returns (relative path, chunks, bytes read, error) per file, in input order.
+    A file that cannot be read comes back with no chunks and the error message.
+    """
+    key = (max_chunk_size, min_chunk_size, syntax_aware)
+    chunker = _worker_chunkers.get(key)
+    if chunker is None:
+        chunker = _worker_chunkers[key] = CodeChunker(*key)
+
+    results = []
+    for file_path, relative_path, _ in files:
+        try:
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+        except OSError as e:
+            results.append((relative_path, [], 0, str(e)))
+            continue
+
+        content = raw.decode('utf-8', errors='ignore')
+        chunks = chunk_with_fallback(chunker, content, relative_path) if content.strip() else []
+        results.append((relative_path, chunks, len(raw), None))
+    return results
+
 class GitHubService:
     def __init__(self):
         self.supported_extensions = {
@@ -21,14 +105,32 @@ class GitHubService:
             'build', 'dist', '.next', '.nuxt', 'coverage', '.pytest_cache',
             'vendor', 'target', 'bin', 'obj', '.gradle', '.idea', '.vscode'
         }
+        self.chunker = CodeChunker(settings.chunk_max_chars, settings.chunk_min_chars, settings.ast_chunking_enabled)
+        self._checkouts: Dict[str, MirrorCheckout] = {}
     
     async def clone_repository(self, github_url: str) -> str:
-        """Clone repository to temporary directory"""
+        """Clone repository to temporary directory (a mirror-cache worktree when enabled)"""
+        if settings.mirror_cache_enabled:
+            try:
+                return await self._checkout_from_mirror(github_url)
+            except Exception as e:
+                logger.warning(f"⚠️ Mirror cache checkout of {github_url} failed, cloning directly: {e}")
+        
         temp_dir = tempfile.mkdtemp(prefix="codequery_")
         logger.info(f"🔄 Cloning {github_url} to {temp_dir}")
         
+        if settings.partial_clone_enabled:
+            try:
+                await asyncio.to_thread(self._partial_clone, github_url, temp_dir)
+                logger.info(f"✅ Successfully cloned repository (partial, sparse)")
+                return temp_dir
+            except Exception as e:
+                logger.warning(f"⚠️ Partial clone of {github_url} failed, retrying with a full shallow clone: {e}")
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                os.makedirs(temp_dir, exist_ok=True)
+        
         try:
-            repo = git.Repo.clone_from(github_url, temp_dir, depth=1)
+            await asyncio.to_thread(git.Repo.clone_from, github_url, temp_dir, depth=1)
             logger.info(f"✅ Successfully cloned repository")
             return temp_dir
         except Exception as e:
@@ -36,103 +138,336 @@ class GitHubService:
                 shutil.rmtree(temp_dir)
             raise Exception(f"Failed to clone repository: {str(e)}")
     
-    def chunk_code_content(self, content: str, file_path: str, max_chunk_size: int = 1000) -> List[Dict]:
-        """Split code into meaningful chunks"""
-        chunks = []
-        lines = content.split('\n')
-        
-        if len(content) <= max_chunk_size:
-            return [{
-                'content': content,
-                'file_path': file_path,
-                'chunk_index': 0,
-                'start_line': 1,
-                'end_line': len(lines),
-                'chunk_type': 'full_file'
-            }]
-        
-        current_chunk = []
-        current_size = 0
-        chunk_index = 0
-        start_line = 1
-        
-        for i, line in enumerate(lines, 1):
-            current_chunk.append(line)
-            current_size += len(line) + 1  # +1 for newline
-            
-            is_function_start = any(line.strip().startswith(keyword) for keyword in 
-                                  ['def ', 'function ', 'class ', 'interface ', 'public class'])
-            
-            if (current_size >= max_chunk_size) or (is_function_start and len(current_chunk) > 1):
-                if len(current_chunk) > 1:  
-                    chunks.append({
-                        'content': '\n'.join(current_chunk[:-1] if is_function_start else current_chunk),
-                        'file_path': file_path,
-                        'chunk_index': chunk_index,
-                        'start_line': start_line,
-                        'end_line': i - (1 if is_function_start else 0),
-                        'chunk_type': 'code_block'
-                    })
-                    chunk_index += 1
-                    start_line = i if is_function_start else i + 1
-                    current_chunk = [line] if is_function_start else []
-                    current_size = len(line) + 1 if is_function_start else 0
-        
-        # Add remaining chunk
-        if current_chunk:
-            chunks.append({
-                'content': '\n'.join(current_chunk),
-                'file_path': file_path,
-                'chunk_index': chunk_index,
-                'start_line': start_line,
-                'end_line': len(lines),
-                'chunk_type': 'code_block'
-            })
-        
-        return chunks
-    
-    async def extract_code_files(self, repo_path: str) -> List[Dict]:
-        """Extract and chunk all code files from repository"""
-        code_chunks = []
-        total_files = 0
+    async def _checkout_from_mirror(self, github_url: str) -> str:
+        mirror_cache = get_mirror_cache()
+        checkout = await mirror_cache.checkout(github_url, self.clone_options())
+        try:
+            repo = git.Repo(checkout.path)
+            if settings.partial_clone_enabled:
+                await asyncio.to_thread(self._sparse_checkout, repo)
+            else:
+                await asyncio.to_thread(repo.git.checkout)
+        except BaseException:
+            mirror_cache.release(checkout)
+            raise
         
-        logger.info(f"📁 Extracting code files from {repo_path}")
+        self._checkouts[checkout.path] = checkout
+        logger.info(f"✅ Checked out {checkout.commit[:8]} from mirror {checkout.key} into {checkout.path}")
+        return checkout.path
+    
+    def clone_options(self) -> Dict:
+        """Options for git clone: shallow, and without oversized blobs in partial-clone mode"""
+        options = {"depth": 1}
+        if settings.partial_clone_enabled:
+            options["filter"] = f"blob:limit={settings.clone_blob_limit_bytes}"
+        return options
+    
+    def _partial_clone(self, github_url: str, temp_dir: str):
+        """Shallow clone without oversized blobs, checking out only indexable paths"""
+        repo = git.Repo.clone_from(github_url, temp_dir, no_checkout=True, **self.clone_options())
+        self._sparse_checkout(repo)
+    
+    def _sparse_checkout(self, repo: git.Repo):
+        """Check out only supported extensions outside ignore_dirs.
+        
+        The server dropped blobs over CLONE_BLOB_LIMIT_BYTES; those files are
+        excluded explicitly so checkout never lazily fetches them back.
+        """
+        repo.git.sparse_checkout('set', '--no-cone', *self.sparse_checkout_patterns(self._missing_paths(repo)))
+        repo.git.checkout()
+    
+    def _missing_paths(self, repo: git.Repo) -> List[str]:
+        """Indexable paths at HEAD whose blobs were filtered out of the clone"""
+        missing = {
+            line[1:] for line in repo.git.rev_list('--objects', '--missing=print', 'HEAD').splitlines()
+            if line.startswith('?')
+        }
+        if not missing:
+            return []
+        
+        paths = []
+        for entry in repo.git.ls_tree('-r', '-z', 'HEAD').split('\0'):
+            if not entry:
+                continue
+            info, path = entry.split('\t', 1)
+            if info.split()[2] in missing and self.is_indexable_path(path):
+                paths.append(path)
+        return paths
+    
+    def sparse_checkout_patterns(self, excluded_paths: Iterable[str] = ()) -> List[str]:
+        """Non-cone sparse-checkout patterns: supported extensions in, ignored directories and excluded paths out"""
+        patterns = [f"*{extension}" for extension in sorted(self.supported_extensions)]
+        patterns += [f"!**/{directory}/**" for directory in sorted(self.ignore_dirs)]
+        patterns += ["!/" + re.sub(r'([\\*?\[!# ])', r'\\\1', path) for path in excluded_paths]
+        return patterns
+    
+    async def remote_head_commit(self, github_url: str) -> Optional[str]:
+        """SHA of the remote's default branch without cloning, or None if it cannot be resolved"""
+        try:
+            output = await asyncio.to_thread(git.cmd.Git().ls_remote, github_url, "HEAD")
+            return output.split()[0] if output else None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not resolve remote HEAD of {github_url}: {e}")
+            return None
+    
+    def get_head_commit(self, repo_path: str) -> str:
+        """Return the SHA of the checked-out commit"""
+        return git.Repo(repo_path).head.commit.hexsha
+    
+    def is_indexable_path(self, relative_path: str) -> bool:
+        """Whether a repository-relative path would be picked up by extract_code_files"""
+        path = Path(relative_path)
+        if any(part in self.ignore_dirs for part in path.parts[:-1]):
+            return False
+        return path.suffix in self.supported_extensions
+    
+    async def diff_since(self, repo_path: str, base_commit: str) -> Tuple[Set[str], Set[str]]:
+        """Diff the checked-out commit against base_commit.
+        
+        Returns (changed, removed): paths whose chunks must be re-embedded and
+        paths whose vectors only need deleting. Only indexable paths are kept.
+        """
+        checkout = self._checkouts.get(repo_path)
+        if checkout:
+            # A mirror worktree shares the mirror's objects; fetch through the cache's locks
+            await get_mirror_cache().fetch_commit(checkout.key, base_commit)
+        # Fetch, tree diff and blob indexing all shell out to git; keep them off the event loop
+        return await asyncio.to_thread(self._diff_since, repo_path, base_commit, checkout is None)
+    
+    def _diff_since(self, repo_path: str, base_commit: str, fetch_missing: bool = True) -> Tuple[Set[str], Set[str]]:
+        repo = git.Repo(repo_path)
+        
+        try:
+            repo.commit(base_commit)
+        except Exception:
+            if not fetch_missing:
+                raise
+            # Shallow clone only has HEAD; pull in just the base commit
+            repo.git.fetch("--depth=1", "origin", base_commit)
+        
+        changed, removed = set(), set()
+        for diff in repo.commit(base_commit).diff(repo.head.commit):
+            if diff.change_type == 'D':
+                removed.add(diff.a_path)
+            elif diff.change_type == 'R':
+                removed.add(diff.a_path)
+                changed.add(diff.b_path)
+            else:
+                changed.add(diff.b_path)
+        
+        changed = {p for p in changed if self.is_indexable_path(p)}
+        removed = {p for p in removed if self.is_indexable_path(p)}
+        if settings.blob_dedup_enabled and (changed or removed):
+            changed, removed = self._expand_duplicate_groups(repo_path, base_commit, changed, removed)
+        logger.info(f"🔀 Diff {base_commit[:8]}..HEAD: {len(changed)} changed, {len(removed)} removed")
+        return changed, removed
+    
+    def blob_index(self, repo_path: str, commit: str = "HEAD") -> Dict[str, str]:
+        """Map every indexable file at ``commit`` to its git blob SHA (symlinks and submodules excluded)"""
+        output = git.Repo(repo_path).git.ls_tree('-r', '-z', commit)
+        index = {}
+        for entry in output.split('\0'):
+            if not entry:
+                continue
+            info, path = entry.split('\t', 1)
+            mode, kind, sha = info.split()
+            if kind == 'blob' and mode != '120000' and self.is_indexable_path(path):
+                index[path] = sha
+        return index
+    
+    @staticmethod
+    def duplicate_groups(blob_index: Dict[str, str]) -> Dict[str, List[str]]:
+        """Group identical files: canonical path (first in sort order) -> the other paths with the same blob"""
+        by_blob = defaultdict(list)
+        for path in sorted(blob_index):
+            by_blob[blob_index[path]].append(path)
+        return {paths[0]: paths[1:] for paths in by_blob.values() if len(paths) > 1}
+    
+    def _expand_duplicate_groups(self, repo_path: str, base_commit: str, changed: Set[str],
+                                 removed: Set[str]) -> Tuple[Set[str], Set[str]]:
+        """Widen a diff to whole duplicate groups.
+        
+        A canonical file's vectors carry its aliases, so touching any member of
+        a group (before or after the change) means the group's vectors have to
+        be rebuilt: its canonical path or alias list may have changed.
+        """
+        old_index = self.blob_index(repo_path, base_commit)
+        new_index = self.blob_index(repo_path)
+        old_groups, new_groups = defaultdict(set), defaultdict(set)
+        for path, sha in old_index.items():
+            old_groups[sha].add(path)
+        for path, sha in new_index.items():
+            new_groups[sha].add(path)
+        
+        affected = changed | removed
+        for path in changed | removed:
+            if path in old_index:
+                affected |= old_groups[old_index[path]]
+            if path in new_index:
+                affected |= new_groups[new_index[path]]
+        
+        return {p for p in affected if p in new_index or p in changed}, {p for p in affected if p not in new_index and p not in changed}
+    
+    def chunk_code_content(self, content: str, file_path: str, max_chunk_size: Optional[int] = None) -> List[Dict]:
+        """Split code into chunks aligned to functions, classes and methods"""
+        chunker = self.chunker
+        if max_chunk_size is not None and max_chunk_size != chunker.max_chunk_size:
+            chunker = CodeChunker(max_chunk_size, min(chunker.min_chunk_size, max_chunk_size // 2), chunker.syntax_aware)
         
+        return chunk_with_fallback(chunker, content, file_path)
+    
+    def _iter_code_file_paths(self, repo_path: str, only_paths: Optional[Set[str]] = None) -> Iterator[Tuple[Path, str, int]]:
+        """Walk the repository (in sorted order) yielding (absolute path, relative path, size) of every indexable file"""
         for root, dirs, files in os.walk(repo_path):
-            dirs[:] = [d for d in dirs if d not in self.ignore_dirs]
+            dirs[:] = sorted(d for d in dirs if d not in self.ignore_dirs)
             
-            for file in files:
+            for file in sorted(files):
                 file_path = Path(root) / file
+                relative_path = str(file_path.relative_to(repo_path))
+                
+                if only_paths is not None and relative_path not in only_paths:
+                    continue
+                
+                if file_path.suffix not in self.supported_extensions:
+                    continue
                 
-                if file_path.stat().st_size > 1024 * 1024:
+                try:
+                    size = file_path.stat().st_size
+                except OSError:
                     continue
+                if size > settings.clone_blob_limit_bytes:
+                    continue
+                
+                yield file_path, relative_path, size
+    
+    def plan_shards(self, files: List[Tuple[str, str, int]]) -> List[List[Tuple[str, str, int]]]:
+        """Group files, in walk order, into shards of roughly equal byte size.
+        
+        Shards close at EXTRACTION_SHARD_BYTES or EXTRACTION_SHARD_FILES, so one
+        huge file gets a shard to itself and thousands of tiny ones share a few.
+        """
+        shards, current, current_bytes = [], [], 0
+        for entry in files:
+            if current and (current_bytes + entry[2] > settings.extraction_shard_bytes
+                            or len(current) >= settings.extraction_shard_files):
+                shards.append(current)
+                current, current_bytes = [], 0
+            current.append(entry)
+            current_bytes += entry[2]
+        if current:
+            shards.append(current)
+        return shards
+    
+    async def _find_duplicates(self, repo_path: str, only_paths: Optional[Set[str]]) -> Dict[str, List[str]]:
+        if not settings.blob_dedup_enabled:
+            return {}
+        try:
+            index = await asyncio.to_thread(self.blob_index, repo_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not list blobs of {repo_path}, extracting duplicates too: {e}")
+            return {}
+        if only_paths is not None:
+            index = {path: sha for path, sha in index.items() if path in only_paths}
+        return self.duplicate_groups(index)
+    
+    async def iter_code_chunks(self, repo_path: str, only_paths: Optional[Set[str]] = None) -> AsyncIterator[List[Dict]]:
+        """Yield the chunks of each code file, in walk order, as shards finish.
+        
+        Shards are read and chunked on the extraction pool with a bounded number
+        in flight; a single-shard extraction (small repos, incremental syncs)
+        stays on a thread instead of paying for process start-up. Files whose
+        git blob matches an earlier path are skipped and listed as ``aliases``
+        on the chunks of that canonical path.
+        """
+        logger.info(f"📁 Extracting code files from {repo_path}")
+        
+        aliases = await self._find_duplicates(repo_path, only_paths)
+        skipped = {path for paths in aliases.values() for path in paths}
+        files = [
+            (str(path), relative, size)
+            for path, relative, size in self._iter_code_file_paths(repo_path, only_paths)
+            if relative not in skipped
+        ]
+        if skipped:
+            _duplicate_files.inc(len(skipped))
+            logger.info(f"🪞 Skipping {len(skipped)} files identical to {len(aliases)} others")
+        shards = self.plan_shards(files)
+        executor = get_extraction_executor() if len(shards) > 1 else None
+        max_in_flight = 2 * (settings.extraction_workers or min(4, os.cpu_count() or 1))
+        chunker_args = (self.chunker.max_chunk_size, self.chunker.min_chunk_size, self.chunker.syntax_aware)
+        loop = asyncio.get_running_loop()
+        
+        total_files = total_chunks = total_bytes = errors = 0
+        start = time.perf_counter()
+        pending = deque()
+        next_shard = 0
+        
+        try:
+            while pending or next_shard < len(shards):
+                while next_shard < len(shards) and len(pending) < max_in_flight:
+                    shard = shards[next_shard]
+                    pending.append((shard, loop.run_in_executor(executor, extract_shard, shard, *chunker_args)))
+                    next_shard += 1
+                
+                shard, future = pending.popleft()
+                try:
+                    results = await future
+                except BrokenProcessPool as e:
+                    logger.warning(f"⚠️ Extraction pool broke ({e}), finishing shard on a thread")
+                    shutdown_extraction_executor()
+                    results = await asyncio.to_thread(extract_shard, shard, *chunker_args)
+                
+                for relative_path, chunks, size, error in results:
+                    if error:
+                        errors += 1
+                        _read_errors.inc()
+                        logger.warning(f"⚠️ Error reading file {relative_path}: {error}")
+                        continue
                     
-                if file_path.suffix in self.supported_extensions:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                        
-                        if not content.strip():
-                            continue
-                            
-                        relative_path = str(file_path.relative_to(repo_path))
-                        
-                        chunks = self.chunk_code_content(content, relative_path)
-                        code_chunks.extend(chunks)
-                        total_files += 1
-                        
-                        if total_files % 50 == 0:
-                            logger.info(f"📊 Processed {total_files} files, {len(code_chunks)} chunks so far...")
-                            
-                    except Exception as e:
-                        logger.warning(f"⚠️ Error reading file {file_path}: {e}")
+                    total_bytes += size
+                    _bytes_extracted.inc(size)
+                    _files_extracted.inc()
+                    if not chunks:
                         continue
+                    
+                    if relative_path in aliases:
+                        for chunk in chunks:
+                            chunk['aliases'] = aliases[relative_path]
+                    
+                    total_files += 1
+                    total_chunks += len(chunks)
+                    
+                    if total_files % 500 == 0:
+                        logger.info(f"📊 Processed {total_files} files, {total_chunks} chunks so far...")
+                    
+                    yield chunks
+        finally:
+            for _, future in pending:
+                future.cancel()
         
-        logger.info(f"✅ Extracted {len(code_chunks)} code chunks from {total_files} files")
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        _files_per_second.set(len(files) / elapsed)
+        _bytes_per_second.set(total_bytes / elapsed)
+        logger.info(
+            f"✅ Extracted {total_chunks} code chunks from {total_files} files in {len(shards)} shards "
+            f"({len(files) / elapsed:.0f} files/s, {total_bytes / 1024 / 1024 / elapsed:.1f} MB/s, {errors} read errors)"
+        )
+    
+    async def extract_code_files(self, repo_path: str, only_paths: Optional[Set[str]] = None) -> List[Dict]:
+        """Extract and chunk all code files from repository (or only the given relative paths)"""
+        code_chunks = []
+        async for chunks in self.iter_code_chunks(repo_path, only_paths):
+            code_chunks.extend(chunks)
         return code_chunks
     
     def cleanup_temp_dir(self, temp_dir: str):
-        """Clean up temporary directory"""
+        """Clean up temporary directory (releasing its mirror when it is a cached worktree)"""
+        checkout = self._checkouts.pop(temp_dir, None)
+        if checkout:
+            get_mirror_cache().release(checkout)
+            logger.info(f"🧹 Released mirror worktree: {temp_dir}")
+            return
+        
         try:
             if os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class IngestionPipeline:
+    """Streams a checked-out repository through walk → chunk → embed → upsert.
+
+    Stages are connected by bounded queues, so at most ``queue_depth``
+    batches sit between any two stages. Peak memory is bounded by the batch
+    size rather than the repository size, and the embedder works on batch
+    N+1 while batch N is being upserted.
+    """
+
+    def __init__(self, github_service, embedding_service, vector_service,
+                 batch_size: Optional[int] = None, queue_depth: Optional[int] = None):
+        self.github_service = github_service
+        self.embedding_service = embedding_service
+        self.vector_service = vector_service
+        self.batch_size = batch_size or settings.ingestion_batch_size
+        self.queue_depth = queue_depth or settings.ingestion_queue_depth
+
+        self._stage_seconds = {
+            stage: metrics.histogram(f"ingestion_{stage}_batch_seconds", f"Time the {stage} stage spent on one batch")
+            for stage in ("chunk", "embed", "upsert")
+        }
+
+    async def run(self, namespace: str, repo_path: str, only_paths: Optional[Set[str]] = None,
+                  job_id: Optional[str] = None) -> Dict:
+        """Index the repository into the vector namespace; returns counters and per-stage busy time"""
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_depth)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_depth)
+        stats = {
+            "files": 0,
+            "chunks": 0,
+            "batches": 0,
+            "stage_seconds": {"chunk": 0.0, "embed": 0.0, "upsert": 0.0}
+        }
+        start = time.perf_counter()
+
+        tasks = [
+            asyncio.create_task(self._produce(repo_path, only_paths, embed_queue, stats)),
+            asyncio.create_task(self._embed(embed_queue, upsert_queue, job_id, stats)),
+            asyncio.create_task(self._upsert(namespace, upsert_queue, stats)),
+        ]
+
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception():
+                    raise task.exception()
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        stats["wall_seconds"] = round(time.perf_counter() - start, 3)
+        stats["stage_seconds"] = {k: round(v, 3) for k, v in stats["stage_seconds"].items()}
+        logger.info(
+            f"✅ Pipeline indexed {stats['chunks']} chunks from {stats['files']} files in "
+            f"{stats['wall_seconds']}s (stage busy: {stats['stage_seconds']})"
+        )
+        return stats
+
+    async def _produce(self, repo_path: str, only_paths: Optional[Set[str]], out: asyncio.Queue, stats: Dict):
+        batch: List[Dict] = []
+        batch_started = time.perf_counter()
+
+        async for file_chunks in self.github_service.iter_code_chunks(repo_path, only_paths):
+            stats["files"] += 1
+            batch.extend(file_chunks)
+
+            while len(batch) >= self.batch_size:
+                ready, batch = batch[:self.batch_size], batch[self.batch_size:]
+                self._record("chunk", batch_started, stats)
+                await out.put(ready)
+                batch_started = time.perf_counter()
+
+        if batch:
+            self._record("chunk", batch_started, stats)
+            await out.put(batch)
+        await out.put(_DONE)
+
+    async def _embed(self, inp: asyncio.Queue, out: asyncio.Queue, job_id: Optional[str], stats: Dict):
+        while True:
+            batch = await inp.get()
+            if batch is _DONE:
+                await out.put(_DONE)
+                return
+
+            started = time.perf_counter()
+            embedded = await self.embedding_service.embed_chunks(batch, job_id=job_id)
+            self._record("embed", started, stats)
+            await out.put(embedded)
+
+    async def _upsert(self, namespace: str, inp: asyncio.Queue, stats: Dict):
+        while True:
+            batch = await inp.get()
+            if batch is _DONE:
+                return
+
+            started = time.perf_counter()
+            await self.vector_service.store_embeddings(namespace, batch)
+            self._record("upsert", started, stats)
+            stats["chunks"] += len(batch)
+            stats["batches"] += 1
+
+    def _record(self, stage: str, started: float, stats: Dict):
+        elapsed = time.perf_counter() - started
+        stats["stage_seconds"][stage] += elapsed
+        self._stage_seconds[stage].observe(elapsed)
@@ -0,0 +1,479 @@
+import asyncio
+import fcntl
+import json
+import logging
+import math
+import os
+import pickle
+import re
+import shutil
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import metrics
+from .vector_backend import build_search_result, build_vector_metadata, file_vector_prefix, vector_id_for
+
+logger = logging.getLogger(__name__)
+
+_LOG_FILE = "postings.jsonl"
+_SNAPSHOT_FILE = "postings.snapshot"
+_SNAPSHOT_VERSION = 1
+# Log bytes a writer lets pile up past the snapshot before writing a new one
+_SNAPSHOT_EVERY_BYTES = 1024 * 1024
+# Log bytes before the snapshot offset whose checksum ties a snapshot to its log
+_SNAPSHOT_CHECK_BYTES = 4096
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_WORD_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+# Question words and glue that say nothing about which code is meant
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how',
+    'in', 'is', 'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'what', 'when', 'where',
+    'which', 'who', 'why', 'with', 'code', 'file', 'show', 'me', 'find', 'there', 'used',
+}
+
+_DEFINITION = re.compile(
+    r"\b(?:def|class|function|func|fn|interface|struct|enum|trait|type|module|object)\s+([A-Za-z_][A-Za-z0-9_]*)"
+)
+# Extra term frequency credited to each name a chunk defines
+DEFINITION_BOOST = 3
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased identifier terms: each identifier whole plus its camelCase/snake_case parts.
+
+    ``verifyRepositoryOwnership`` and ``verify_repository_ownership`` both give
+    the whole identifier and ``verify``, ``repository``, ``ownership``, so a
+    query matches whichever spelling the code uses.
+    """
+    terms = []
+    for identifier in _IDENTIFIER.findall(text):
+        whole = identifier.lower().strip('_')
+        if len(whole) > 1 and whole not in STOPWORDS:
+            terms.append(whole)
+        parts = [part.lower() for piece in identifier.split('_') for part in _WORD_PART.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 1 and part not in STOPWORDS and part != whole)
+    return terms
+
+
+def _document_terms(chunk: Dict) -> Dict[str, int]:
+    # The path and enclosing scope name the code as much as its body does
+    text = f"{chunk['file_path'].replace('/', ' ').replace('.', ' ')} {chunk.get('scope', '')} {chunk['content']}"
+    terms = Counter(tokenize(text))
+    # Names defined here outrank the same names merely used here
+    for name in _DEFINITION.findall(chunk['content']):
+        for term in tokenize(name):
+            terms[term] += DEFINITION_BOOST
+    return dict(terms)
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    if len(scores) <= top_k:
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, top_k)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def _file_prefix(vector_id: str) -> str:
+    # IDs are file_vector_prefix() followed by the chunk index
+    return vector_id[:vector_id.rindex("_") + 1]
+
+
+class _LexicalNamespace:
+    """Postings of one namespace, replayed from an append-only log shared between processes.
+
+    Ingestion workers append ``add``/``delete`` records under an ``flock``;
+    every reader tails the log before searching, so a worker's writes are
+    visible to the API on its next query. Compaction rewrites the log to a new
+    inode, which readers detect and reload from scratch.
+
+    Writers also pickle the replayed state next to the log every
+    ``_SNAPSHOT_EVERY_BYTES`` of log and after each compaction. A namespace
+    loaded cold (first query, or after LRU eviction) starts from that snapshot
+    and replays only the log written since, instead of the whole log.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.ids: List[str] = []
+        self.metadata: List[Dict] = []
+        self.lengths: List[int] = []
+        self.latest: Dict[str, int] = {}
+        # file ID prefix (``<namespace>_<file key>_``) -> live IDs of that file's chunks
+        self.files: Dict[str, Set[str]] = {}
+        self.live: List[bool] = []
+        self.total_length = 0
+        # term -> (rows, frequencies) as packed int32 arrays, 8 bytes per posting.
+        # Postings loaded from or written to a snapshot move into one CSR block
+        # (term -> slot, slot offsets, rows, frequencies); ``postings`` then only
+        # holds rows added since.
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._base_terms: Dict[str, int] = {}
+        self._base_offsets = np.zeros(1, dtype=np.int64)
+        self._base_rows = np.zeros(0, dtype=np.int32)
+        self._base_frequencies = np.zeros(0, dtype=np.int32)
+        self._live_array: Optional[np.ndarray] = None
+        self._length_array: Optional[np.ndarray] = None
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._snapshot_offset = 0
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.path, _LOG_FILE)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.path, _SNAPSHOT_FILE)
+
+    @property
+    def live_count(self) -> int:
+        return len(self.latest)
+
+    def _locked_log(self, mode: str):
+        os.makedirs(self.path, exist_ok=True)
+        while True:
+            handle = open(self.log_path, mode)
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            # A compaction may have swapped the file while we waited for the lock
+            if os.fstat(handle.fileno()).st_ino == os.stat(self.log_path).st_ino:
+                return handle
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def append(self, records: List[Dict]):
+        payload = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        with self.lock:
+            handle = self._locked_log("a")
+            try:
+                handle.write(payload)
+                handle.flush()
+                self.refresh()
+                if self._offset - self._snapshot_offset >= _SNAPSHOT_EVERY_BYTES:
+                    self._write_snapshot()
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            self._maybe_compact()
+
+    def refresh(self):
+        """Apply records other processes appended since the last call"""
+        with self.lock:
+            try:
+                stat = os.stat(self.log_path)
+            except FileNotFoundError:
+                if self._inode is not None:
+                    self._reset()
+                return
+
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._reset()
+                self._inode = stat.st_ino
+                self._load_snapshot(stat)
+            if stat.st_size == self._offset:
+                return
+
+            with open(self.log_path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+            # A writer may be mid-line; leave the partial record for the next refresh
+            complete = data.rfind(b"\n") + 1
+            for line in data[:complete].splitlines():
+                if line:
+                    self._apply(json.loads(line))
+            self._offset += complete
+
+    def _terms(self) -> List[str]:
+        return list(self._base_terms) + [term for term in self.postings if term not in self._base_terms]
+
+    def _term_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Rows and frequencies of a term, zero-copy where possible.
+
+        Views pin the ``array`` buffers, which cannot grow while one is alive:
+        never keep the result across an append.
+        """
+        parts = []
+        slot = self._base_terms.get(term)
+        if slot is not None:
+            start, end = self._base_offsets[slot], self._base_offsets[slot + 1]
+            parts.append((self._base_rows[start:end], self._base_frequencies[start:end]))
+        added = self.postings.get(term)
+        if added is not None:
+            parts.append((np.frombuffer(added[0], dtype=np.int32), np.frombuffer(added[1], dtype=np.int32)))
+        if len(parts) < 2:
+            return parts[0] if parts else None
+        return np.concatenate([parts[0][0], parts[1][0]]), np.concatenate([parts[0][1], parts[1][1]])
+
+    def _load_snapshot(self, stat: os.stat_result):
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Ignoring unreadable lexical snapshot {self.snapshot_path}: {e}")
+            return
+        if (snapshot.get("version") != _SNAPSHOT_VERSION or snapshot["inode"] != stat.st_ino
+                or snapshot["offset"] > stat.st_size):
+            return
+        # Inode numbers get reused; the log bytes the snapshot ends on must match too
+        if snapshot["check"] != self._log_checksum(snapshot["offset"]):
+            return
+
+        self.ids = snapshot["ids"]
+        self.metadata = snapshot["metadata"]
+        self.lengths = snapshot["lengths"]
+        self.live = snapshot["live"]
+        self._base_terms = {term: slot for slot, term in enumerate(snapshot["terms"])}
+        self._base_offsets = snapshot["offsets"]
+        self._base_rows = snapshot["rows"]
+        self._base_frequencies = snapshot["frequencies"]
+        for row, vector_id in enumerate(self.ids):
+            if self.live[row]:
+                self.latest[vector_id] = row
+                self.files.setdefault(_file_prefix(vector_id), set()).add(vector_id)
+                self.total_length += self.lengths[row]
+        self._offset = self._snapshot_offset = snapshot["offset"]
+
+    def _log_checksum(self, offset: int) -> int:
+        start = max(0, offset - _SNAPSHOT_CHECK_BYTES)
+        with open(self.log_path, "rb") as f:
+            f.seek(start)
+            return zlib.crc32(f.read(offset - start))
+
+    def _write_snapshot(self):
+        """Pickle the state replayed so far; callers hold the log's flock so the inode cannot change under us"""
+        terms = self._terms()
+        postings = [self._term_postings(term) for term in terms]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(rows) for rows, _ in postings])
+        empty = np.zeros(0, dtype=np.int32)
+        # Concatenating copies the postings out, so the arrays can go
+        self._base_terms = {term: slot for slot, term in enumerate(terms)}
+        self._base_offsets = offsets
+        self._base_rows = np.concatenate([rows for rows, _ in postings]) if postings else empty
+        self._base_frequencies = np.concatenate([frequencies for _, frequencies in postings]) if postings else empty
+        self.postings = {}
+
+        snapshot = {
+            "version": _SNAPSHOT_VERSION,
+            "inode": self._inode,
+            "offset": self._offset,
+            "check": self._log_checksum(self._offset),
+            "ids": self.ids,
+            "metadata": self.metadata,
+            "lengths": self.lengths,
+            "live": self.live,
+            "terms": terms,
+            "offsets": self._base_offsets,
+            "rows": self._base_rows,
+            "frequencies": self._base_frequencies,
+        }
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_offset = self._offset
+
+    def _apply(self, record: Dict):
+        if record["op"] == "delete":
+            for vector_id in list(self.files.get(record["prefix"], ())):
+                self._kill(vector_id)
+            return
+
+        vector_id = record["id"]
+        if vector_id in self.latest:
+            self._kill(vector_id)
+        row = len(self.ids)
+        self.ids.append(vector_id)
+        self.metadata.append(record["metadata"])
+        self.lengths.append(record["length"])
+        self.live.append(True)
+        self.latest[vector_id] = row
+        self.files.setdefault(_file_prefix(vector_id), set()).add(vector_id)
+        self.total_length += record["length"]
+        for term, frequency in record["terms"].items():
+            rows, frequencies = self.postings.setdefault(term, (array("i"), array("i")))
+            rows.append(row)
+            frequencies.append(frequency)
+        self._live_array = None
+
+    def _kill(self, vector_id: str):
+        row = self.latest.pop(vector_id)
+        self.live[row] = False
+        prefix = _file_prefix(vector_id)
+        self.files[prefix].discard(vector_id)
+        if not self.files[prefix]:
+            del self.files[prefix]
+        self.total_length -= self.lengths[row]
+        self._live_array = None
+
+    def _maybe_compact(self):
+        dead = len(self.ids) - self.live_count
+        if dead < 1000 or dead < self.live_count:
+            return
+
+        tmp_path = self.log_path + ".tmp"
+        handle = self._locked_log("a")
+        try:
+            # Pick up anything appended since our refresh before rewriting
+            self.refresh()
+            row_terms: Dict[int, Dict[str, int]] = {row: {} for row in self.latest.values()}
+            for term in self._terms():
+                rows, frequencies = self._term_postings(term)
+                for row, frequency in zip(rows.tolist(), frequencies.tolist()):
+                    if self.live[row]:
+                        row_terms[row][term] = frequency
+            with open(tmp_path, "w") as f:
+                for vector_id, row in sorted(self.latest.items(), key=lambda item: item[1]):
+                    f.write(json.dumps({"op": "add", "id": vector_id, "metadata": self.metadata[row],
+                                        "length": self.lengths[row], "terms": row_terms[row]}, separators=(",", ":")) + "\n")
+            # The old snapshot describes the old inode; never let it outlive it
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+            os.replace(tmp_path, self.log_path)
+            self._reset()
+            self.refresh()
+            self._write_snapshot()
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+        logger.info(f"🧹 Compacted lexical index {self.path}: dropped {dead} dead documents")
+
+    def search(self, terms: List[str], top_k: int) -> List[Tuple[str, Dict, float]]:
+        with self.lock:
+            self.refresh()
+            n = self.live_count
+            if not n or not terms:
+                return []
+
+            if self._live_array is None or len(self._live_array) != len(self.live):
+                self._live_array = np.asarray(self.live, dtype=bool)
+            if self._length_array is None or len(self._length_array) != len(self.lengths):
+                self._length_array = np.asarray(self.lengths, dtype=np.float32)
+            average_length = max(self.total_length / n, 1.0)
+
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            for term, query_frequency in Counter(terms).items():
+                postings = self._term_postings(term)
+                if postings is None:
+                    continue
+                rows, frequencies = postings
+                alive = self._live_array[rows]
+                rows = rows[alive]
+                frequencies = frequencies[alive].astype(np.float32)
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._length_array[rows] / average_length)
+                scores[rows] += query_frequency * idf * frequencies * (BM25_K1 + 1) / (frequencies + norm)
+
+            order = _top_k(scores, top_k)
+            return [(self.ids[row], self.metadata[row], float(scores[row])) for row in order if scores[row] > 0]
+
+
+class LexicalIndex:
+    """BM25 keyword index over code identifiers, kept next to every vector namespace.
+
+    Vector search misses exact identifier lookups ("where is
+    ``verify_repository_ownership`` defined"); BM25 over split identifiers
+    finds them. Each namespace is an append-only postings log under
+    ``LEXICAL_INDEX_DIR``, which must be shared by the API and the ingestion
+    workers. Up to ``LEXICAL_INDEX_MAX_NAMESPACES`` namespaces stay loaded.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_namespaces: Optional[int] = None):
+        self.root = root or settings.lexical_index_dir
+        self.max_namespaces = max_namespaces or settings.lexical_index_max_namespaces
+        os.makedirs(self.root, exist_ok=True)
+        self._namespaces: "OrderedDict[str, _LexicalNamespace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._search_seconds = metrics.histogram(
+            "lexical_search_seconds", "BM25 lookup time per query",
+            buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+        )
+        logger.info(f"🔤 Lexical index at {self.root}")
+
+    def _path(self, namespace: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_.-]", "_", namespace))
+
+    def _namespace(self, namespace: str) -> _LexicalNamespace:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = self._namespaces[namespace] = _LexicalNamespace(self._path(namespace))
+                while len(self._namespaces) > self.max_namespaces:
+                    self._namespaces.popitem(last=False)
+            else:
+                self._namespaces.move_to_end(namespace)
+            return ns
+
+    async def add(self, namespace: str, chunks: List[Dict]):
+        """Index chunks under the same IDs their vectors use; re-used IDs replace the old document"""
+        if not chunks:
+            return
+
+        def build():
+            records = []
+            for chunk in chunks:
+                terms = _document_terms(chunk)
+                records.append({
+                    "op": "add",
+                    "id": vector_id_for(namespace, chunk['file_path'], chunk['chunk_index']),
+                    "metadata": build_vector_metadata(chunk),
+                    "length": sum(terms.values()),
+                    "terms": terms,
+                })
+            self._namespace(namespace).append(records)
+
+        await asyncio.to_thread(build)
+
+    async def delete_files(self, namespace: str, file_paths: Iterable[str]):
+        records = [{"op": "delete", "prefix": file_vector_prefix(namespace, path)} for path in file_paths]
+        if records:
+            await asyncio.to_thread(self._namespace(namespace).append, records)
+
+    async def delete_namespace(self, namespace: str):
+        with self._lock:
+            self._namespaces.pop(namespace, None)
+        await asyncio.to_thread(shutil.rmtree, self._path(namespace), True)
+
+    async def search(self, namespace: str, query: str, top_k: int = 20) -> List[Dict]:
+        """BM25 top_k for the query, shaped like vector results with ``similarity`` 0 and a ``keyword_score``"""
+        terms = tokenize(query)
+        if not terms or not os.path.exists(os.path.join(self._path(namespace), _LOG_FILE)):
+            return []
+
+        def run():
+            start = time.perf_counter()
+            hits = self._namespace(namespace).search(terms, top_k)
+            self._search_seconds.observe(time.perf_counter() - start)
+            return hits
+
+        try:
+            hits = await asyncio.to_thread(run)
+        except Exception as e:
+            logger.error(f"❌ Error searching lexical index {namespace}: {e}")
+            return []
+
+        results = []
+        for vector_id, metadata, score in hits:
+            result = build_search_result(metadata, 0.0, vector_id)
+            result['keyword_score'] = score
+            results.append(result)
+        return results
@@ -0,0 +1,440 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from .vector_backend import VectorBackend, build_search_result, build_vector_metadata, file_vector_prefix, vector_id_for
+
+logger = logging.getLogger(__name__)
+
+_VECTORS_FILES = {"float32": "vectors.f32", "float16": "vectors.f16", "int8": "vectors.i8"}
+_SCALES_FILE = "scales.f32"
+_RECORDS_FILE = "records.jsonl"
+_TOMBSTONES_FILE = "tombstones.log"
+_INFO_FILE = "info.json"
+_LOCK_FILE = "write.lock"
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Rows converted to float32 at a time when scoring; small enough for the temporary to stay in cache
+_SCORE_BLOCK = 4096
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Unit vectors in the storage dtype, plus the per-vector scale int8 rows are multiplied by"""
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(_DTYPES[dtype]), None
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    if len(scores) <= top_k:
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, top_k)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class _IVFIndex:
+    """Inverted-file index: spherical k-means centroids with a posting list of rows per centroid"""
+
+    def __init__(self, read: Callable[[np.ndarray], np.ndarray], rows: np.ndarray, nlist: int, iterations: int = 8, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        sample_rows = rows if len(rows) <= 50000 else rng.choice(rows, 50000, replace=False)
+        sample = read(np.sort(sample_rows))
+
+        centroids = sample[rng.choice(len(sample), min(nlist, len(sample)), replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        self.centroids = centroids
+
+        assignment = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), 65536):
+            block = rows[start:start + 65536]
+            assignment[start:start + 65536] = np.argmax(read(block) @ centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind="stable")
+        sorted_rows = rows[order]
+        bounds = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+        self.lists = [sorted_rows[bounds[c]:bounds[c + 1]] for c in range(len(centroids))]
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        probe = _top_k(self.centroids @ query, min(nprobe, len(self.centroids)))
+        return np.concatenate([self.lists[c] for c in probe])
+
+
+class _Namespace:
+    """One repository's vectors: an append-only vector file plus JSON records and a tombstone log.
+
+    Rows are stored in the namespace's dtype; int8 rows also get a float32
+    scale each in a parallel file. The dtype is fixed when the namespace is
+    created, so changing ``LOCAL_VECTOR_DTYPE`` only affects new namespaces.
+
+    The files are shared between processes: writers (ingestion workers)
+    hold an exclusive ``flock`` on ``write.lock``, and every search first
+    tails the records and tombstones other processes appended, reloading from
+    scratch after a compaction (new records inode) or a namespace deletion.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        self.path = path
+        self.lock = threading.RLock()
+        self.default_dtype = dtype
+        # Loaded lazily: searches refresh first, writers refresh under the write lock
+        self._reset()
+
+    def _reset(self):
+        self.dimension: Optional[int] = None
+        self.dtype = self.default_dtype
+        self.ids: List[str] = []
+        self.metadata: List[Dict] = []
+        self.latest: Dict[str, int] = {}
+        self.live = np.zeros(0, dtype=bool)
+        self.vectors: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.ivf: Optional[_IVFIndex] = None
+        # (inode, bytes applied) of the records and tombstone logs
+        self._records_seen: Tuple[Optional[int], int] = (None, 0)
+        self._tombstones_seen: Tuple[Optional[int], int] = (None, 0)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[Optional[int], int]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None, 0
+        return stat.st_ino, stat.st_size
+
+    @contextmanager
+    def _file_lock(self, mode: int):
+        handle = open(self._file(_LOCK_FILE), "a+")
+        try:
+            fcntl.flock(handle, mode)
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive access across processes, starting from everything written so far"""
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            with self._file_lock(fcntl.LOCK_EX):
+                self._refresh_locked()
+                yield
+
+    def refresh(self):
+        """Apply rows, tombstones, compactions and deletions written by other processes"""
+        with self.lock:
+            if (self._stat(self._file(_RECORDS_FILE)) == self._records_seen
+                    and self._stat(self._file(_TOMBSTONES_FILE)) == self._tombstones_seen):
+                return
+            if not os.path.isdir(self.path):
+                self._reset()
+                return
+            # Shared lock: never read a writer's half-finished append or compaction
+            with self._file_lock(fcntl.LOCK_SH):
+                self._refresh_locked()
+
+    def _refresh_locked(self):
+        records_inode, records_size = self._stat(self._file(_RECORDS_FILE))
+        if records_inode is None:
+            if self.ids or self._records_seen[0] is not None:
+                self._reset()
+            return
+        seen_inode, seen_size = self._records_seen
+        if records_inode != seen_inode or records_size < seen_size:
+            self._reset()
+            seen_size = 0
+
+        if self.dimension is None:
+            with open(self._file(_INFO_FILE)) as f:
+                info = json.load(f)
+            self.dimension = info["dimension"]
+            # Namespaces written before quantization existed are float32
+            self.dtype = info.get("dtype", "float32")
+
+        changed = False
+        if records_size > seen_size:
+            with open(self._file(_RECORDS_FILE), "rb") as f:
+                f.seek(seen_size)
+                data = f.read(records_size - seen_size)
+            start = len(self.ids)
+            for line in data.splitlines():
+                if line:
+                    record = json.loads(line)
+                    self.ids.append(record["id"])
+                    self.metadata.append(record["metadata"])
+            self.live = np.concatenate([self.live, np.ones(len(self.ids) - start, dtype=bool)])
+            for row in range(start, len(self.ids)):
+                previous = self.latest.get(self.ids[row])
+                if previous is not None:
+                    self.live[previous] = False
+                self.latest[self.ids[row]] = row
+            changed = True
+        self._records_seen = (records_inode, records_size)
+
+        tombstones_inode, tombstones_size = self._stat(self._file(_TOMBSTONES_FILE))
+        seen_inode, seen_size = self._tombstones_seen
+        if tombstones_inode != seen_inode or tombstones_size < seen_size:
+            seen_size = 0
+        if tombstones_size > seen_size:
+            with open(self._file(_TOMBSTONES_FILE)) as f:
+                f.seek(seen_size)
+                for line in f.read(tombstones_size - seen_size).splitlines():
+                    seq, vector_id = line.split("\t", 1)
+                    row = self.latest.get(vector_id)
+                    # A tombstone only kills rows written before it
+                    if row is not None and row < int(seq):
+                        self.live[row] = False
+                        del self.latest[vector_id]
+            changed = True
+        self._tombstones_seen = (tombstones_inode, tombstones_size)
+
+        if changed:
+            self._open_vectors()
+            self.ivf = None
+
+    def _open_vectors(self):
+        if self.dimension and self.ids:
+            self.vectors = np.memmap(self._file(_VECTORS_FILES[self.dtype]), dtype=_DTYPES[self.dtype], mode="r",
+                                     shape=(len(self.ids), self.dimension))
+            self.scales = np.memmap(self._file(_SCALES_FILE), dtype=np.float32, mode="r",
+                                    shape=(len(self.ids),)) if self.dtype == "int8" else None
+        else:
+            self.vectors = None
+            self.scales = None
+
+    def read(self, index) -> np.ndarray:
+        """Float32 unit vectors of a slice or an array of rows"""
+        block = np.asarray(self.vectors[index], dtype=np.float32)
+        if self.scales is not None:
+            block *= self.scales[index][:, None]
+        return block
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        count = len(self.ids) if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _SCORE_BLOCK):
+            stop = min(start + _SCORE_BLOCK, count)
+            index = slice(start, stop) if rows is None else rows[start:stop]
+            scores[start:stop] = np.asarray(self.vectors[index], dtype=np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    @property
+    def live_count(self) -> int:
+        return len(self.latest)
+
+    def append(self, ids: List[str], vectors: np.ndarray, metadata: List[Dict]):
+        with self._writing():
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                with open(self._file(_INFO_FILE), "w") as f:
+                    json.dump({"dimension": self.dimension, "dtype": self.dtype}, f)
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-dimensional vectors, got {vectors.shape[1]}")
+
+            stored, scales = _quantize(_normalize(vectors), self.dtype)
+            with open(self._file(_VECTORS_FILES[self.dtype]), "ab") as f:
+                # Drop rows left behind by an interrupted write so rows and records stay aligned
+                f.truncate(len(self.ids) * stored.itemsize * self.dimension)
+                f.write(stored.tobytes())
+            if scales is not None:
+                with open(self._file(_SCALES_FILE), "ab") as f:
+                    f.truncate(len(self.ids) * scales.itemsize)
+                    f.write(scales.tobytes())
+            # Records last: a reader that sees a record can always map its vector row
+            with open(self._file(_RECORDS_FILE), "a") as f:
+                for vector_id, meta in zip(ids, metadata):
+                    f.write(json.dumps({"id": vector_id, "metadata": meta}) + "\n")
+            self._refresh_locked()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        with self._writing():
+            return self._delete_locked(ids)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._writing():
+            return self._delete_locked([vector_id for vector_id in self.latest if vector_id.startswith(prefix)])
+
+    def _delete_locked(self, ids: Iterable[str]) -> int:
+        ids = [vector_id for vector_id in ids if vector_id in self.latest]
+        if not ids:
+            return 0
+        seq = len(self.ids)
+        with open(self._file(_TOMBSTONES_FILE), "a") as f:
+            for vector_id in ids:
+                f.write(f"{seq}\t{vector_id}\n")
+        self._refresh_locked()
+        self._maybe_compact()
+        return len(ids)
+
+    def destroy(self):
+        """Delete the namespace's files; other processes see it empty on their next refresh"""
+        with self.lock:
+            if os.path.isdir(self.path):
+                with self._file_lock(fcntl.LOCK_EX):
+                    for name in os.listdir(self.path):
+                        if name != _LOCK_FILE:
+                            os.remove(self._file(name))
+            self._reset()
+
+    def _maybe_compact(self):
+        dead = len(self.ids) - self.live_count
+        if dead < 1000 or dead < self.live_count:
+            return
+
+        rows = np.array(sorted(self.latest.values()), dtype=np.int64)
+        vectors = np.asarray(self.vectors[rows]) if len(rows) else np.zeros((0, self.dimension), dtype=_DTYPES[self.dtype])
+        scales = np.asarray(self.scales[rows]) if self.scales is not None and len(rows) else np.zeros(0, dtype=np.float32)
+        ids = [self.ids[row] for row in rows]
+        metadata = [self.metadata[row] for row in rows]
+
+        vectors_file = self._file(_VECTORS_FILES[self.dtype])
+        tmp_vectors = vectors_file + ".tmp"
+        tmp_scales = self._file(_SCALES_FILE + ".tmp")
+        tmp_records = self._file(_RECORDS_FILE + ".tmp")
+        with open(tmp_vectors, "wb") as f:
+            f.write(vectors.tobytes())
+        if self.dtype == "int8":
+            with open(tmp_scales, "wb") as f:
+                f.write(scales.tobytes())
+        with open(tmp_records, "w") as f:
+            for vector_id, meta in zip(ids, metadata):
+                f.write(json.dumps({"id": vector_id, "metadata": meta}) + "\n")
+
+        self.vectors = None
+        self.scales = None
+        os.replace(tmp_vectors, vectors_file)
+        if self.dtype == "int8":
+            os.replace(tmp_scales, self._file(_SCALES_FILE))
+        if os.path.exists(self._file(_TOMBSTONES_FILE)):
+            os.remove(self._file(_TOMBSTONES_FILE))
+        # The records file goes last; its new inode tells readers to reload
+        os.replace(tmp_records, self._file(_RECORDS_FILE))
+
+        self._reset()
+        self._refresh_locked()
+        logger.info(f"🧹 Compacted {self.path}: dropped {dead} dead rows")
+
+    def search(self, query: np.ndarray, top_k: int, exact_threshold: int, nprobe: int) -> List[Dict]:
+        with self.lock:
+            self.refresh()
+            if self.vectors is None or not self.live_count:
+                return []
+
+            if self.live_count <= exact_threshold:
+                scores = self._scores(query)
+                scores[~self.live] = -np.inf
+                rows = _top_k(scores, top_k)
+                rows = rows[np.isfinite(scores[rows])]
+                return [build_search_result(self.metadata[row], float(scores[row]), self.ids[row]) for row in rows]
+
+            if self.ivf is None:
+                live_rows = np.flatnonzero(self.live)
+                self.ivf = _IVFIndex(self.read, live_rows, nlist=max(16, int(np.sqrt(len(live_rows)))))
+
+            candidates = np.sort(self.ivf.candidates(query, nprobe))
+            scores = self._scores(query, candidates)
+            order = _top_k(scores, top_k)
+            return [build_search_result(self.metadata[candidates[i]], float(scores[i]), self.ids[candidates[i]]) for i in order]
+
+
+class LocalVectorStore(VectorBackend):
+    """On-disk vector store for offline runs, load tests and tests.
+
+    Each namespace is a memory-mapped matrix of unit vectors, stored as
+    float32, float16 (half the memory) or int8 with a per-vector scale (a
+    quarter) per ``local_vector_dtype``; scoring converts blocks of rows back
+    to float32.
+    Namespaces up to ``local_vector_exact_threshold`` live vectors are searched
+    with one exact matrix-vector product; bigger ones build an IVF index on
+    first search and probe ``local_vector_nprobe`` lists. ``LOCAL_VECTOR_DIR``
+    may be shared with external ingestion workers: searches pick up their
+    writes before scoring.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None, dtype: Optional[str] = None):
+        self.root = root or settings.local_vector_dir
+        self.dtype = (dtype or settings.local_vector_dtype).lower()
+        if self.dtype not in _DTYPES:
+            raise ValueError(f"Unknown local vector dtype: {self.dtype}")
+        self.exact_threshold = settings.local_vector_exact_threshold
+        self.nprobe = settings.local_vector_nprobe
+        os.makedirs(self.root, exist_ok=True)
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+        print(f"✅ [LOCAL-VECTOR] Using local vector store at {self.root}", flush=True)
+        logger.info(f"🎯 Local vector store initialized at {self.root}")
+
+    def _path(self, namespace: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_.-]", "_", namespace))
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = _Namespace(self._path(namespace), self.dtype)
+                self._namespaces[namespace] = ns
+            return ns
+
+    async def store_embeddings(self, namespace: str, embedded_chunks: List[Dict]):
+        """Append chunk vectors to the namespace (re-used IDs replace the old rows)"""
+        if not embedded_chunks:
+            return
+        ids = [vector_id_for(namespace, chunk['file_path'], chunk['chunk_index']) for chunk in embedded_chunks]
+        vectors = np.stack([np.asarray(chunk['embedding'], dtype=np.float32) for chunk in embedded_chunks])
+        metadata = [build_vector_metadata(chunk) for chunk in embedded_chunks]
+        await asyncio.to_thread(self._namespace(namespace).append, ids, vectors, metadata)
+        logger.info(f"💾 Stored {len(ids)} embeddings in local namespace {namespace}")
+
+    async def search_similar_code(self, namespace: str, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
+        try:
+            query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+            ns = self._namespace(namespace)
+            return await asyncio.to_thread(ns.search, query, top_k, self.exact_threshold, self.nprobe)
+        except Exception as e:
+            logger.error(f"❌ Error searching local vector store: {e}")
+            return []
+
+    async def delete_file_vectors(self, namespace: str, file_paths: Iterable[str]) -> int:
+        ns = self._namespace(namespace)
+        prefixes = [file_vector_prefix(namespace, file_path) for file_path in file_paths]
+
+        def delete_all():
+            return sum(ns.delete_prefix(prefix) for prefix in prefixes)
+
+        deleted = await asyncio.to_thread(delete_all)
+        logger.info(f"🗑️ Deleted {deleted} file vectors in local namespace {namespace}")
+        return deleted
+
+    async def delete_namespace(self, namespace: str):
+        with self._lock:
+            ns = self._namespaces.pop(namespace, None) or _Namespace(self._path(namespace), self.dtype)
+        await asyncio.to_thread(ns.destroy)
+        logger.info(f"🗑️ Deleted local namespace {namespace}")
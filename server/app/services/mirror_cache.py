@@ -0,0 +1,295 @@
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, IO, List, Optional, Tuple
+from urllib.parse import urlsplit
+import git
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Local ref every mirror keeps pointed at the most recently fetched remote HEAD
+HEAD_REF = "refs/qodex/head"
+
+
+def normalize_repository_url(url: str) -> str:
+    """Canonical ``host/owner/repo`` for every spelling of a repository URL.
+
+    Scheme, credentials, trailing slashes and ``.git`` are dropped; GitHub paths
+    are lowercased since GitHub treats owner and repository names case-insensitively.
+    """
+    url = url.strip()
+    scp_like = re.match(r'^[\w.-]+@([^:/]+):(.+)$', url)
+    if scp_like:
+        host, path = scp_like.group(1), scp_like.group(2)
+    else:
+        parts = urlsplit(url if '://' in url else f'https://{url}')
+        host, path = parts.hostname or '', parts.path
+
+    host = host.lower()
+    path = path.strip('/')
+    if path.endswith('.git'):
+        path = path[:-len('.git')]
+    if host in ('github.com', 'www.github.com'):
+        host, path = 'github.com', path.lower()
+    return f"{host}/{path}" if host else path
+
+
+@dataclass
+class MirrorCheckout:
+    """A worktree of a cached mirror, checked out for one job"""
+    path: str
+    key: str
+    commit: str
+    use_lock: IO
+
+
+class RepositoryMirrorCache:
+    """Bare, shallow mirrors of cloned repositories shared by every ingestion job.
+
+    Each normalized URL gets one mirror under ``MIRROR_CACHE_DIR``. A job
+    fetches the mirror (or reuses a fetch finished less than
+    ``MIRROR_CACHE_FETCH_TTL`` seconds ago) and gets its own detached,
+    unchecked-out worktree. Jobs for the same URL are serialised by an asyncio
+    lock in-process and an ``flock`` on ``fetch.lock`` across processes, so
+    concurrent jobs share one fetch. Each live worktree holds a shared lock on
+    ``use.lock``; least-recently-used mirrors without users are evicted once
+    the cache exceeds ``MIRROR_CACHE_MAX_BYTES``.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None,
+                 fetch_ttl: Optional[float] = None):
+        self.root = root or settings.mirror_cache_dir
+        self.max_bytes = max_bytes if max_bytes is not None else settings.mirror_cache_max_bytes
+        self.fetch_ttl = fetch_ttl if fetch_ttl is not None else settings.mirror_cache_fetch_ttl
+        self._locks: Dict[str, asyncio.Lock] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+        self._hits = metrics.counter("mirror_cache_hits", "Clones served from an existing mirror")
+        self._misses = metrics.counter("mirror_cache_misses", "Clones that had to create a mirror")
+        self._fetches = metrics.counter("mirror_cache_fetches", "Fetches run against an existing mirror")
+        self._shared_fetches = metrics.counter("mirror_cache_shared_fetches", "Reuses that skipped fetching because a fetch had just finished")
+        self._evictions = metrics.counter("mirror_cache_evictions", "Mirrors evicted to stay within the disk budget")
+        self._bytes = metrics.gauge("mirror_cache_bytes", "Disk used by cached mirrors after the last eviction pass")
+
+    def key_for(self, url: str) -> str:
+        normalized = normalize_repository_url(url)
+        slug = re.sub(r'[^a-z0-9]+', '-', normalized.lower()).strip('-')[-60:]
+        return f"{slug}-{hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]}"
+
+    def _entry(self, key: str, name: str = "") -> str:
+        return os.path.join(self.root, key, name) if name else os.path.join(self.root, key)
+
+    def _lock_for(self, key: str) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    @staticmethod
+    def _flock(path: str, mode: int) -> IO:
+        handle = open(path, "a+")
+        try:
+            fcntl.flock(handle, mode)
+        except BaseException:
+            handle.close()
+            raise
+        return handle
+
+    @staticmethod
+    def _unlock(handle: Optional[IO]):
+        if handle is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            finally:
+                handle.close()
+
+    async def checkout(self, url: str, clone_options: Dict) -> MirrorCheckout:
+        """Fetch (or create) the mirror of ``url`` and add a worktree for the caller.
+
+        ``clone_options`` are passed to ``git clone --bare`` when the mirror is
+        created (depth, filter); later fetches inherit the same settings.
+        """
+        key = self.key_for(url)
+        os.makedirs(self._entry(key), exist_ok=True)
+
+        async with self._lock_for(key):
+            fetch_lock = await asyncio.to_thread(self._flock, self._entry(key, "fetch.lock"), fcntl.LOCK_EX)
+            try:
+                commit = await asyncio.to_thread(self._refresh, key, url, clone_options)
+                # Taken before the fetch lock is released so eviction can never see the mirror idle
+                use_lock = self._flock(self._entry(key, "use.lock"), fcntl.LOCK_SH)
+                try:
+                    path = await asyncio.to_thread(self._add_worktree, key, commit)
+                except BaseException:
+                    self._unlock(use_lock)
+                    raise
+            finally:
+                self._unlock(fetch_lock)
+
+        self._touch(key)
+        try:
+            await asyncio.to_thread(self.evict, key)
+        except Exception as e:
+            logger.warning(f"⚠️ Mirror cache eviction failed: {e}")
+        return MirrorCheckout(path=path, key=key, commit=commit, use_lock=use_lock)
+
+    async def fetch_commit(self, key: str, commit: str, depth: int = 1):
+        """Make ``commit`` available to the mirror's worktrees, fetching it under the mirror's locks.
+
+        Worktrees share the mirror's object store and ``shallow`` file, so a
+        fetch run inside a worktree would race other jobs' fetches and eviction.
+        """
+        async with self._lock_for(key):
+            fetch_lock = await asyncio.to_thread(self._flock, self._entry(key, "fetch.lock"), fcntl.LOCK_EX)
+            try:
+                await asyncio.to_thread(self._fetch_commit, key, commit, depth)
+            finally:
+                self._unlock(fetch_lock)
+
+    def _fetch_commit(self, key: str, commit: str, depth: int):
+        mirror = git.Git(self._entry(key, "mirror.git"))
+        try:
+            mirror.cat_file("-e", f"{commit}^{{commit}}")
+            return
+        except git.GitCommandError:
+            pass
+        mirror.fetch(f"--depth={depth}", "origin", commit)
+        self._fetches.inc()
+
+    def release(self, checkout: MirrorCheckout):
+        """Drop the job's worktree; its metadata is pruned by the next checkout of the mirror"""
+        try:
+            shutil.rmtree(checkout.path, ignore_errors=True)
+            self._touch(checkout.key)
+        finally:
+            self._unlock(checkout.use_lock)
+
+    def _refresh(self, key: str, url: str, clone_options: Dict) -> str:
+        # git.Git rather than git.Repo: GitPython does not read core.bare from config.worktree
+        mirror_path = self._entry(key, "mirror.git")
+        fetched_marker = self._entry(key, "fetched_at")
+
+        if os.path.isdir(mirror_path):
+            try:
+                mirror = git.Git(mirror_path)
+                if time.time() - self._mtime(fetched_marker) < self.fetch_ttl:
+                    self._shared_fetches.inc()
+                else:
+                    depth = clone_options.get("depth")
+                    mirror.fetch(*([f"--depth={depth}"] if depth else []), "origin", "HEAD")
+                    mirror.update_ref(HEAD_REF, "FETCH_HEAD")
+                    self._fetches.inc()
+                    self._touch(key, "fetched_at")
+                mirror.worktree("prune")
+                self._hits.inc()
+                logger.info(f"♻️ Reusing mirror {key}")
+                return mirror.rev_parse(HEAD_REF)
+            except Exception as e:
+                logger.warning(f"⚠️ Mirror {key} unusable, cloning it again: {e}")
+                shutil.rmtree(mirror_path, ignore_errors=True)
+
+        logger.info(f"🪞 Creating mirror {key} for {normalize_repository_url(url)}")
+        git.Repo.clone_from(url, mirror_path, bare=True, **clone_options)
+        mirror = git.Git(mirror_path)
+        mirror.config("gc.auto", "0")
+        # Per-worktree config up front: the first sparse checkout in a worktree would otherwise
+        # migrate core.bare into config.worktree while other jobs are reading the config
+        mirror.config("extensions.worktreeConfig", "true")
+        mirror.config("--worktree", "core.bare", "true")
+        mirror.config("--unset", "core.bare")
+        mirror.update_ref(HEAD_REF, "HEAD")
+        self._misses.inc()
+        self._touch(key, "fetched_at")
+        return mirror.rev_parse(HEAD_REF)
+
+    def _add_worktree(self, key: str, commit: str) -> str:
+        path = tempfile.mkdtemp(prefix="codequery_")
+        try:
+            git.Git(self._entry(key, "mirror.git")).worktree("add", "--detach", "--no-checkout", path, commit)
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        return path
+
+    def _touch(self, key: str, name: str = "last_used"):
+        with open(self._entry(key, name), "a"):
+            pass
+        os.utime(self._entry(key, name))
+
+    @staticmethod
+    def _mtime(path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    continue
+        return total
+
+    def evict(self, keep_key: Optional[str] = None) -> List[str]:
+        """Delete least-recently-used idle mirrors until the cache fits in max_bytes"""
+        evict_lock = self._flock(os.path.join(self.root, "evict.lock"), fcntl.LOCK_EX)
+        try:
+            entries: List[Tuple[float, str, int]] = []
+            for key in os.listdir(self.root):
+                mirror_path = self._entry(key, "mirror.git")
+                if os.path.isdir(mirror_path):
+                    entries.append((self._mtime(self._entry(key, "last_used")), key, self._dir_size(mirror_path)))
+
+            total = sum(size for _, _, size in entries)
+            evicted = []
+            for _, key, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if key == keep_key or not self._remove_if_idle(key):
+                    continue
+                total -= size
+                evicted.append(key)
+                self._evictions.inc()
+                logger.info(f"🗑️ Evicted mirror {key} ({size / 1024 / 1024:.1f} MB)")
+
+            self._bytes.set(total)
+            return evicted
+        finally:
+            self._unlock(evict_lock)
+
+    def _remove_if_idle(self, key: str) -> bool:
+        locks = []
+        try:
+            for name in ("fetch.lock", "use.lock"):
+                locks.append(self._flock(self._entry(key, name), fcntl.LOCK_EX | fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        else:
+            shutil.rmtree(self._entry(key, "mirror.git"), ignore_errors=True)
+            return True
+        finally:
+            for handle in locks:
+                self._unlock(handle)
+
+
+# One cache per process: the asyncio locks only serialise jobs that share the instance
+_mirror_cache: Optional[RepositoryMirrorCache] = None
+
+
+def get_mirror_cache() -> RepositoryMirrorCache:
+    global _mirror_cache
+    if _mirror_cache is None:
+        _mirror_cache = RepositoryMirrorCache()
+    return _mirror_cache
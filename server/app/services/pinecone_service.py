@@ -1,12 +1,23 @@
 from pinecone import Pinecone, ServerlessSpec
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Tuple
+import asyncio
+import json
 import logging
-import os
+import random
+import time
+import numpy as np
 from app.core.config import settings
+from app.core.metrics import metrics
+from .vector_backend import VectorBackend, build_search_result, build_vector_metadata, file_vector_prefix, vector_id_for
 
 logger = logging.getLogger(__name__)
 
-class PineconeService:
+# Most IDs Pinecone accepts in one delete request
+_DELETE_BATCH = 1000
+
+class PineconeService(VectorBackend):
+    name = "pinecone"
+    
     def __init__(self):
         try:
             print("🔧 [PINECONE] Initializing Pinecone client...", flush=True)
@@ -21,6 +32,11 @@ class PineconeService:
             
             self.index = self.pc.Index(self.index_name)
             
+            self._batch_seconds = metrics.histogram("pinecone_upsert_batch_seconds", "Latency of one successful upsert request")
+            self._batch_retries = metrics.counter("pinecone_upsert_retries", "Upsert requests retried after an error")
+            self._vectors_upserted = metrics.counter("pinecone_vectors_upserted", "Vectors written to Pinecone")
+            self._throughput = metrics.gauge("pinecone_upsert_vectors_per_second", "Throughput of the most recent store_embeddings call")
+            
             print(f"✅ [PINECONE] Connected to index: {self.index_name}", flush=True)
             logger.info(f"🎯 Pinecone service initialized with index: {self.index_name}")
             
@@ -55,80 +71,124 @@ class PineconeService:
             print(f"❌ [PINECONE] Error with index: {e}", flush=True)
             raise
     
-    async def store_embeddings(self, repository_id: int, embedded_chunks: List[Dict]):
-        """Store embeddings in Pinecone with repository namespace"""
-        print(f"💾 [PINECONE] Storing {len(embedded_chunks)} embeddings for repository {repository_id}", flush=True)
-        logger.info(f"💾 Storing {len(embedded_chunks)} embeddings for repository {repository_id}")
+    async def store_embeddings(self, namespace: str, embedded_chunks: List[Dict]):
+        """Store embeddings in Pinecone under the repository namespace"""
+        print(f"💾 [PINECONE] Storing {len(embedded_chunks)} embeddings in {namespace}", flush=True)
+        logger.info(f"💾 Storing {len(embedded_chunks)} embeddings in {namespace}")
         
         try:
             vectors = []
-            for i, chunk in enumerate(embedded_chunks):
-                vector_id = f"repo_{repository_id}_chunk_{chunk['chunk_index']}_{i}"
-                
+            for chunk in embedded_chunks:
                 vector = {
-                    "id": vector_id,
-                    "values": chunk['embedding'],
-                    "metadata": {
-                        "repository_id": repository_id,
-                        "file_path": chunk['file_path'],
-                        "start_line": chunk['start_line'],
-                        "end_line": chunk['end_line'],
-                        "chunk_type": chunk['chunk_type'],
-                        "content_length": chunk['content_length'],
-                        "content": chunk['content'][:1000] 
-                    }
+                    "id": vector_id_for(namespace, chunk['file_path'], chunk['chunk_index']),
+                    "values": np.asarray(chunk['embedding'], dtype=np.float32),
+                    "metadata": build_vector_metadata(chunk)
                 }
                 vectors.append(vector)
             
-            batch_size = 100
-            total_batches = (len(vectors) + batch_size - 1) // batch_size
-            
-            for batch_num, i in enumerate(range(0, len(vectors), batch_size), 1):
-                end_idx = min(i + batch_size, len(vectors))
-                batch_vectors = vectors[i:end_idx]
-                
-                self.index.upsert(
-                    vectors=batch_vectors,
-                    namespace=f"repo_{repository_id}"
-                )
-                
-                print(f"✅ [PINECONE] Stored batch {batch_num}/{total_batches} ({len(batch_vectors)} vectors)", flush=True)
-            
-            print(f"🎉 [PINECONE] Successfully stored all {len(embedded_chunks)} embeddings for repository {repository_id}!", flush=True)
-            logger.info(f"✅ Successfully stored all embeddings for repository {repository_id}")
+            batches = self._split_by_payload(vectors)
+            semaphore = asyncio.Semaphore(settings.pinecone_upsert_concurrency)
+            started = time.perf_counter()
+            
+            async def upsert_batch(batch_num: int, batch_vectors: List[Dict], payload_bytes: int):
+                async with semaphore:
+                    await self._upsert_with_retry(namespace, batch_num, len(batches), batch_vectors, payload_bytes)
+            
+            tasks = [
+                asyncio.create_task(upsert_batch(batch_num, batch_vectors, payload_bytes))
+                for batch_num, (batch_vectors, payload_bytes) in enumerate(batches, 1)
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # One batch gave up: don't leave the rest writing in the background
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            
+            elapsed = time.perf_counter() - started
+            if elapsed > 0:
+                self._throughput.set(len(vectors) / elapsed)
+            
+            print(f"🎉 [PINECONE] Successfully stored all {len(embedded_chunks)} embeddings in {namespace}!", flush=True)
+            logger.info(f"✅ Successfully stored all embeddings in {namespace}")
             
         except Exception as e:
             print(f"❌ [PINECONE] Error storing embeddings: {e}", flush=True)
             logger.error(f"❌ Error storing embeddings in Pinecone: {e}")
             raise
     
-    async def search_similar_code(self, repository_id: int, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
+    def _split_by_payload(self, vectors: List[Dict]) -> List[Tuple[List[Dict], int]]:
+        """Group vectors into requests bounded by estimated JSON size and vector count"""
+        max_bytes = settings.pinecone_upsert_max_bytes
+        max_vectors = settings.pinecone_upsert_max_vectors
+        batches = []
+        current, current_bytes = [], 0
+        
+        for vector in vectors:
+            # ~12 bytes per JSON-encoded float plus id and metadata
+            size = len(vector["id"]) + len(vector["values"]) * 12 + len(json.dumps(vector["metadata"])) + 64
+            if current and (current_bytes + size > max_bytes or len(current) >= max_vectors):
+                batches.append((current, current_bytes))
+                current, current_bytes = [], 0
+            current.append(vector)
+            current_bytes += size
+        
+        if current:
+            batches.append((current, current_bytes))
+        return batches
+    
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        status = getattr(error, "status", None) or getattr(error, "status_code", None)
+        if isinstance(status, int) and 400 <= status < 500 and status != 429:
+            return False
+        return True
+    
+    async def _upsert_with_retry(self, namespace: str, batch_num: int, total_batches: int, batch_vectors: List[Dict], payload_bytes: int):
+        # Float lists only at the wire boundary, one request at a time; everything upstream keeps float32 arrays
+        batch_vectors = [{**vector, "values": vector["values"].tolist()} for vector in batch_vectors]
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.index.upsert, vectors=batch_vectors, namespace=namespace)
+            except Exception as e:
+                attempt += 1
+                if attempt > settings.pinecone_upsert_max_retries or not self._is_retryable(e):
+                    raise
+                # Full jitter keeps concurrent batches from retrying in lockstep
+                delay = random.uniform(0, settings.pinecone_upsert_backoff_seconds * (2 ** (attempt - 1)))
+                self._batch_retries.inc()
+                print(f"⚠️ [PINECONE] Batch {batch_num}/{total_batches} failed ({e}), retry {attempt} in {delay:.2f}s", flush=True)
+                await asyncio.sleep(delay)
+                continue
+            
+            elapsed = time.perf_counter() - start
+            self._batch_seconds.observe(elapsed)
+            self._vectors_upserted.inc(len(batch_vectors))
+            rate = len(batch_vectors) / elapsed if elapsed > 0 else 0.0
+            print(f"✅ [PINECONE] Stored batch {batch_num}/{total_batches} ({len(batch_vectors)} vectors, {payload_bytes / 1024:.0f} KB) in {elapsed:.2f}s ({rate:.0f} vectors/s)", flush=True)
+            return
+    
+    async def search_similar_code(self, namespace: str, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
         """Search for similar code using Pinecone"""
         try:
-            print(f"🔍 [PINECONE] Searching for {top_k} similar chunks in repository {repository_id}", flush=True)
+            print(f"🔍 [PINECONE] Searching for {top_k} similar chunks in {namespace}", flush=True)
             
-
-            results = self.index.query(
-                vector=query_embedding,
+            results = await asyncio.to_thread(
+                self.index.query,
+                vector=np.asarray(query_embedding, dtype=np.float32).tolist(),
                 top_k=top_k,
-                namespace=f"repo_{repository_id}",
+                namespace=namespace,
                 include_metadata=True,
                 include_values=False
             )
             
             search_results = []
             for match in results.matches:
-                similarity = match.score  
-                metadata = match.metadata
-                
-                search_results.append({
-                    'content': metadata.get('content', ''),
-                    'metadata': metadata,
-                    'similarity': similarity,
-                    'file_path': metadata.get('file_path', ''),
-                    'start_line': metadata.get('start_line', 0),
-                    'end_line': metadata.get('end_line', 0)
-                })
+                search_results.append(build_search_result(match.metadata, match.score, match.id))
             
             print(f"✅ [PINECONE] Found {len(search_results)} similar code chunks", flush=True)
             logger.info(f"🔍 Found {len(search_results)} similar code chunks")
@@ -139,15 +199,44 @@ class PineconeService:
             logger.error(f"❌ Error searching in Pinecone: {e}")
             return []
     
-    async def delete_repository_data(self, repository_id: int):
-        """Delete all vectors for a repository"""
+    def _delete_file_vectors(self, namespace: str, file_paths: Iterable[str]) -> int:
+        """List the files' vector IDs and delete them in requests of up to 1000 IDs"""
+        deleted = 0
+        pending: List[str] = []
+        for file_path in file_paths:
+            for ids in self.index.list(prefix=file_vector_prefix(namespace, file_path), namespace=namespace):
+                pending.extend(ids)
+                while len(pending) >= _DELETE_BATCH:
+                    self.index.delete(ids=pending[:_DELETE_BATCH], namespace=namespace)
+                    deleted += _DELETE_BATCH
+                    pending = pending[_DELETE_BATCH:]
+        if pending:
+            self.index.delete(ids=pending, namespace=namespace)
+            deleted += len(pending)
+        return deleted
+    
+    async def delete_file_vectors(self, namespace: str, file_paths: Iterable[str]) -> int:
+        """Delete every vector belonging to the given files"""
         try:
-            namespace = f"repo_{repository_id}"
+            # One blocking round trip per listed page and delete request; keep them off the event loop
+            deleted = await asyncio.to_thread(self._delete_file_vectors, namespace, list(file_paths))
             
-            self.index.delete(delete_all=True, namespace=namespace)
+            print(f"🗑️ [PINECONE] Deleted {deleted} vectors for changed files in {namespace}", flush=True)
+            logger.info(f"🗑️ Deleted {deleted} file vectors in {namespace}")
+            return deleted
+            
+        except Exception as e:
+            print(f"❌ [PINECONE] Error deleting file vectors: {e}", flush=True)
+            logger.error(f"❌ Error deleting file vectors in Pinecone: {e}")
+            raise
+    
+    async def delete_namespace(self, namespace: str):
+        """Delete all vectors in a repository namespace"""
+        try:
+            await asyncio.to_thread(self.index.delete, delete_all=True, namespace=namespace)
             
-            print(f"🗑️ [PINECONE] Deleted all data for repository {repository_id}", flush=True)
-            logger.info(f"🗑️ Deleted all data for repository {repository_id}")
+            print(f"🗑️ [PINECONE] Deleted all data in {namespace}", flush=True)
+            logger.info(f"🗑️ Deleted all data in {namespace}")
             
         except Exception as e:
             print(f"⚠️ [PINECONE] Error deleting repository data: {e}", flush=True)
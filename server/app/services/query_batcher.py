@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+import numpy as np
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class QueryBatcher:
+    """Coalesces concurrent single-query encodes into one batched forward pass.
+
+    Queries arriving within ``window_ms`` of the first pending one (or until
+    ``max_batch_size`` is reached) are encoded together and each caller gets
+    back its own row of the result.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], Awaitable[np.ndarray]], max_batch_size: int = 32, window_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; hold in-flight batches here
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._batch_size = metrics.histogram("embedding_query_batch_size", "Queries encoded per coalesced batch", buckets=BATCH_SIZE_BUCKETS)
+        self._queue_wait = metrics.histogram("embedding_query_queue_wait_seconds", "Time a query waited for its batch to flush", buckets=QUEUE_WAIT_BUCKETS)
+
+    async def submit(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+
+        if self._pending:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Fail queries still waiting for a flush and cancel the batches being encoded"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for _, future, _ in self._pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Query batcher closed"))
+        self._pending = []
+
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        # Callers that gave up while waiting do not need encoding
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            self._queue_wait.observe(now - enqueued_at)
+
+        # Identical concurrent queries share one row
+        unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self._batch_size.observe(len(unique_texts))
+
+        try:
+            vectors = await self.encode_fn(unique_texts)
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        rows = {text: vectors[i] for i, text in enumerate(unique_texts)}
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(rows[text])
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCacheBackend(ABC):
+    """Key/value store behind QueryCache; values are JSON-serialisable"""
+
+    name: str = "base"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the stored value, or None when missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        """Store a value for ttl seconds"""
+
+    @abstractmethod
+    async def get_counter(self, key: str) -> int:
+        """Read a counter that never expires (0 when unset)"""
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """Increment a counter that never expires"""
+
+    async def close(self):
+        pass
+
+
+class InMemoryQueryCacheBackend(QueryCacheBackend):
+    """Per-process LRU with per-entry expiry"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._evictions = metrics.counter("query_cache_evictions", "Entries evicted from the in-process query cache")
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions.inc()
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisQueryCacheBackend(QueryCacheBackend):
+    """Shared cache for deployments running several API processes.
+
+    Redis handles TTL natively; LRU eviction comes from the server's
+    ``maxmemory-policy`` (use ``allkeys-lru``).
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "qodex:qcache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise Exception("QUERY_CACHE_BACKEND=redis requires the 'redis' package")
+
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self._client.set(self.prefix + key, json.dumps(value, default=str), ex=max(1, int(ttl)))
+
+    async def get_counter(self, key: str) -> int:
+        raw = await self._client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(self.prefix + key)
+
+    async def close(self):
+        await self._client.close()
+
+
+def create_query_cache_backend(name: Optional[str] = None) -> QueryCacheBackend:
+    name = (name or settings.query_cache_backend).lower()
+
+    if name == "memory":
+        return InMemoryQueryCacheBackend(settings.query_cache_max_entries)
+    if name == "redis":
+        return RedisQueryCacheBackend(settings.query_cache_redis_url)
+
+    raise ValueError(f"Unknown query cache backend: {name}")
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+
+def _digest(*parts: str) -> str:
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class QueryCache:
+    """Two-level cache in front of chat retrieval and generation.
+
+    Level one maps a query embedding to the chunks retrieved for it, level two
+    maps (normalized query, retrieved chunk set) to the generated answer. Both
+    keys include the repository version, so re-indexing or deleting a repository
+    makes its old entries unreachable; they then age out through TTL and LRU.
+    """
+
+    def __init__(self, backend: Optional[QueryCacheBackend] = None):
+        self.backend = backend or create_query_cache_backend()
+        self.enabled = settings.query_cache_enabled
+        self.retrieval_ttl = settings.query_cache_retrieval_ttl
+        self.answer_ttl = settings.query_cache_answer_ttl
+
+        self._counters = {
+            (level, outcome): metrics.counter(f"query_cache_{level}_{outcome}", f"Query cache {level} lookups that were {outcome}")
+            for level in ("retrieval", "answer")
+            for outcome in ("hits", "misses")
+        }
+        logger.info(f"🗃️ Query cache using {self.backend.name} backend (enabled: {self.enabled})")
+
+    async def repository_version(self, repository) -> str:
+        """Version string that changes whenever the repository's index changes.
+
+        The generation counter covers invalidation from this process (or every
+        process, with a shared backend); the indexed commit and update time cover
+        re-indexing done by a separate worker process.
+        """
+        generation = await self.backend.get_counter(f"gen:{repository.id}")
+        updated_at = repository.updated_at.timestamp() if repository.updated_at else 0
+        return f"{repository.last_indexed_commit or ''}:{updated_at:.0f}:{generation}"
+
+    async def invalidate(self, repository_id: int):
+        try:
+            await self.backend.incr(f"gen:{repository_id}")
+            logger.info(f"🧹 Invalidated query cache for repository {repository_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to invalidate query cache for repository {repository_id}: {e}")
+
+    @staticmethod
+    def retrieval_key(repository_id: int, version: str, query_embedding: np.ndarray, top_k: int, mode: str = "vector") -> str:
+        # float16 rounding absorbs last-bit noise between batched and single encodes
+        embedding_bytes = np.asarray(query_embedding, dtype=np.float16).tobytes()
+        embedding_hash = hashlib.sha1(embedding_bytes).hexdigest()
+        return f"ret:{repository_id}:{_digest(version, embedding_hash, str(top_k), mode)}"
+
+    @staticmethod
+    def answer_key(repository_id: int, version: str, query: str, chunks: List[Dict]) -> str:
+        chunk_ids = sorted(f"{c.get('file_path')}:{c.get('start_line')}-{c.get('end_line')}" for c in chunks)
+        return f"ans:{repository_id}:{_digest(version, normalize_query(query), *chunk_ids)}"
+
+    async def _lookup(self, level: str, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Query cache read failed: {e}")
+            value = None
+        self._counters[(level, "hits" if value is not None else "misses")].inc()
+        return value
+
+    async def _store(self, key: str, value: Any, ttl: float):
+        if not self.enabled:
+            return
+        try:
+            await self.backend.set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Query cache write failed: {e}")
+
+    async def get_retrieval(self, key: str) -> Optional[List[Dict]]:
+        return await self._lookup("retrieval", key)
+
+    async def set_retrieval(self, key: str, chunks: List[Dict]):
+        await self._store(key, chunks, self.retrieval_ttl)
+
+    async def get_answer(self, key: str) -> Optional[Dict]:
+        return await self._lookup("answer", key)
+
+    async def set_answer(self, key: str, response: Dict):
+        await self._store(key, response, self.answer_ttl)
+
+    async def close(self):
+        await self.backend.close()
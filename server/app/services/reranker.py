@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest batch in the running seconds-per-pair estimate
+_PAIR_TIME_SMOOTHING = 0.2
+
+
+def load_cross_encoder(model_name: str, cache_dir: str):
+    """Load a CrossEncoder from the shared model cache"""
+    from sentence_transformers import CrossEncoder
+
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ['HUGGINGFACE_HUB_CACHE'] = cache_dir
+    os.environ['TRANSFORMERS_CACHE'] = cache_dir
+    os.environ['HF_HOME'] = cache_dir
+
+    return CrossEncoder(model_name, max_length=settings.rerank_max_length, device='cpu')
+
+
+def overlaps(a: Dict, b: Dict) -> bool:
+    return (a['file_path'] == b['file_path']
+            and a['start_line'] <= b['end_line'] and b['start_line'] <= a['end_line'])
+
+
+class Reranker:
+    """Re-scores retrieved chunks against the query with a small CPU cross-encoder.
+
+    Retrieval over-fetches ``RERANK_CANDIDATES`` chunks; the cross-encoder
+    scores them in batches of ``RERANK_BATCH_SIZE`` on its own thread pool.
+    How many candidates get scored adapts to ``RERANK_BUDGET_MS`` from a
+    running estimate of the time per pair, and scoring also stops at the first
+    batch boundary past the budget. The best non-overlapping chunks above
+    ``RERANK_MIN_SCORE`` are kept, at least one and at most ``top_k``.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, cache_dir: str = "/app/models_cache"):
+        self.model_name = model_name or settings.rerank_model
+        print(f"🚀 [RERANK] Loading cross-encoder {self.model_name}", flush=True)
+        self.model = load_cross_encoder(self.model_name, cache_dir)
+        self.executor = ThreadPoolExecutor(max_workers=settings.rerank_threads, thread_name_prefix="rerank")
+        self.batch_size = settings.rerank_batch_size
+        self.seconds_per_pair: Optional[float] = None
+
+        self._scored = metrics.histogram("rerank_scored_candidates", "Candidates scored per query",
+                                         buckets=(1, 2, 5, 10, 20, 30, 50, 100))
+        self._pair_ms = metrics.gauge("rerank_pair_ms", "Running estimate of cross-encoder time per pair")
+        print("✅ [RERANK] Cross-encoder loaded successfully!", flush=True)
+        logger.info(f"🎯 Reranker initialized ({self.model_name})")
+
+    def depth(self, available: int) -> int:
+        """Candidates that fit the latency budget, never less than one batch"""
+        if self.seconds_per_pair is None:
+            return available
+        affordable = int(settings.rerank_budget_ms / 1000 / self.seconds_per_pair)
+        return min(available, max(self.batch_size, affordable))
+
+    def _observe(self, seconds_per_pair: float):
+        if self.seconds_per_pair is None:
+            self.seconds_per_pair = seconds_per_pair
+        else:
+            self.seconds_per_pair += _PAIR_TIME_SMOOTHING * (seconds_per_pair - self.seconds_per_pair)
+        self._pair_ms.set(round(self.seconds_per_pair * 1000, 3))
+
+    def _score(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        return np.asarray(self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False), dtype=np.float32)
+
+    async def rerank(self, query: str, candidates: List[Dict], top_k: int) -> Tuple[List[Dict], Dict]:
+        """Return the kept chunks, best first, each with a ``rerank_score``, and the stage timings"""
+        started = time.perf_counter()
+        deadline = started + settings.rerank_budget_ms / 1000
+        depth = self.depth(len(candidates))
+        loop = asyncio.get_running_loop()
+
+        scores: List[float] = []
+        for start in range(0, depth, self.batch_size):
+            batch = candidates[start:min(start + self.batch_size, depth)]
+            pairs = [(query, f"{chunk['file_path']}\n{chunk['content']}") for chunk in batch]
+            batch_started = time.perf_counter()
+            scores.extend(await loop.run_in_executor(self.executor, self._score, pairs))
+            self._observe((time.perf_counter() - batch_started) / len(batch))
+            if time.perf_counter() >= deadline:
+                break
+
+        ranked = sorted(
+            ({**chunk, 'rerank_score': float(score)} for chunk, score in zip(candidates, scores)),
+            key=lambda chunk: chunk['rerank_score'], reverse=True
+        )
+        kept: List[Dict] = []
+        for chunk in ranked:
+            if len(kept) >= top_k or (kept and chunk['rerank_score'] < settings.rerank_min_score):
+                break
+            if not any(overlaps(chunk, other) for other in kept):
+                kept.append(chunk)
+
+        elapsed = time.perf_counter() - started
+        self._scored.observe(len(scores))
+        return kept, {
+            'rerank_ms': round(elapsed * 1000, 1),
+            'rerank_candidates': len(candidates),
+            'rerank_scored': len(scores),
+            'rerank_kept': len(kept),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
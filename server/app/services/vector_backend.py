@@ -0,0 +1,84 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List
+import hashlib
+import numpy as np
+from app.core.config import settings
+
+# Alias paths kept per vector; keeps metadata under Pinecone's per-vector limit
+MAX_ALIASES = 100
+
+
+def file_vector_prefix(namespace: str, file_path: str) -> str:
+    """ID prefix shared by every vector of one file, so a file's vectors can be listed and replaced"""
+    file_key = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:16]
+    return f"{namespace}_{file_key}_"
+
+
+def vector_id_for(namespace: str, file_path: str, chunk_index: int) -> str:
+    return f"{file_vector_prefix(namespace, file_path)}{chunk_index}"
+
+
+def content_hash(text: str) -> str:
+    """Short fingerprint of a chunk's text, so a cached copy can be told apart from a re-indexed one"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def build_vector_metadata(chunk: Dict) -> Dict:
+    """Metadata stored alongside each chunk vector.
+
+    With the chunk store enabled the text itself stays out of the metadata and
+    search results are hydrated from the store by vector ID.
+    """
+    metadata = {
+        "file_path": chunk['file_path'],
+        "start_line": chunk['start_line'],
+        "end_line": chunk['end_line'],
+        "chunk_type": chunk['chunk_type'],
+        "content_length": chunk['content_length'],
+        "scope": chunk.get('scope', ''),
+        "aliases": chunk.get('aliases', [])[:MAX_ALIASES],
+        "content_hash": content_hash(chunk['content'])
+    }
+    if not settings.chunk_store_enabled:
+        metadata["content"] = chunk['content'][:1000]
+    return metadata
+
+
+def build_search_result(metadata: Dict, similarity: float, vector_id: str = "") -> Dict:
+    """Shape every backend returns from search_similar_code"""
+    return {
+        'vector_id': vector_id,
+        'content': metadata.get('content', ''),
+        'content_hash': metadata.get('content_hash', ''),
+        'metadata': metadata,
+        'similarity': similarity,
+        'file_path': metadata.get('file_path', ''),
+        'start_line': metadata.get('start_line', 0),
+        'end_line': metadata.get('end_line', 0),
+        'aliases': list(metadata.get('aliases') or [])
+    }
+
+
+class VectorBackend(ABC):
+    """Storage engine behind VectorService; one namespace per indexed repository"""
+
+    name: str = "base"
+
+    @abstractmethod
+    async def store_embeddings(self, namespace: str, embedded_chunks: List[Dict]):
+        """Upsert chunk vectors into the namespace"""
+
+    @abstractmethod
+    async def search_similar_code(self, namespace: str, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
+        """Return the top_k most similar chunks"""
+
+    @abstractmethod
+    async def delete_file_vectors(self, namespace: str, file_paths: Iterable[str]) -> int:
+        """Delete every vector belonging to the given files"""
+
+    @abstractmethod
+    async def delete_namespace(self, namespace: str):
+        """Delete all vectors in the namespace"""
+
+    def close(self):
+        pass
@@ -1,32 +1,151 @@
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
+import asyncio
+import numpy as np
 import logging
-from .pinecone_service import PineconeService
+from app.core.config import settings
+from .chunk_store import create_chunk_store
+from .lexical_index import LexicalIndex
+from .vector_backend import VectorBackend, file_vector_prefix, vector_id_for
 
 logger = logging.getLogger(__name__)
 
+def create_vector_backend(name: Optional[str] = None) -> VectorBackend:
+    """Instantiate the backend selected by settings.vector_backend"""
+    name = (name or settings.vector_backend).lower()
+
+    if name == "pinecone":
+        from .pinecone_service import PineconeService
+        return PineconeService()
+    if name == "local":
+        from .local_vector_store import LocalVectorStore
+        return LocalVectorStore()
+
+    raise ValueError(f"Unknown vector backend: {name}")
+
+def reciprocal_rank_fusion(vector_results: List[Dict], keyword_results: List[Dict], k: int) -> List[Dict]:
+    """Merge two ranked lists by summing 1 / (k + rank) per chunk.
+
+    Ranks rather than scores are fused because cosine similarity and BM25
+    live on unrelated scales. Each result records which retrievers found it
+    in ``match`` ("vector", "keyword" or "both").
+    """
+    fused: Dict[tuple, Dict] = {}
+    for source, results in (("vector", vector_results), ("keyword", keyword_results)):
+        for rank, result in enumerate(results, 1):
+            key = (result['file_path'], result['start_line'], result['end_line'])
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, 'match': source, 'fused_score': 0.0}
+            elif entry['match'] != source:
+                entry['match'] = 'both'
+                entry.setdefault('keyword_score', result.get('keyword_score'))
+            entry['fused_score'] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda entry: entry['fused_score'], reverse=True)
+
 class VectorService:
-    """Vector service that uses Pinecone for production-ready vector storage"""
-    
-    def __init__(self):
+    """Vector service over a pluggable backend (Pinecone in production, local store offline)"""
+
+    def __init__(self, backend: Optional[VectorBackend] = None):
         try:
-            print("🚀 [VECTOR] Initializing production vector service with Pinecone", flush=True)
-            self.pinecone_service = PineconeService()
+            print(f"🚀 [VECTOR] Initializing vector service with {backend.name if backend else settings.vector_backend} backend", flush=True)
+            self.backend = backend or create_vector_backend()
+            self.lexical = LexicalIndex() if settings.hybrid_search_enabled else None
+            self.chunk_store = create_chunk_store() if settings.chunk_store_enabled else None
             print("✅ [VECTOR] Vector service initialized successfully!", flush=True)
-            logger.info("🗄️ Vector service initialized with Pinecone")
-            
+            logger.info(f"🗄️ Vector service initialized with {self.backend.name}")
+
         except Exception as e:
             print(f"❌ [VECTOR] Failed to initialize vector service: {e}", flush=True)
             logger.error(f"❌ Failed to initialize vector service: {e}")
             raise Exception(f"Failed to initialize vector service: {e}")
-    
-    async def store_embeddings(self, repository_id: int, embedded_chunks: List[Dict]):
-        """Store embeddings using Pinecone"""
-        return await self.pinecone_service.store_embeddings(repository_id, embedded_chunks)
-    
-    async def search_similar_code(self, repository_id: int, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
-        """Search for similar code using Pinecone"""
-        return await self.pinecone_service.search_similar_code(repository_id, query_embedding, top_k)
-    
-    async def delete_repository_data(self, repository_id: int):
-        """Delete repository data using Pinecone"""
-        return await self.pinecone_service.delete_repository_data(repository_id)
\ No newline at end of file
+
+    @staticmethod
+    def legacy_namespace(repository_id: int) -> str:
+        """Namespace of repositories indexed before shared indexes existed"""
+        return f"repo_{repository_id}"
+
+    @staticmethod
+    def index_namespace(vector_index_id: int) -> str:
+        return f"idx_{vector_index_id}"
+
+    @classmethod
+    def namespace_for(cls, repository) -> str:
+        """Namespace a repository reads from: its shared index, or its own legacy namespace"""
+        if repository.vector_index_id is not None:
+            return cls.index_namespace(repository.vector_index_id)
+        return cls.legacy_namespace(repository.id)
+
+    async def store_embeddings(self, namespace: str, embedded_chunks: List[Dict]):
+        """Store embeddings in the namespace, their text in the chunk store and their identifiers in its keyword index"""
+        # Text goes first, so a vector is never searchable before its text can be looked up
+        if self.chunk_store:
+            await self.chunk_store.put_many([
+                (vector_id_for(namespace, chunk['file_path'], chunk['chunk_index']), chunk['content'])
+                for chunk in embedded_chunks
+            ])
+        await self.backend.store_embeddings(namespace, embedded_chunks)
+        if self.lexical:
+            await self.lexical.add(namespace, embedded_chunks)
+
+    async def search_similar_code(self, namespace: str, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
+        """Search for similar code in the namespace"""
+        return await self.backend.search_similar_code(namespace, query_embedding, top_k)
+
+    async def hybrid_search(self, namespace: str, query: str, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
+        """Vector and BM25 keyword search, fused by reciprocal rank.
+
+        Falls back to plain vector search when hybrid search is disabled;
+        namespaces indexed before the keyword index existed simply return no
+        keyword hits until they are re-indexed.
+        """
+        if not self.lexical:
+            return await self.search_similar_code(namespace, query_embedding, top_k)
+
+        depth = max(top_k, settings.hybrid_candidates)
+        vector_results, keyword_results = await asyncio.gather(
+            self.search_similar_code(namespace, query_embedding, depth),
+            self.lexical.search(namespace, query, depth),
+        )
+        return reciprocal_rank_fusion(vector_results, keyword_results, settings.hybrid_rrf_k)[:top_k]
+
+    async def delete_file_vectors(self, namespace: str, file_paths: Iterable[str]) -> int:
+        """Delete the vectors of specific files"""
+        file_paths = list(file_paths)
+        deleted = await self.backend.delete_file_vectors(namespace, file_paths)
+        if self.lexical:
+            await self.lexical.delete_files(namespace, file_paths)
+        if self.chunk_store:
+            await self.chunk_store.delete_prefixes([file_vector_prefix(namespace, path) for path in file_paths])
+        return deleted
+
+    async def delete_namespace(self, namespace: str):
+        """Delete all vectors in the namespace"""
+        await self.backend.delete_namespace(namespace)
+        if self.lexical:
+            await self.lexical.delete_namespace(namespace)
+        if self.chunk_store:
+            await self.chunk_store.delete_prefixes([f"{namespace}_"])
+
+    async def hydrate(self, chunks: List[Dict]) -> List[Dict]:
+        """Fill in the text of search results from the chunk store, in one batched lookup.
+
+        Results without a stored text (indexed before the chunk store existed)
+        keep the truncated content their metadata carried.
+        """
+        keys = [(chunk['vector_id'], chunk.get('content_hash', '')) for chunk in chunks if chunk.get('vector_id')]
+        if not self.chunk_store or not keys:
+            return chunks
+        try:
+            texts = await self.chunk_store.get_many(keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Chunk store lookup failed, using metadata content: {e}")
+            return chunks
+        return [
+            {**chunk, 'content': texts[chunk['vector_id']]} if chunk.get('vector_id') in texts else chunk
+            for chunk in chunks
+        ]
+
+    def close(self):
+        self.backend.close()
+        if self.chunk_store:
+            self.chunk_store.close()
@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque token for the (created_at, id) position of a row"""
+    payload = json.dumps({"t": created_at.isoformat(), "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_before(created_at_column, id_column, cursor: Optional[str]):
+    """WHERE clause selecting rows strictly older than the cursor, or None for the first page.
+
+    Row-value comparison lets Postgres walk the (…, created_at, id) index directly.
+    """
+    if not cursor:
+        return None
+    created_at, row_id = decode_cursor(cursor)
+    return tuple_(created_at_column, id_column) < tuple_(created_at, row_id)
+
+
+def page_of(rows: Sequence, limit: int) -> Tuple[list, Optional[str]]:
+    """Split a newest-first result fetched with ``limit + 1`` rows into the page and the next cursor"""
+    rows = list(rows)
+    has_more = len(rows) > limit
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if has_more and page else None
+    return page, next_cursor
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.repository import Repository
+from app.models.vector_index import VectorIndex, VectorIndexStatusEnum
+from app.services.code_chunker import CHUNKER_VERSION
+from app.services.mirror_cache import normalize_repository_url
+
+logger = logging.getLogger(__name__)
+
+
+def index_key(github_url: str, commit_sha: str, embedding_model: str) -> Dict:
+    """Identity of a vector index: same repository content, chunking and model give the same vectors"""
+    return {
+        "normalized_url": normalize_repository_url(github_url),
+        "commit_sha": commit_sha,
+        "chunker_version": CHUNKER_VERSION,
+        "embedding_model": embedding_model,
+    }
+
+
+def _matches(index: VectorIndex, key: Dict) -> bool:
+    return all(getattr(index, column) == value for column, value in key.items())
+
+
+async def find_index(db: AsyncSession, key: Dict) -> Optional[VectorIndex]:
+    return await db.scalar(
+        select(VectorIndex)
+        .where(*(getattr(VectorIndex, column) == value for column, value in key.items()))
+        .execution_options(populate_existing=True)
+    )
+
+
+async def reference_count(db: AsyncSession, vector_index_id: int) -> int:
+    return await db.scalar(
+        select(func.count(Repository.id)).where(Repository.vector_index_id == vector_index_id)
+    ) or 0
+
+
+async def claim_index(db: AsyncSession, key: Dict) -> Tuple[VectorIndex, bool]:
+    """Return (index, True) when the caller must build it, (index, False) when it exists already.
+
+    A BUILDING row nobody references that has not been touched for
+    SHARED_INDEX_STALE_SECONDS is taken to belong to a crashed job and is
+    replaced.
+    """
+    existing = await find_index(db, key)
+    if existing is not None:
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.shared_index_stale_seconds)
+        updated_at = existing.updated_at or existing.created_at
+        if updated_at is not None and updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        is_stale = (
+            existing.status == VectorIndexStatusEnum.BUILDING
+            and updated_at is not None and updated_at < stale_before
+            and await reference_count(db, existing.id) == 0
+        )
+        if not is_stale:
+            return existing, False
+
+        logger.warning(f"⚠️ Replacing abandoned index build {existing.id}")
+        await db.execute(delete(VectorIndex).where(VectorIndex.id == existing.id, VectorIndex.updated_at == existing.updated_at))
+        await db.commit()
+
+    # Savepoint, so losing the race does not expire the caller's other objects
+    index = VectorIndex(**key, status=VectorIndexStatusEnum.BUILDING)
+    try:
+        async with db.begin_nested():
+            db.add(index)
+    except IntegrityError:
+        # Another job claimed the same key first
+        index = await find_index(db, key)
+        await db.commit()
+        if index is None:
+            raise Exception("Shared index claim raced with its deletion, retrying")
+        return index, False
+    await db.commit()
+    return index, True
+
+
+async def wait_for_index(db: AsyncSession, index: VectorIndex, deadline: float) -> Optional[VectorIndex]:
+    """Poll a BUILDING index until it is READY.
+
+    Returns None when the build was abandoned or the index moved to another
+    commit, so the caller should claim again.
+    """
+    key = {column: getattr(index, column) for column in ("normalized_url", "commit_sha", "chunker_version", "embedding_model")}
+    while True:
+        current = await db.scalar(
+            select(VectorIndex).where(VectorIndex.id == index.id).execution_options(populate_existing=True)
+        )
+        await db.commit()
+        if current is None or not _matches(current, key):
+            return None
+        if current.status == VectorIndexStatusEnum.READY:
+            return current
+        if time.monotonic() >= deadline:
+            raise Exception(f"Timed out waiting for shared index {index.id} to finish building")
+        await asyncio.sleep(settings.shared_index_poll_seconds)
+
+
+async def mark_index_ready(db: AsyncSession, index: VectorIndex, chunk_count: int):
+    index.status = VectorIndexStatusEnum.READY
+    index.chunk_count = chunk_count
+    await db.commit()
+
+
+async def abandon_index(db: AsyncSession, vector_service, index: VectorIndex):
+    """Throw away a failed build so the next job starts from scratch"""
+    try:
+        await db.rollback()
+        if await reference_count(db, index.id) == 0:
+            await db.execute(delete(VectorIndex).where(VectorIndex.id == index.id))
+            await db.commit()
+            await vector_service.delete_namespace(index.namespace)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not clean up failed index build {index.id}: {e}")
+
+
+async def release_index(db: AsyncSession, vector_service, vector_index_id: Optional[int]) -> bool:
+    """Drop an index once no repository references it; returns True when it was deleted.
+
+    Call after the referencing change (repository deleted or re-pointed) has
+    been committed. The row lock serialises concurrent releases of one index.
+    """
+    if vector_index_id is None:
+        return False
+
+    index = await db.scalar(select(VectorIndex).where(VectorIndex.id == vector_index_id).with_for_update())
+    if index is None or await reference_count(db, vector_index_id) > 0:
+        await db.commit()
+        return False
+
+    await db.delete(index)
+    await db.commit()
+    try:
+        await vector_service.delete_namespace(vector_service.index_namespace(vector_index_id))
+    except Exception as e:
+        logger.warning(f"⚠️ Deleted index {vector_index_id} but not its vectors: {e}")
+    logger.info(f"🗑️ Released shared index {vector_index_id} (no references left)")
+    return True
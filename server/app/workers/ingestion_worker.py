@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import uuid
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.database import AsyncSessionLocal
+from app.models.ingestion_job import IngestionJobKindEnum
+from app.services.embedding_pool import EmbeddingJobCancelled
+from app.services.github_service import shutdown_extraction_executor
+from .queue import IngestionQueue
+from .tasks import (
+    RepositoryGone,
+    force_log,
+    mark_repository_failed,
+    note_repository_retry,
+    process_repository_background,
+    sync_repository_background,
+)
+
+logger = logging.getLogger(__name__)
+
+TASKS = {
+    IngestionJobKindEnum.INDEX: process_repository_background,
+    IngestionJobKindEnum.SYNC: sync_repository_background,
+}
+
+
+class IngestionWorker:
+    """Pulls ingestion jobs from the database and runs up to ``concurrency`` of them at once"""
+
+    def __init__(self, concurrency: Optional[int] = None, worker_id: Optional[str] = None):
+        self.concurrency = concurrency or settings.ingestion_worker_concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.queue = IngestionQueue(AsyncSessionLocal, self.worker_id)
+        self._running: Dict[int, asyncio.Task] = {}
+        self._lost_lease: set = set()
+        self._stopping = asyncio.Event()
+
+        self._job_seconds = metrics.histogram("ingestion_job_seconds", "Wall time of one ingestion job attempt")
+        self._jobs_total = {
+            outcome: metrics.counter(f"ingestion_jobs_{outcome}", f"Ingestion job attempts that ended {outcome}")
+            for outcome in ("succeeded", "retried", "failed", "cancelled")
+        }
+        self._active = metrics.gauge("ingestion_jobs_running", "Ingestion jobs running in this process")
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        force_log(f"👷 Ingestion worker {self.worker_id} started (concurrency {self.concurrency})")
+        await self.queue.recover_orphaned_repositories()
+
+        slots = asyncio.Semaphore(self.concurrency)
+        while not self._stopping.is_set():
+            if not await self._acquire_slot(slots):
+                break
+
+            try:
+                job = await self.queue.claim()
+            except Exception as e:
+                logger.error(f"❌ Failed to claim ingestion job: {e}")
+                job = None
+
+            if not job:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=settings.ingestion_poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._run_job(job, slots))
+            self._running[job["id"]] = task
+
+        # Hand unfinished jobs back so another worker picks them up right away
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        shutdown_extraction_executor()
+        force_log(f"👋 Ingestion worker {self.worker_id} stopped")
+
+    async def _acquire_slot(self, slots: asyncio.Semaphore) -> bool:
+        """Wait for a free slot; False once stop() is called, even while every slot is busy"""
+        acquire = asyncio.ensure_future(slots.acquire())
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait({acquire, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+
+        if not acquire.done():
+            acquire.cancel()
+        try:
+            await acquire
+        except asyncio.CancelledError:
+            return False
+        # The slot may have come free in the same step as stop()
+        if self._stopping.is_set():
+            slots.release()
+            return False
+        return True
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(settings.ingestion_heartbeat_seconds)
+            try:
+                still_ours = await self.queue.heartbeat(job_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Heartbeat for job {job_id} failed: {e}")
+                continue
+
+            if not still_ours:
+                # Deleted, cancelled or reclaimed elsewhere: stop working on it
+                force_log(f"🛑 Lost lease on job {job_id}, cancelling")
+                self._lost_lease.add(job_id)
+                task = self._running.get(job_id)
+                if task:
+                    task.cancel()
+                return
+
+    async def _run_job(self, job: Dict, slots: asyncio.Semaphore):
+        job_id = job["id"]
+        repository_id = job["repository_id"]
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        self._active.inc()
+        force_log(f"📦 Job {job_id}: {job['kind'].value} repository {repository_id} (attempt {job['attempts']}/{job['max_attempts']})")
+
+        try:
+            with self._job_seconds.time():
+                await TASKS[job["kind"]](repository_id, job["user_id"])
+            await self.queue.complete(job_id)
+            self._jobs_total["succeeded"].inc()
+
+        except asyncio.CancelledError:
+            if job_id not in self._lost_lease:
+                await self.queue.release(job_id)
+            self._jobs_total["cancelled"].inc()
+            raise
+
+        except (RepositoryGone, EmbeddingJobCancelled) as e:
+            force_log(f"🛑 Job {job_id} cancelled: {e}")
+            await self.queue.cancel(job_id, str(e))
+            self._jobs_total["cancelled"].inc()
+
+        except Exception as e:
+            error_message = str(e)
+            force_log(f"❌ Error processing repository {repository_id}: {error_message}")
+            final = await self.queue.fail(job_id, error_message, job["attempts"], job["max_attempts"])
+            if final:
+                await mark_repository_failed(repository_id, error_message)
+                self._jobs_total["failed"].inc()
+            else:
+                await note_repository_retry(repository_id, error_message, job["attempts"], job["max_attempts"])
+                self._jobs_total["retried"].inc()
+
+        finally:
+            heartbeat.cancel()
+            self._lost_lease.discard(job_id)
+            self._running.pop(job_id, None)
+            self._active.dec()
+            slots.release()
+
+
+def _run_process(concurrency: int):
+    logging.basicConfig(level=logging.INFO)
+    worker = IngestionWorker(concurrency=concurrency)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run()
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QODEX ingestion worker")
+    parser.add_argument("--processes", type=int, default=settings.ingestion_worker_processes,
+                        help="Worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=settings.ingestion_worker_concurrency,
+                        help="Jobs each process runs at once")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _run_process(args.concurrency)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_run_process, args=(args.concurrency,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.ingestion_job import IngestionJob, IngestionJobKindEnum, IngestionJobStatusEnum
+from app.models.repository import Repository, RepositoryStatusEnum
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = [IngestionJobStatusEnum.QUEUED, IngestionJobStatusEnum.RUNNING]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def get_active_job(db: AsyncSession, repository_id: int) -> Optional[IngestionJob]:
+    return await db.scalar(select(IngestionJob).where(
+        IngestionJob.repository_id == repository_id,
+        IngestionJob.status.in_(ACTIVE_STATUSES)
+    ).limit(1))
+
+
+async def enqueue_job(db: AsyncSession, repository_id: int, user_id: str, kind: IngestionJobKindEnum) -> IngestionJob:
+    """Add a job for the repository unless one is already queued or running.
+
+    The caller owns the transaction and must commit.
+    """
+    existing = await get_active_job(db, repository_id)
+    if existing:
+        return existing
+
+    job = IngestionJob(
+        repository_id=repository_id,
+        user_id=user_id,
+        kind=kind,
+        status=IngestionJobStatusEnum.QUEUED,
+        attempts=0,
+        max_attempts=settings.ingestion_max_attempts,
+        run_after=_now()
+    )
+    db.add(job)
+    return job
+
+
+class IngestionQueue:
+    """DB-backed job queue: claim with SKIP LOCKED, hold a lease, heartbeat, retry with backoff"""
+
+    def __init__(self, session_factory, worker_id: str):
+        self.session_factory = session_factory
+        self.worker_id = worker_id
+
+    async def claim(self) -> Optional[Dict]:
+        """Lease the next runnable job, or reclaim one whose lease expired"""
+        async with self.session_factory() as db:
+            while True:
+                now = _now()
+                job = await db.scalar(select(IngestionJob).where(
+                    or_(
+                        and_(IngestionJob.status == IngestionJobStatusEnum.QUEUED, IngestionJob.run_after <= now),
+                        and_(IngestionJob.status == IngestionJobStatusEnum.RUNNING, IngestionJob.lease_expires_at < now)
+                    )
+                ).order_by(IngestionJob.run_after.asc(), IngestionJob.id.asc()).limit(1).with_for_update(skip_locked=True))
+
+                if not job:
+                    return None
+                if job.status != IngestionJobStatusEnum.RUNNING:
+                    break
+
+                if job.attempts < job.max_attempts:
+                    logger.warning(f"♻️ Reclaiming job {job.id} from {job.locked_by} (lease expired)")
+                    break
+
+                # The worker died on the last attempt (OOM, crash, hang); running it again would retry forever
+                error = f"Worker {job.locked_by} stopped responding on attempt {job.attempts}/{job.max_attempts}"
+                logger.error(f"❌ Job {job.id} abandoned: {error}")
+                job.status = IngestionJobStatusEnum.FAILED
+                job.lease_expires_at = None
+                job.last_error = error
+                await db.execute(update(Repository).where(Repository.id == job.repository_id).values({
+                    Repository.status: RepositoryStatusEnum.FAILED,
+                    Repository.error_message: error[:500]
+                }).execution_options(synchronize_session=False))
+                await db.commit()
+
+            job.status = IngestionJobStatusEnum.RUNNING
+            job.locked_by = self.worker_id
+            job.attempts += 1
+            job.heartbeat_at = now
+            job.lease_expires_at = now + timedelta(seconds=settings.ingestion_lease_seconds)
+            await db.commit()
+
+            return {
+                "id": job.id,
+                "repository_id": job.repository_id,
+                "user_id": job.user_id,
+                "kind": job.kind,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts
+            }
+
+    async def heartbeat(self, job_id: int) -> bool:
+        """Extend the lease; False means the job was deleted, cancelled or taken over"""
+        now = _now()
+        async with self.session_factory() as db:
+            result = await db.execute(update(IngestionJob).where(
+                IngestionJob.id == job_id,
+                IngestionJob.locked_by == self.worker_id,
+                IngestionJob.status == IngestionJobStatusEnum.RUNNING
+            ).values({
+                IngestionJob.heartbeat_at: now,
+                IngestionJob.lease_expires_at: now + timedelta(seconds=settings.ingestion_lease_seconds)
+            }).execution_options(synchronize_session=False))
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _finish(self, job_id: int, values: Dict) -> bool:
+        async with self.session_factory() as db:
+            result = await db.execute(update(IngestionJob).where(
+                IngestionJob.id == job_id,
+                IngestionJob.locked_by == self.worker_id
+            ).values(values).execution_options(synchronize_session=False))
+            await db.commit()
+            return result.rowcount == 1
+
+    async def complete(self, job_id: int):
+        await self._finish(job_id, {
+            IngestionJob.status: IngestionJobStatusEnum.SUCCEEDED,
+            IngestionJob.lease_expires_at: None,
+            IngestionJob.last_error: None
+        })
+
+    async def cancel(self, job_id: int, reason: str):
+        await self._finish(job_id, {
+            IngestionJob.status: IngestionJobStatusEnum.CANCELLED,
+            IngestionJob.lease_expires_at: None,
+            IngestionJob.last_error: reason[:2000]
+        })
+
+    async def release(self, job_id: int):
+        """Hand a job back untouched (worker shutting down mid-job)"""
+        await self._finish(job_id, {
+            IngestionJob.status: IngestionJobStatusEnum.QUEUED,
+            IngestionJob.locked_by: None,
+            IngestionJob.lease_expires_at: None,
+            IngestionJob.run_after: _now(),
+            IngestionJob.attempts: IngestionJob.attempts - 1
+        })
+
+    async def fail(self, job_id: int, error: str, attempts: int, max_attempts: int) -> bool:
+        """Record a failed attempt; returns True when no retries are left"""
+        if attempts >= max_attempts:
+            await self._finish(job_id, {
+                IngestionJob.status: IngestionJobStatusEnum.FAILED,
+                IngestionJob.lease_expires_at: None,
+                IngestionJob.last_error: error[:2000]
+            })
+            return True
+
+        delay = settings.ingestion_retry_base_seconds * (2 ** (attempts - 1))
+        delay = delay * (0.5 + random.random())
+        await self._finish(job_id, {
+            IngestionJob.status: IngestionJobStatusEnum.QUEUED,
+            IngestionJob.locked_by: None,
+            IngestionJob.lease_expires_at: None,
+            IngestionJob.run_after: _now() + timedelta(seconds=delay),
+            IngestionJob.last_error: error[:2000]
+        })
+        logger.info(f"🔁 Job {job_id} attempt {attempts}/{max_attempts} failed, retrying in {delay:.0f}s")
+        return False
+
+    async def recover_orphaned_repositories(self) -> int:
+        """Queue a job for every repository left PENDING/PROCESSING without one (e.g. after a restart)"""
+        recovered = 0
+        async with self.session_factory() as db:
+            # Plain rows: the rollback below would expire loaded Repository objects
+            orphaned = (await db.execute(select(Repository.id, Repository.user_id, Repository.last_indexed_commit).where(
+                Repository.status.in_([RepositoryStatusEnum.PENDING, RepositoryStatusEnum.PROCESSING]),
+                ~Repository.ingestion_jobs.any(IngestionJob.status.in_(ACTIVE_STATUSES))
+            ))).all()
+
+            for repository_id, user_id, last_indexed_commit in orphaned:
+                kind = IngestionJobKindEnum.SYNC if last_indexed_commit else IngestionJobKindEnum.INDEX
+                try:
+                    await enqueue_job(db, repository_id, user_id, kind)
+                    await db.commit()
+                    recovered += 1
+                except IntegrityError:
+                    # Another process queued it first
+                    await db.rollback()
+
+        if recovered:
+            logger.info(f"♻️ Re-queued {recovered} repositories left in progress by a previous run")
+        return recovered
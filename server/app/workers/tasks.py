@@ -0,0 +1,344 @@
+import logging
+import sys
+import time
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.repository import Repository, RepositoryStatusEnum
+from app.models.vector_index import VectorIndex, VectorIndexStatusEnum
+from app.core.registry import registry
+from app.services import GitHubService
+from app.services.code_chunker import CHUNKER_VERSION
+from app.services.ingestion_pipeline import IngestionPipeline
+from app.services.vector_service import VectorService
+from app.workers.index_sharing import (
+    abandon_index, claim_index, find_index, index_key, mark_index_ready,
+    reference_count, release_index, wait_for_index,
+)
+
+logger = logging.getLogger(__name__)
+
+class RepositoryGone(Exception):
+    """The repository was deleted before or while its job ran; nothing to retry"""
+
+def force_log(message):
+    """Force log to stdout and flush immediately"""
+    print(f"[QODEX-BG] {message}", file=sys.stdout, flush=True)
+    logger.info(message)
+
+async def invalidate_query_cache(repository_id: int):
+    """Drop cached retrievals and answers once a repository's index has changed"""
+    try:
+        query_cache = await registry.get_query_cache()
+        await query_cache.invalidate(repository_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not invalidate query cache for repository {repository_id}: {e}")
+
+async def build_shared_index(db, repository: Repository, head_commit: str, temp_dir: str,
+                             github_service: GitHubService, embedding_service, vector_service) -> Tuple[VectorIndex, Dict]:
+    """Reuse the index of this repository content if one exists, otherwise build it.
+
+    When another job is already building the same index we wait for it
+    instead of embedding the repository a second time.
+    """
+    key = index_key(repository.github_url, head_commit, embedding_service.model_name)
+    deadline = time.monotonic() + settings.shared_index_wait_seconds
+
+    while True:
+        index, claimed = await claim_index(db, key)
+        if claimed:
+            break
+        if index.status == VectorIndexStatusEnum.READY:
+            force_log(f"♻️ Reusing shared index {index.id} ({index.chunk_count} chunks) for {head_commit[:8]}")
+            return index, {"chunks": index.chunk_count or 0, "files": 0, "wall_seconds": 0, "reused": True}
+
+        force_log(f"⏳ Shared index {index.id} is being built by another job, waiting for it")
+        ready = await wait_for_index(db, index, deadline)
+        if ready is not None:
+            force_log(f"♻️ Reusing shared index {ready.id} ({ready.chunk_count} chunks) for {head_commit[:8]}")
+            return ready, {"chunks": ready.chunk_count or 0, "files": 0, "wall_seconds": 0, "reused": True}
+
+    force_log(f"🏗️ Building shared index {index.id} for {head_commit[:8]}")
+    try:
+        pipeline = IngestionPipeline(github_service, embedding_service, vector_service)
+        stats = await pipeline.run(index.namespace, temp_dir, job_id=f"repo_{repository.id}")
+        if not stats["chunks"]:
+            raise Exception("No supported code files found in repository")
+        await mark_index_ready(db, index, stats["chunks"])
+    except BaseException:
+        await abandon_index(db, vector_service, index)
+        raise
+    return index, stats
+
+async def mark_repository_indexed(db, repository: Repository, head_commit: str, vector_index_id: Optional[int], vector_service):
+    """Point the repository at its index, mark it READY and drop whatever it used before"""
+    previous_index_id = repository.vector_index_id
+    had_legacy_vectors = previous_index_id is None and repository.last_indexed_commit is not None
+
+    repository.vector_index_id = vector_index_id
+    repository.status = RepositoryStatusEnum.READY
+    repository.error_message = None
+    repository.last_indexed_commit = head_commit
+    await db.commit()
+    await invalidate_query_cache(repository.id)
+
+    if vector_index_id is None:
+        return
+    if previous_index_id is not None and previous_index_id != vector_index_id:
+        await release_index(db, vector_service, previous_index_id)
+    elif had_legacy_vectors:
+        try:
+            await vector_service.delete_namespace(VectorService.legacy_namespace(repository.id))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not delete legacy vectors of repository {repository.id}: {e}")
+
+async def process_repository_background(repository_id: int, user_id: str):
+    """Clone and index a repository with hybrid RAG.
+
+    Errors propagate to the ingestion worker, which decides between a retry
+    and marking the repository FAILED.
+    """
+
+    force_log(f"🚀 Starting QODEX HYBRID RAG processing for repository {repository_id} (user: {user_id})")
+
+    db = AsyncSessionLocal()
+
+    github_service = GitHubService()
+
+    temp_dir = None
+
+    try:
+        embedding_service = await registry.get_embedding_service()
+        vector_service = await registry.get_vector_service()
+
+        repository = await db.scalar(select(Repository).where(
+            Repository.id == repository_id,
+            Repository.user_id == user_id
+        ))
+
+        if not repository:
+            raise RepositoryGone(f"Repository {repository_id} not found for user {user_id}")
+
+        repository.status = RepositoryStatusEnum.PROCESSING
+        await db.commit()
+        force_log(f"📊 Repository {repository_id} status: PROCESSING")
+
+        if settings.shared_index_enabled:
+            # Someone may already have indexed this exact commit: attach without cloning
+            remote_head = await github_service.remote_head_commit(repository.github_url)
+            if remote_head:
+                existing = await find_index(db, index_key(repository.github_url, remote_head, embedding_service.model_name))
+                if existing is not None and existing.status == VectorIndexStatusEnum.READY:
+                    force_log(f"♻️ {repository.name}@{remote_head[:8]} is already indexed as shared index {existing.id}")
+                    await mark_repository_indexed(db, repository, remote_head, existing.id, vector_service)
+                    force_log(f"🎉 SUCCESS! QODEX Repository {repository_id} is READY for chat! (user: {user_id})")
+                    return
+
+        force_log(f"📥 Step 1: Cloning repository {repository.github_url}")
+        temp_dir = await github_service.clone_repository(repository.github_url)
+
+        head_commit = github_service.get_head_commit(temp_dir)
+
+        force_log(f"⚡ Step 2: Streaming {repository.name} through chunk → embed → upsert")
+        embedding_service.reset_job(f"repo_{repository_id}")
+        if settings.shared_index_enabled:
+            index, stats = await build_shared_index(db, repository, head_commit, temp_dir,
+                                                    github_service, embedding_service, vector_service)
+            vector_index_id = index.id
+        else:
+            pipeline = IngestionPipeline(github_service, embedding_service, vector_service)
+            stats = await pipeline.run(VectorService.legacy_namespace(repository_id), temp_dir, job_id=f"repo_{repository_id}")
+            if not stats["chunks"]:
+                raise Exception("No supported code files found in repository")
+            vector_index_id = None
+
+        force_log(f"✅ Indexed {stats['chunks']} chunks from {stats['files']} files in {stats['wall_seconds']}s")
+
+        await mark_repository_indexed(db, repository, head_commit, vector_index_id, vector_service)
+
+        force_log(f"🎉 SUCCESS! QODEX Repository {repository_id} is READY for chat! (user: {user_id})")
+
+    finally:
+        if temp_dir:
+            github_service.cleanup_temp_dir(temp_dir)
+        await db.close()
+        force_log(f"🏁 Finished processing repository {repository_id}")
+
+async def sync_namespace(namespace: str, temp_dir: str, base_commit: str, job_id: str,
+                         github_service: GitHubService, embedding_service, vector_service) -> Dict:
+    """Bring a namespace indexed at base_commit up to the checkout in temp_dir"""
+    try:
+        changed, removed = await github_service.diff_since(temp_dir, base_commit)
+    except Exception as diff_error:
+        # History was rewritten or the old commit is gone: fall back to a full re-index
+        force_log(f"⚠️ Could not diff against {base_commit[:8]} ({diff_error}), re-indexing everything")
+        changed, removed = None, set()
+
+    pipeline = IngestionPipeline(github_service, embedding_service, vector_service)
+    embedding_service.reset_job(job_id)
+
+    if changed is None:
+        await vector_service.delete_namespace(namespace)
+        return await pipeline.run(namespace, temp_dir, job_id=job_id)
+
+    force_log(f"🔀 Step 2: {len(changed)} changed and {len(removed)} removed files since {base_commit[:8]}")
+    await vector_service.delete_file_vectors(namespace, changed | removed)
+    return await pipeline.run(namespace, temp_dir, only_paths=changed, job_id=job_id) if changed else {"chunks": 0}
+
+async def claim_index_for_sync(db, repository: Repository, embedding_model: str) -> Optional[VectorIndex]:
+    """Lock the repository's index for an in-place sync when nothing else reads it.
+
+    Returns None when the index is shared, or was built with another chunker
+    or model, in which case the sync must build a separate index.
+    """
+    index = await db.scalar(
+        select(VectorIndex).where(VectorIndex.id == repository.vector_index_id)
+        .with_for_update().execution_options(populate_existing=True)
+    )
+    usable = (
+        index is not None
+        and index.status == VectorIndexStatusEnum.READY
+        and index.chunker_version == CHUNKER_VERSION
+        and index.embedding_model == embedding_model
+        and await reference_count(db, index.id) == 1
+    )
+    if not usable:
+        await db.commit()
+        return None
+
+    # BUILDING keeps other jobs from attaching to it while its vectors change
+    index.status = VectorIndexStatusEnum.BUILDING
+    await db.commit()
+    return index
+
+async def sync_repository_background(repository_id: int, user_id: str):
+    """Re-index only the files changed since the last indexed commit"""
+
+    force_log(f"🔄 Starting QODEX incremental sync for repository {repository_id} (user: {user_id})")
+
+    db = AsyncSessionLocal()
+
+    github_service = GitHubService()
+
+    temp_dir = None
+
+    try:
+        embedding_service = await registry.get_embedding_service()
+        vector_service = await registry.get_vector_service()
+
+        repository = await db.scalar(select(Repository).where(
+            Repository.id == repository_id,
+            Repository.user_id == user_id
+        ))
+
+        if not repository:
+            raise RepositoryGone(f"Repository {repository_id} not found for user {user_id}")
+
+        base_commit = repository.last_indexed_commit
+        if not base_commit:
+            force_log(f"♻️ No indexed commit recorded for repository {repository_id}, running full re-index")
+            if repository.vector_index_id is None:
+                await vector_service.delete_namespace(VectorService.legacy_namespace(repository_id))
+            await process_repository_background(repository_id, user_id)
+            return
+
+        # The repository stays READY: its current index serves chat until the sync swaps it
+        force_log(f"📥 Step 1: Fetching latest commit of {repository.github_url}")
+        temp_dir = await github_service.clone_repository(repository.github_url)
+        head_commit = github_service.get_head_commit(temp_dir)
+        job_id = f"repo_{repository_id}"
+        vector_index_id = repository.vector_index_id
+
+        if head_commit == base_commit:
+            force_log(f"✅ Repository {repository_id} already indexed at {head_commit[:8]}, nothing to sync")
+        elif vector_index_id is None:
+            # Repositories indexed before shared indexes keep syncing their own namespace
+            stats = await sync_namespace(VectorService.legacy_namespace(repository_id), temp_dir, base_commit, job_id,
+                                         github_service, embedding_service, vector_service)
+            force_log(f"⚡ Step 3: Re-embedded {stats['chunks']} updated chunks")
+        else:
+            key = index_key(repository.github_url, head_commit, embedding_service.model_name)
+            existing = await find_index(db, key)
+            index = await claim_index_for_sync(db, repository, embedding_service.model_name) if existing is None else None
+
+            if index is not None:
+                # Sole reader of the index: update it in place with just the changed files
+                try:
+                    stats = await sync_namespace(index.namespace, temp_dir, base_commit, job_id,
+                                                 github_service, embedding_service, vector_service)
+                except BaseException:
+                    # Half-synced vectors: detach so the next attempt rebuilds from scratch
+                    await db.rollback()
+                    await db.refresh(repository)
+                    repository.vector_index_id = None
+                    repository.last_indexed_commit = None
+                    repository.status = RepositoryStatusEnum.PROCESSING
+                    await db.commit()
+                    await release_index(db, vector_service, index.id)
+                    raise
+                index.commit_sha = head_commit
+                index.status = VectorIndexStatusEnum.READY
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Another job indexed the new commit meanwhile: use theirs, ours is released below
+                    await db.rollback()
+                    await db.refresh(repository)
+                    index, _ = await build_shared_index(db, repository, head_commit, temp_dir,
+                                                        github_service, embedding_service, vector_service)
+                    vector_index_id = index.id
+                force_log(f"⚡ Step 3: Re-embedded {stats['chunks']} updated chunks")
+            else:
+                # The current index is shared with others (or outdated): build or reuse one for the new commit
+                index, stats = await build_shared_index(db, repository, head_commit, temp_dir,
+                                                        github_service, embedding_service, vector_service)
+                vector_index_id = index.id
+                force_log(f"⚡ Step 3: Repository now uses shared index {index.id} ({stats['chunks']} chunks)")
+
+        await mark_repository_indexed(db, repository, head_commit, vector_index_id, vector_service)
+
+        force_log(f"🎉 Repository {repository_id} synced to {head_commit[:8]} (user: {user_id})")
+
+    finally:
+        if temp_dir:
+            github_service.cleanup_temp_dir(temp_dir)
+        await db.close()
+        force_log(f"🏁 Finished syncing repository {repository_id}")
+
+async def mark_repository_failed(repository_id: int, error_message: str):
+    """Give up on a repository after its last attempt.
+
+    A READY repository (a failed sync that left its index alone) stays
+    chattable; only the error is recorded.
+    """
+    db = AsyncSessionLocal()
+    try:
+        repository = await db.scalar(select(Repository).where(Repository.id == repository_id))
+        if repository and repository.status == RepositoryStatusEnum.READY:
+            repository.error_message = f"Sync failed: {error_message}"[:500]
+            await db.commit()
+        elif repository:
+            repository.status = RepositoryStatusEnum.FAILED
+            repository.error_message = error_message[:500]
+            await db.commit()
+    except Exception as db_error:
+        force_log(f"❌ Failed to update repository status: {str(db_error)}")
+    finally:
+        await db.close()
+
+async def note_repository_retry(repository_id: int, error_message: str, attempt: int, max_attempts: int):
+    """Surface a transient failure on the repository while it waits for a retry (READY ones stay READY)"""
+    db = AsyncSessionLocal()
+    try:
+        repository = await db.scalar(select(Repository).where(Repository.id == repository_id))
+        if repository:
+            if repository.status != RepositoryStatusEnum.READY:
+                repository.status = RepositoryStatusEnum.PENDING
+            repository.error_message = f"Attempt {attempt}/{max_attempts} failed, retrying: {error_message}"[:500]
+            await db.commit()
+    except Exception as db_error:
+        force_log(f"❌ Failed to update repository status: {str(db_error)}")
+    finally:
+        await db.close()
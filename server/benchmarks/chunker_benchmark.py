@@ -0,0 +1,97 @@
+"""Compare the line chunker with the syntax-aware chunker, per language.
+
+Usage (from server/):
+    python -m benchmarks.chunker_benchmark [REPO_PATH] [--max-chars 1000] [--min-chars 200]
+
+Reports files, chunk count, mean chunk size and chunking throughput for every
+file extension in ``GitHubService.supported_extensions``. Run it with the
+server's .env in place, since importing ``app.services`` loads the settings.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.code_chunker import CodeChunker  # noqa: E402
+
+SUPPORTED_EXTENSIONS = {
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c',
+    '.cs', '.go', '.rs', '.php', '.rb', '.swift', '.kt', '.scala',
+    '.html', '.css', '.scss', '.sass', '.vue', '.svelte', '.dart',
+    '.r', '.m', '.mm', '.h', '.hpp', '.cc', '.cxx', '.sql'
+}
+IGNORE_DIRS = {
+    '.git', 'node_modules', '__pycache__', '.venv', 'venv',
+    'build', 'dist', '.next', '.nuxt', 'coverage', '.pytest_cache',
+    'vendor', 'target', 'bin', 'obj', '.gradle', '.idea', '.vscode'
+}
+
+
+def load_files(repo_path: str):
+    files = []
+    for root, dirs, names in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+        for name in names:
+            path = Path(root) / name
+            if path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            try:
+                content = path.read_text(encoding='utf-8')
+            except (UnicodeDecodeError, OSError):
+                continue
+            if content.strip():
+                files.append((str(path.relative_to(repo_path)), content))
+    return files
+
+
+def run(chunk, files):
+    stats = defaultdict(lambda: {"files": 0, "chunks": 0, "chars": 0, "bytes": 0, "seconds": 0.0})
+    for file_path, content in files:
+        start = time.perf_counter()
+        chunks = chunk(content, file_path)
+        elapsed = time.perf_counter() - start
+
+        row = stats[Path(file_path).suffix.lower()]
+        row["files"] += 1
+        row["chunks"] += len(chunks)
+        row["chars"] += sum(len(c['content']) for c in chunks)
+        row["bytes"] += len(content.encode('utf-8'))
+        row["seconds"] += elapsed
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("repo_path", nargs="?", default=str(Path(__file__).resolve().parents[1] / "app"))
+    parser.add_argument("--max-chars", type=int, default=1000)
+    parser.add_argument("--min-chars", type=int, default=200)
+    args = parser.parse_args()
+
+    files = load_files(args.repo_path)
+    if not files:
+        print(f"No supported files under {args.repo_path}")
+        return
+
+    chunker = CodeChunker(args.max_chars, args.min_chars)
+    results = {
+        "lines": run(chunker.chunk_by_lines, files),
+        "syntax": run(chunker.chunk, files),
+    }
+
+    print(f"📊 {len(files)} files from {args.repo_path} (max {args.max_chars}, min {args.min_chars} chars)")
+    print(f"{'ext':<8}{'chunker':<9}{'files':>7}{'chunks':>9}{'mean':>9}{'files/s':>11}{'KB/s':>11}")
+    for extension in sorted(results["lines"]):
+        for name, stats in results.items():
+            row = stats[extension]
+            seconds = row["seconds"] or 1e-9
+            mean = row["chars"] / row["chunks"] if row["chunks"] else 0
+            print(f"{extension:<8}{name:<9}{row['files']:>7}{row['chunks']:>9}{mean:>9.0f}"
+                  f"{row['files'] / seconds:>11.0f}{row['bytes'] / 1024 / seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
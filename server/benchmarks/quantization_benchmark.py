@@ -0,0 +1,126 @@
+"""Search accuracy versus memory of float32, float16 and int8 local vector storage.
+
+Usage (from server/):
+    python -m benchmarks.quantization_benchmark [REPO_PATH] [--queries 200] [--ivf] [--synthetic 50000]
+
+Indexes the chunks of REPO_PATH once per storage dtype in a throwaway
+LocalVectorStore and runs the same fixed query set against each (the
+identifier and plain-words definition queries of the retrieval benchmark).
+Reports bytes per vector, agreement of each dtype's top 10 with the float32
+top 10, recall@5 of the expected chunk and search latency. Embedding the
+repository needs sentence-transformers; without it, or with --synthetic N,
+N clustered random unit vectors are used instead and queries are noisy
+copies of stored vectors.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.services.code_chunker import CodeChunker  # noqa: E402
+from app.services.local_vector_store import LocalVectorStore  # noqa: E402
+from benchmarks.chunker_benchmark import load_files  # noqa: E402
+from benchmarks.retrieval_benchmark import make_queries  # noqa: E402
+
+DTYPES = ("float32", "float16", "int8")
+# A float in a Python list: 24-byte object plus an 8-byte pointer
+PYTHON_FLOAT_BYTES = 32
+
+
+def repository_vectors(args):
+    """(chunks, chunk vectors, query vectors, expected (file, start line) per query) or None"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("⚠️ sentence-transformers not installed, using synthetic vectors")
+        return None
+
+    chunker = CodeChunker(settings.chunk_max_chars, settings.chunk_min_chars)
+    chunks = [chunk for file_path, content in load_files(args.repo_path) for chunk in chunker.chunk(content, file_path)]
+    if not chunks:
+        print(f"No supported files under {args.repo_path}, using synthetic vectors")
+        return None
+    queries = make_queries(chunks, args.queries)
+
+    model = SentenceTransformer('all-MiniLM-L6-v2')
+    encode = lambda texts: model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)  # noqa: E731
+    return chunks, encode([c['content'] for c in chunks]), encode([q for q, _, _ in queries]), [e for _, _, e in queries]
+
+
+def synthetic_vectors(count, dimension, queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, count // 200), dimension))
+    vectors = centers[rng.integers(len(centers), size=count)] + 0.6 * rng.normal(size=(count, dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    rows = rng.choice(count, min(queries, count), replace=False)
+    query_vectors = vectors[rows] + 0.5 * rng.normal(size=(len(rows), dimension)) / np.sqrt(dimension)
+    chunks = [
+        {'file_path': f"synthetic/{i}.py", 'start_line': 1, 'end_line': 1, 'chunk_index': 0,
+         'chunk_type': 'synthetic', 'content': str(i)}
+        for i in range(count)
+    ]
+    return chunks, vectors.astype(np.float32), query_vectors.astype(np.float32), [(f"synthetic/{row}.py", 1) for row in rows]
+
+
+def namespace_bytes(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.name.startswith(("vectors.", "scales.")))
+
+
+async def run(args):
+    data = None if args.synthetic else repository_vectors(args)
+    if data is None:
+        data = synthetic_vectors(args.synthetic or 50000, 384, args.queries)
+    chunks, vectors, query_vectors, expected = data
+    for chunk, vector in zip(chunks, vectors):
+        chunk['embedding'] = vector
+        chunk['content_length'] = len(chunk['content'])
+
+    count, dimension = vectors.shape
+    print(f"📊 {count} vectors x {dimension} dims, {len(query_vectors)} queries, {'IVF' if args.ivf else 'exact'} search")
+    print(f"🐍 As Python float lists: {count * dimension * PYTHON_FLOAT_BYTES / 2**20:.1f} MB")
+
+    baseline = None
+    print(f"{'dtype':<9}{'MB':>8}{'B/vector':>10}{'top10 agree':>13}{'recall@5':>10}{'p50 ms':>8}{'p95 ms':>8}")
+    for dtype in DTYPES:
+        store = LocalVectorStore(root=tempfile.mkdtemp(prefix=f"qodex_quant_{dtype}_"), dtype=dtype)
+        store.exact_threshold = 0 if args.ivf else count
+        await store.store_embeddings("bench", chunks)
+
+        rankings, latencies = [], []
+        for query in query_vectors:
+            started = time.perf_counter()
+            results = await store.search_similar_code("bench", query, 10)
+            latencies.append(time.perf_counter() - started)
+            rankings.append([(r['file_path'], r['start_line']) for r in results])
+
+        if baseline is None:
+            baseline = rankings
+        agreement = np.mean([len(set(r) & set(b)) / max(1, len(b)) for r, b in zip(rankings, baseline)])
+        recall = np.mean([e in r[:5] for r, e in zip(rankings, expected)])
+        size = namespace_bytes(store._path("bench"))
+        ms = np.array(latencies) * 1000
+        print(f"{dtype:<9}{size / 2**20:>8.1f}{size / count:>10.0f}{agreement:>13.3f}{recall:>10.3f}"
+              f"{np.percentile(ms, 50):>8.2f}{np.percentile(ms, 95):>8.2f}")
+        await store.delete_namespace("bench")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("repo_path", nargs="?", default=str(Path(__file__).resolve().parents[1] / "app"))
+    parser.add_argument("--queries", type=int, default=200, help="definitions to sample (two queries each)")
+    parser.add_argument("--ivf", action="store_true", help="search through the IVF index instead of exactly")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N", help="benchmark N synthetic vectors instead of REPO_PATH")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
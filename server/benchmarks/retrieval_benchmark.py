@@ -0,0 +1,132 @@
+"""Retrieval quality and latency of vector, BM25 keyword and hybrid (RRF) search.
+
+Usage (from server/):
+    python -m benchmarks.retrieval_benchmark [REPO_PATH] [--queries 200] [--no-vectors]
+
+Builds a throwaway index of REPO_PATH and asks, for a sample of functions and
+classes it defines, both an identifier query ("where is `name` defined") and
+a plain-words query ("how does verify repository ownership work"). The chunk
+holding the definition is the expected answer. Reports recall@5 and MRR@10 per
+retriever and query kind, plus keyword search latency. Vector and hybrid
+rows need sentence-transformers and use the production embedding model.
+"""
+import argparse
+import asyncio
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.services.code_chunker import CodeChunker  # noqa: E402
+from app.services.lexical_index import LexicalIndex, _WORD_PART  # noqa: E402
+from app.services.vector_backend import build_search_result, build_vector_metadata  # noqa: E402
+from app.services.vector_service import reciprocal_rank_fusion  # noqa: E402
+from benchmarks.chunker_benchmark import load_files  # noqa: E402
+
+_DEFINITION = re.compile(r"^\s*(?:export\s+)?(?:async\s+)?(?:def|class|function|func|fn|interface|struct)\s+([A-Za-z_]\w{3,})", re.M)
+
+
+def make_queries(chunks, limit, seed=0):
+    """(query, kind, expected (file, start line)) for definitions that appear once in the repository"""
+    definitions = {}
+    for chunk in chunks:
+        for name in _DEFINITION.findall(chunk['content']):
+            definitions.setdefault(name, []).append((chunk['file_path'], chunk['start_line']))
+
+    unique = sorted((name, places[0]) for name, places in definitions.items() if len(places) == 1)
+    random.Random(seed).shuffle(unique)
+    queries = []
+    for name, expected in unique[:limit]:
+        words = " ".join(part.lower() for piece in name.split('_') for part in _WORD_PART.findall(piece))
+        queries.append((f"where is `{name}` defined", "identifier", expected))
+        queries.append((f"how does {words} work", "words", expected))
+    return queries
+
+
+def score(ranked, expected):
+    keys = [(r['file_path'], r['start_line']) for r in ranked]
+    rank = keys.index(expected) + 1 if expected in keys else None
+    return (1.0 if rank and rank <= 5 else 0.0), (1.0 / rank if rank and rank <= 10 else 0.0)
+
+
+async def run(args):
+    files = load_files(args.repo_path)
+    chunker = CodeChunker(settings.chunk_max_chars, settings.chunk_min_chars)
+    chunks = []
+    for file_path, content in files:
+        for chunk in chunker.chunk(content, file_path):
+            chunk['content_length'] = len(chunk['content'])
+            chunks.append(chunk)
+    if not chunks:
+        print(f"No supported files under {args.repo_path}")
+        return
+
+    queries = make_queries(chunks, args.queries)
+    print(f"📊 {len(chunks)} chunks from {len(files)} files, {len(queries)} queries")
+
+    lexical = LexicalIndex(root=tempfile.mkdtemp(prefix="qodex_lexical_bench_"))
+    start = time.perf_counter()
+    await lexical.add("bench", chunks)
+    print(f"🔤 Keyword index built in {time.perf_counter() - start:.2f}s")
+
+    encode = None
+    if not args.no_vectors:
+        try:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer('all-MiniLM-L6-v2')
+            encode = lambda texts: model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)  # noqa: E731
+        except ImportError:
+            print("⚠️ sentence-transformers not installed, skipping vector and hybrid rows")
+
+    if encode:
+        matrix = encode([c['content'] for c in chunks]).astype(np.float32)
+        query_vectors = encode([q for q, _, _ in queries]).astype(np.float32)
+        metadata = [build_vector_metadata(c) for c in chunks]
+
+    depth = max(10, settings.hybrid_candidates)
+    totals, latencies = {}, []
+    for i, (query, kind, expected) in enumerate(queries):
+        started = time.perf_counter()
+        keyword = await lexical.search("bench", query, depth)
+        latencies.append(time.perf_counter() - started)
+        results = {"keyword": keyword}
+
+        if encode:
+            similarities = matrix @ query_vectors[i]
+            top = np.argsort(-similarities)[:depth]
+            vector = [build_search_result(metadata[row], float(similarities[row])) for row in top]
+            results["vector"] = vector
+            results["hybrid"] = reciprocal_rank_fusion(vector, keyword, settings.hybrid_rrf_k)
+
+        for retriever, ranked in results.items():
+            row = totals.setdefault((retriever, kind), [0.0, 0.0, 0])
+            recall, reciprocal = score(ranked, expected)
+            row[0] += recall
+            row[1] += reciprocal
+            row[2] += 1
+
+    print(f"{'retriever':<10}{'queries':<12}{'recall@5':>10}{'MRR@10':>9}")
+    for (retriever, kind), (recall, reciprocal, count) in sorted(totals.items()):
+        print(f"{retriever:<10}{kind:<12}{recall / count:>10.3f}{reciprocal / count:>9.3f}")
+
+    ms = np.array(latencies) * 1000
+    print(f"⏱️ Keyword search: p50 {np.percentile(ms, 50):.2f} ms, p95 {np.percentile(ms, 95):.2f} ms, max {ms.max():.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("repo_path", nargs="?", default=str(Path(__file__).resolve().parents[1] / "app"))
+    parser.add_argument("--queries", type=int, default=200, help="definitions to sample (two queries each)")
+    parser.add_argument("--no-vectors", action="store_true", help="keyword search only, no embedding model")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
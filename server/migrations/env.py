@@ -13,6 +13,9 @@ from app.core.database import Base
 # from app.models.user import User  # ❌ REMOVED
 from app.models.repository import Repository
 from app.models.conversation import Conversation, Message
+from app.models.ingestion_job import IngestionJob
+from app.models.vector_index import VectorIndex
+from app.models.chunk_content import ChunkContent
 
 # this is the Alembic Config object
 config = context.config
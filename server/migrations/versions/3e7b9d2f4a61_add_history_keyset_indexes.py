@@ -0,0 +1,28 @@
+"""Add composite indexes for keyset-paginated history
+
+Revision ID: 3e7b9d2f4a61
+Revises: 8c4f2a6d1e57
+Create Date: 2026-10-18 14:22:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7b9d2f4a61'
+down_revision: Union[str, None] = '8c4f2a6d1e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_messages_conversation_created_id', 'messages', ['conversation_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_conversations_repository_created_id', 'conversations', ['repository_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_repository_created_id', table_name='conversations')
+    op.drop_index('ix_messages_conversation_created_id', table_name='messages')
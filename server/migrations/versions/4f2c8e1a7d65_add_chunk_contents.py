@@ -0,0 +1,33 @@
+"""Add chunk contents for the Postgres chunk store
+
+Revision ID: 4f2c8e1a7d65
+Revises: 9d4a1f7c2b83
+Create Date: 2026-10-18 21:42:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2c8e1a7d65'
+down_revision: Union[str, None] = '9d4a1f7c2b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('chunk_contents',
+    sa.Column('vector_id', sa.String(), nullable=False),
+    sa.Column('content', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('vector_id')
+    )
+    # Prefix deletes (LIKE 'prefix%') need a pattern index under non-C collations
+    op.create_index('ix_chunk_contents_vector_id_pattern', 'chunk_contents', ['vector_id'], unique=False, postgresql_ops={'vector_id': 'text_pattern_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chunk_contents_vector_id_pattern', table_name='chunk_contents')
+    op.drop_table('chunk_contents')
@@ -0,0 +1,26 @@
+"""Add last indexed commit to repositories
+
+Revision ID: 5b1d7c3e9a42
+Revises: 2e8f053488b9
+Create Date: 2026-10-18 10:12:41.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1d7c3e9a42'
+down_revision: Union[str, None] = '2e8f053488b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('repositories', sa.Column('last_indexed_commit', sa.String(length=40), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('repositories', 'last_indexed_commit')
@@ -0,0 +1,54 @@
+"""Add ingestion jobs queue
+
+Revision ID: 8c4f2a6d1e57
+Revises: 5b1d7c3e9a42
+Create Date: 2026-10-18 11:03:17.204551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4f2a6d1e57'
+down_revision: Union[str, None] = '5b1d7c3e9a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ingestion_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('repository_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('kind', sa.Enum('INDEX', 'SYNC', name='ingestionjobkindenum'), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', 'CANCELLED', name='ingestionjobstatusenum'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_by', sa.String(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['repository_id'], ['repositories.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingestion_jobs_id'), 'ingestion_jobs', ['id'], unique=False)
+    op.create_index('ix_ingestion_jobs_status_run_after', 'ingestion_jobs', ['status', 'run_after'], unique=False)
+    op.create_index(
+        'uq_ingestion_jobs_active_repository', 'ingestion_jobs', ['repository_id'], unique=True,
+        postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_ingestion_jobs_active_repository', table_name='ingestion_jobs')
+    op.drop_index('ix_ingestion_jobs_status_run_after', table_name='ingestion_jobs')
+    op.drop_index(op.f('ix_ingestion_jobs_id'), table_name='ingestion_jobs')
+    op.drop_table('ingestion_jobs')
+    sa.Enum(name='ingestionjobstatusenum').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='ingestionjobkindenum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,56 @@
+"""Add shared vector indexes referenced by repositories
+
+Revision ID: 9d4a1f7c2b83
+Revises: 3e7b9d2f4a61
+Create Date: 2026-10-18 17:05:12.640318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4a1f7c2b83'
+down_revision: Union[str, None] = '3e7b9d2f4a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('vector_indexes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('normalized_url', sa.String(), nullable=False),
+    sa.Column('commit_sha', sa.String(length=40), nullable=False),
+    sa.Column('chunker_version', sa.String(), nullable=False),
+    sa.Column('embedding_model', sa.String(), nullable=False),
+    sa.Column('status', sa.Enum('BUILDING', 'READY', name='vectorindexstatusenum'), nullable=False),
+    sa.Column('chunk_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('normalized_url', 'commit_sha', 'chunker_version', 'embedding_model', name='uq_vector_indexes_key')
+    )
+    op.create_index(op.f('ix_vector_indexes_id'), 'vector_indexes', ['id'], unique=False)
+
+    op.add_column('repositories', sa.Column('vector_index_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_repositories_vector_index_id'), 'repositories', ['vector_index_id'], unique=False)
+    op.create_foreign_key('fk_repositories_vector_index_id', 'repositories', 'vector_indexes', ['vector_index_id'], ['id'], ondelete='SET NULL')
+
+    # The same GitHub URL may now be added by several users
+    op.drop_constraint('repositories_github_url_key', 'repositories', type_='unique')
+    op.create_unique_constraint('uq_repositories_user_github_url', 'repositories', ['user_id', 'github_url'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_repositories_user_github_url', 'repositories', type_='unique')
+    op.create_unique_constraint('repositories_github_url_key', 'repositories', ['github_url'])
+
+    op.drop_constraint('fk_repositories_vector_index_id', 'repositories', type_='foreignkey')
+    op.drop_index(op.f('ix_repositories_vector_index_id'), table_name='repositories')
+    op.drop_column('repositories', 'vector_index_id')
+
+    op.drop_index(op.f('ix_vector_indexes_id'), table_name='vector_indexes')
+    op.drop_table('vector_indexes')
+    sa.Enum(name='vectorindexstatusenum').drop(op.get_bind(), checkfirst=True)
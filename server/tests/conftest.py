@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are read at import time; give the app a throwaway SQLite database and dummy secrets
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='qodex_tests_'), 'app.db')}")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("NEXTJS_SECRET", "test")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("PINECONE_API_KEY", "test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
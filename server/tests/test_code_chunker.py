@@ -0,0 +1,90 @@
+from app.services.code_chunker import CodeChunker
+
+
+def function(name, body_lines=3, decorator=None):
+    lines = [f"@{decorator}"] if decorator else []
+    lines.append(f"def {name}(value):")
+    lines.extend(f"    value = value + {i}  # step {i} of {name}" for i in range(body_lines))
+    lines.append("    return value")
+    return lines
+
+
+def spans(chunks):
+    return [(c['start_line'], c['end_line'], c['chunk_type']) for c in chunks]
+
+
+def test_small_file_is_one_chunk():
+    content = "\n".join(function("tiny"))
+    assert spans(CodeChunker(1000, 10).chunk(content, "tiny.py")) == [(1, 5, 'full_file')]
+
+
+def test_functions_become_chunks_with_their_decorators():
+    lines = ["import os", ""] + function("first", 8) + [""] + function("second", 8, decorator="cached") + [""]
+    chunks = CodeChunker(max_chunk_size=400, min_chunk_size=10).chunk("\n".join(lines), "module.py")
+
+    # The blank lines between definitions are dropped, not chunked
+    assert spans(chunks) == [(1, 2, 'code_block'), (3, 12, 'function'), (14, 24, 'function')]
+    assert chunks[2]['content'].startswith("@cached\ndef second")
+    assert [c['chunk_index'] for c in chunks] == [0, 1, 2]
+    for chunk in chunks:
+        assert chunk['content'] == "\n".join(lines[chunk['start_line'] - 1:chunk['end_line']])
+
+
+def test_large_class_splits_into_header_and_methods():
+    methods = [f"    {line}" for name in ("load", "save", "close") for line in function(name, 6)]
+    lines = ["class Store:", '    """Keeps things."""', "    limit = 3"] + methods
+    chunks = CodeChunker(max_chunk_size=400, min_chunk_size=10).chunk("\n".join(lines), "store.py")
+
+    assert spans(chunks) == [(1, 3, 'class_header'), (4, 11, 'function'), (12, 19, 'function'), (20, 27, 'function')]
+    assert 'scope' not in chunks[0]
+    assert {c['scope'] for c in chunks[1:]} == {"class Store"}
+
+
+def test_oversized_class_header_is_split_by_lines():
+    attributes = [f"    setting_{i}: int = {i}  # documented attribute {i}" for i in range(100)]
+    lines = ["class Settings:"] + attributes + [f"    {line}" for line in function("load", 3)]
+    chunks = CodeChunker(max_chunk_size=1000, min_chunk_size=10).chunk("\n".join(lines), "settings.py")
+
+    headers = [c for c in chunks if c['chunk_type'] == 'class_header']
+    assert len(headers) > 1
+    assert all(len(c['content']) <= 1000 for c in chunks)
+    assert headers[0]['start_line'] == 1 and headers[-1]['end_line'] == 101
+    assert all(a['end_line'] + 1 == b['start_line'] for a, b in zip(headers, headers[1:]))
+    assert chunks[-1]['chunk_type'] == 'function' and chunks[-1]['scope'] == "class Settings"
+
+
+def test_oversized_function_is_split_by_lines():
+    lines = function("huge", 60)
+    chunks = CodeChunker(max_chunk_size=500, min_chunk_size=10).chunk("\n".join(lines), "huge.py")
+
+    assert len(chunks) > 1
+    assert all(c['chunk_type'] == 'function_part' and c['scope'] == "function huge" for c in chunks)
+    assert all(len(c['content']) <= 500 for c in chunks)
+    # Pieces tile the function without gaps or overlaps
+    assert chunks[0]['start_line'] == 1 and chunks[-1]['end_line'] == len(lines)
+    assert all(a['end_line'] + 1 == b['start_line'] for a, b in zip(chunks, chunks[1:]))
+
+
+def test_small_neighbours_are_merged():
+    lines = []
+    for name in ("a", "b", "c", "d"):
+        lines += function(name, 1)
+    # Each function is 68 characters: pairs fit in 150, a third would not
+    chunks = CodeChunker(max_chunk_size=150, min_chunk_size=80).chunk("\n".join(lines), "small.py")
+
+    assert spans(chunks) == [(1, 6, 'function'), (7, 12, 'function')]
+
+
+def test_unparseable_python_uses_the_line_chunker():
+    lines = ["def broken(:"] + [f"    x = {i}" for i in range(200)]
+    chunker = CodeChunker(max_chunk_size=300, min_chunk_size=10)
+    chunks = chunker.chunk("\n".join(lines), "broken.py")
+
+    assert chunks == chunker.chunk_by_lines("\n".join(lines), "broken.py")
+    assert {c['chunk_type'] for c in chunks} == {'code_block'}
+
+
+def test_syntax_aware_can_be_turned_off():
+    lines = function("first", 20) + function("second", 20)
+    chunker = CodeChunker(max_chunk_size=300, min_chunk_size=10, syntax_aware=False)
+    assert chunker.chunk("\n".join(lines), "module.py") == chunker.chunk_by_lines("\n".join(lines), "module.py")
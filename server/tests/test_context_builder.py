@@ -0,0 +1,73 @@
+import pytest
+
+from app.services.context_builder import SECTION_OVERHEAD_TOKENS, ContextBuilder, estimate_tokens
+
+
+def chunk(file_path, start_line, end_line, **extra):
+    content = "\n".join(f"value_{line} = compute({line})" for line in range(start_line, end_line + 1))
+    return {'file_path': file_path, 'start_line': start_line, 'end_line': end_line, 'content': content, **extra}
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a = b(c)") == 6
+    # Long identifiers count about one token per four characters
+    assert estimate_tokens("verify_repository_ownership") == 7
+
+
+def test_overlapping_and_adjacent_chunks_merge():
+    chunks = [
+        chunk("a.py", 10, 20, similarity=0.9, match='vector'),
+        chunk("b.py", 1, 5, similarity=0.8),
+        chunk("a.py", 15, 25, similarity=0.7, match='keyword', aliases=["copy/a.py"]),
+        chunk("a.py", 26, 30, similarity=0.6),
+        chunk("a.py", 40, 45, similarity=0.5),
+    ]
+    sections = ContextBuilder(token_budget=10_000).build(chunks)
+
+    assert [(s.file_path, s.start_line, s.end_line, s.chunks) for s in sections] == [
+        ("a.py", 10, 30, 3), ("b.py", 1, 5, 1), ("a.py", 40, 45, 1),
+    ]
+    merged = sections[0]
+    assert merged.value == pytest.approx(1 + 1 / 3 + 1 / 4)
+    assert merged.similarity == 0.9
+    assert merged.match == 'both'
+    assert merged.aliases == ["copy/a.py"]
+    assert merged.lines == chunk("a.py", 10, 30)['content'].split("\n")
+    assert merged.complete and not merged.truncated
+
+
+def test_chunks_without_text_are_skipped():
+    sections = ContextBuilder(token_budget=10_000).build([{**chunk("a.py", 1, 3), 'content': ''}, chunk("b.py", 1, 3)])
+    assert [s.file_path for s in sections] == ["b.py"]
+
+
+def test_budget_truncates_the_first_section_that_does_not_fit():
+    first, second = chunk("a.py", 1, 10), chunk("b.py", 1, 200, similarity=0.4)
+    first_cost = estimate_tokens(first['content']) + SECTION_OVERHEAD_TOKENS
+    budget = first_cost + 300
+    sections = ContextBuilder(token_budget=budget, min_section_tokens=120).build([first, second])
+
+    assert [s.file_path for s in sections] == ["a.py", "b.py"]
+    cut = sections[1]
+    assert cut.truncated and cut.start_line == 1 and cut.end_line < 200
+    assert cut.lines == second['content'].split("\n")[:cut.end_line]
+    assert sum(estimate_tokens(s.content) + SECTION_OVERHEAD_TOKENS for s in sections) <= budget
+
+
+def test_truncation_keeps_the_best_ranked_chunk_of_a_merged_section():
+    # b.py 101-110 ranks first; merged into b.py 1-110 it must survive the cut
+    chunks = [chunk("b.py", 101, 110), chunk("b.py", 1, 100)]
+    sections = ContextBuilder(token_budget=200, min_section_tokens=50).build(chunks)
+
+    assert len(sections) == 1
+    cut = sections[0]
+    assert cut.truncated and cut.focus_line == 101
+    assert cut.start_line <= 101 and cut.end_line == 110
+
+
+def test_too_little_budget_left_drops_the_rest():
+    first, second = chunk("a.py", 1, 10), chunk("b.py", 1, 200)
+    budget = estimate_tokens(first['content']) + SECTION_OVERHEAD_TOKENS + 50
+    sections = ContextBuilder(token_budget=budget, min_section_tokens=120).build([first, second])
+    assert [s.file_path for s in sections] == ["a.py"]
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import database
+from app.core.database import InstrumentedQueuePool, _track_pool_usage
+
+
+def make_engine(tmp_path, **options):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/pool.db", poolclass=InstrumentedQueuePool, **options)
+    _track_pool_usage(engine)
+    return engine
+
+
+def test_pool_gauges_read_the_pool(tmp_path):
+    async def scenario():
+        engine = make_engine(tmp_path, pool_size=1, max_overflow=2)
+        seen = []
+        try:
+            async with engine.connect() as first:
+                await first.execute(text("select 1"))
+                seen.append((database._in_use.value, database._overflow.value))
+                async with engine.connect() as second:
+                    await second.execute(text("select 1"))
+                    seen.append((database._in_use.value, database._overflow.value))
+            seen.append((database._in_use.value, database._overflow.value))
+        finally:
+            await engine.dispose()
+        return seen
+
+    assert asyncio.run(scenario()) == [(1, 0), (2, 1), (0, 0)]
+
+
+def test_checkout_wait_times_only_the_queue(tmp_path):
+    async def scenario():
+        engine = make_engine(tmp_path, pool_size=1, max_overflow=0, pool_timeout=0.2)
+        waits_before = database._checkout_wait.count
+        timeouts_before = database._checkout_timeouts.value
+        sum_before = database._checkout_wait.sum
+        try:
+            async with engine.connect() as held:
+                await held.execute(text("select 1"))
+                with pytest.raises(PoolTimeoutError):
+                    async with engine.connect():
+                        pass
+        finally:
+            await engine.dispose()
+        return (database._checkout_wait.count - waits_before, database._checkout_wait.sum - sum_before,
+                database._checkout_timeouts.value - timeouts_before)
+
+    waits, waited, timeouts = asyncio.run(scenario())
+    # Only the checkout that queued behind the held connection waited
+    assert waits >= 2
+    assert 0.2 <= waited < 0.5
+    assert timeouts == 1
@@ -0,0 +1,73 @@
+import asyncio
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.embedding_pool import EmbeddingJobCancelled, EmbeddingPool
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        if isinstance(texts, str):
+            texts = [texts]
+        return np.array([[float(len(text)), 0.5] for text in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def test_bulk_encode_on_threads(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_bulk_executor", "thread")
+    monkeypatch.setattr(settings, "embedding_bulk_sub_batch", 2)
+
+    async def scenario():
+        pool = EmbeddingPool(FakeModel(), "fake-model", "/tmp")
+        try:
+            return await pool.encode_bulk(["a", "bb", "ccc"]), await pool.encode_bulk([])
+        finally:
+            pool.shutdown()
+
+    vectors, empty = asyncio.run(scenario())
+    assert vectors[:, 0].tolist() == [1.0, 2.0, 3.0]
+    assert empty.shape == (0, 2)
+
+
+def test_broken_process_pool_falls_back_to_threads(monkeypatch, tmp_path):
+    # The spawned workers cannot load the model from an empty cache offline, so the pool breaks
+    monkeypatch.setattr(settings, "embedding_bulk_executor", "process")
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+
+    async def scenario():
+        pool = EmbeddingPool(FakeModel(), "no-such-model", str(tmp_path))
+        assert pool.uses_processes
+        try:
+            vectors = await pool.encode_bulk(["a", "bb"])
+            return pool.uses_processes, vectors, await pool.encode_bulk(["dddd"])
+        finally:
+            pool.shutdown()
+
+    uses_processes, vectors, again = asyncio.run(scenario())
+    assert not uses_processes
+    assert vectors[:, 0].tolist() == [1.0, 2.0]
+    assert again[:, 0].tolist() == [4.0]
+
+
+def test_cancelled_job_ids_are_refused(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_bulk_executor", "thread")
+
+    async def scenario():
+        pool = EmbeddingPool(FakeModel(), "fake-model", "/tmp")
+        try:
+            assert not pool.cancel_job("job-1")
+            try:
+                await pool.encode_bulk(["a"], job_id="job-1")
+            except EmbeddingJobCancelled:
+                pass
+            else:
+                raise AssertionError("cancelled job ran")
+            pool.reset_job("job-1")
+            return await pool.encode_bulk(["a"], job_id="job-1")
+        finally:
+            pool.shutdown()
+
+    assert asyncio.run(scenario())[:, 0].tolist() == [1.0]
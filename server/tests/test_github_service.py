@@ -0,0 +1,74 @@
+import os
+
+import git
+import pytest
+
+from app.core.config import settings
+from app.services.github_service import GitHubService
+
+
+def commit_files(repo, files, message):
+    """Write (or, for None, delete) files and commit them; returns the commit SHA"""
+    for path, content in files.items():
+        if content is None:
+            repo.index.remove([path], working_tree=True)
+            continue
+        full_path = os.path.join(repo.working_tree_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+        repo.index.add([path])
+    return repo.index.commit(message).hexsha
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Test")
+        config.set_value("user", "email", "test@example.com")
+    return repo
+
+
+def test_duplicate_groups_pick_the_first_path_as_canonical():
+    index = {"b/util.py": "1", "a/util.py": "1", "z/util.py": "1", "main.py": "2", "other.py": "3"}
+    assert GitHubService.duplicate_groups(index) == {"a/util.py": ["b/util.py", "z/util.py"]}
+
+
+def test_blob_index_skips_unindexable_paths(repo):
+    commit_files(repo, {"app.py": "x = 1\n", "README.md": "hi\n", "node_modules/lib.js": "y\n"}, "init")
+    index = GitHubService().blob_index(repo.working_tree_dir)
+    assert list(index) == ["app.py"]
+
+
+def test_diff_widens_to_whole_duplicate_groups(repo, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dedup_enabled", True)
+    base = commit_files(repo, {
+        "a.py": "shared = 1\n", "copy/a.py": "shared = 1\n",
+        "b.py": "alone = 2\n",
+        "c.py": "pair = 3\n", "d.py": "pair = 3\n",
+        "untouched.py": "x = 4\n", "same/untouched.py": "x = 4\n",
+    }, "base")
+    commit_files(repo, {
+        # Leaves the group: a.py loses its alias and must be re-embedded too
+        "copy/a.py": "shared = 1\nmore = 5\n",
+        # Removing an alias rewrites the canonical file's alias list
+        "d.py": None,
+        # A new copy joins b.py's group
+        "e.py": "alone = 2\n",
+    }, "change")
+
+    service = GitHubService()
+    changed, removed = service._diff_since(repo.working_tree_dir, base, fetch_missing=False)
+
+    assert changed == {"a.py", "copy/a.py", "b.py", "e.py", "c.py"}
+    assert removed == {"d.py"}
+
+
+def test_diff_without_dedup_keeps_the_raw_paths(repo, monkeypatch):
+    monkeypatch.setattr(settings, "blob_dedup_enabled", False)
+    base = commit_files(repo, {"a.py": "shared = 1\n", "copy/a.py": "shared = 1\n"}, "base")
+    commit_files(repo, {"copy/a.py": "changed = 2\n", "notes.txt": "ignored\n"}, "change")
+
+    changed, removed = GitHubService()._diff_since(repo.working_tree_dir, base, fetch_missing=False)
+    assert (changed, removed) == ({"copy/a.py"}, set())
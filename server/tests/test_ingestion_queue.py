@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models.ingestion_job import IngestionJob, IngestionJobKindEnum, IngestionJobStatusEnum
+from app.models.repository import Repository, RepositoryStatusEnum
+from app.workers import queue as queue_module
+from app.workers.queue import IngestionQueue, enqueue_job
+
+_names = itertools.count()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def make_sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'queue.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def add_repository(sessions, status=RepositoryStatusEnum.PENDING, last_indexed_commit=None, queue_job=True):
+    async with sessions() as db:
+        repository = Repository(user_id="user", github_url=f"https://github.com/o/r{next(_names)}", name="r",
+                                status=status, last_indexed_commit=last_indexed_commit)
+        db.add(repository)
+        await db.flush()
+        if queue_job:
+            await enqueue_job(db, repository.id, "user", IngestionJobKindEnum.INDEX)
+        await db.commit()
+        return repository.id
+
+
+async def get_job(sessions, repository_id):
+    async with sessions() as db:
+        return await db.scalar(select(IngestionJob).where(IngestionJob.repository_id == repository_id))
+
+
+def test_claim_leases_job_once(tmp_path):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        repository_id = await add_repository(sessions)
+        queue = IngestionQueue(sessions, "worker-a")
+
+        job = await queue.claim()
+        assert job["repository_id"] == repository_id
+        assert job["attempts"] == 1
+        assert await queue.claim() is None
+
+        stored = await get_job(sessions, repository_id)
+        assert stored.status == IngestionJobStatusEnum.RUNNING
+        assert stored.locked_by == "worker-a"
+        await engine.dispose()
+
+    run(scenario())
+
+
+def test_enqueue_returns_existing_active_job(tmp_path):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        repository_id = await add_repository(sessions)
+        async with sessions() as db:
+            again = await enqueue_job(db, repository_id, "user", IngestionJobKindEnum.SYNC)
+            assert again.kind == IngestionJobKindEnum.INDEX
+        await engine.dispose()
+
+    run(scenario())
+
+
+def test_fail_retries_then_gives_up(tmp_path):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        repository_id = await add_repository(sessions)
+        queue = IngestionQueue(sessions, "worker-a")
+
+        job = await queue.claim()
+        assert await queue.fail(job["id"], "boom", job["attempts"], job["max_attempts"]) is False
+        stored = await get_job(sessions, repository_id)
+        assert stored.status == IngestionJobStatusEnum.QUEUED
+        assert stored.locked_by is None
+        assert stored.last_error == "boom"
+        # Backoff keeps it out of reach for now
+        assert await queue.claim() is None
+
+        while True:
+            async with sessions() as db:
+                (await db.get(IngestionJob, job["id"])).run_after = datetime.now(timezone.utc) - timedelta(seconds=1)
+                await db.commit()
+            job = await queue.claim()
+            if await queue.fail(job["id"], "boom", job["attempts"], job["max_attempts"]):
+                break
+        assert job["attempts"] == job["max_attempts"]
+        assert (await get_job(sessions, repository_id)).status == IngestionJobStatusEnum.FAILED
+        await engine.dispose()
+
+    run(scenario())
+
+
+def test_release_hands_job_back_without_using_an_attempt(tmp_path):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        repository_id = await add_repository(sessions)
+        queue = IngestionQueue(sessions, "worker-a")
+
+        job = await queue.claim()
+        await queue.release(job["id"])
+        stored = await get_job(sessions, repository_id)
+        assert stored.status == IngestionJobStatusEnum.QUEUED
+        assert stored.attempts == 0
+
+        again = await IngestionQueue(sessions, "worker-b").claim()
+        assert again["id"] == job["id"]
+        assert again["attempts"] == 1
+        await engine.dispose()
+
+    run(scenario())
+
+
+async def expire_lease(sessions, repository_id, attempts):
+    async with sessions() as db:
+        job = await db.scalar(select(IngestionJob).where(IngestionJob.repository_id == repository_id))
+        job.attempts = attempts
+        job.lease_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.commit()
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        repository_id = await add_repository(sessions)
+        await IngestionQueue(sessions, "worker-a").claim()
+        await expire_lease(sessions, repository_id, attempts=1)
+
+        job = await IngestionQueue(sessions, "worker-b").claim()
+        assert job["attempts"] == 2
+        assert (await get_job(sessions, repository_id)).locked_by == "worker-b"
+        await engine.dispose()
+
+    run(scenario())
+
+
+def test_expired_lease_on_last_attempt_fails_job_and_repository(tmp_path):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        crashed = await add_repository(sessions)
+        await IngestionQueue(sessions, "worker-a").claim()
+        await expire_lease(sessions, crashed, attempts=3)
+        waiting = await add_repository(sessions)
+
+        job = await IngestionQueue(sessions, "worker-b").claim()
+        assert job["repository_id"] == waiting
+
+        stored = await get_job(sessions, crashed)
+        assert stored.status == IngestionJobStatusEnum.FAILED
+        assert "worker-a" in stored.last_error
+        async with sessions() as db:
+            repository = await db.get(Repository, crashed)
+            assert repository.status == RepositoryStatusEnum.FAILED
+        await engine.dispose()
+
+    run(scenario())
+
+
+def test_recover_orphaned_repositories(tmp_path):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        index_id = await add_repository(sessions, queue_job=False)
+        sync_id = await add_repository(sessions, RepositoryStatusEnum.PROCESSING, "a" * 40, queue_job=False)
+        await add_repository(sessions, RepositoryStatusEnum.READY, queue_job=False)
+        await add_repository(sessions)
+
+        assert await IngestionQueue(sessions, "worker-a").recover_orphaned_repositories() == 2
+        assert (await get_job(sessions, index_id)).kind == IngestionJobKindEnum.INDEX
+        assert (await get_job(sessions, sync_id)).kind == IngestionJobKindEnum.SYNC
+        assert await IngestionQueue(sessions, "worker-a").recover_orphaned_repositories() == 0
+        await engine.dispose()
+
+    run(scenario())
+
+
+def test_recover_continues_after_losing_an_enqueue_race(tmp_path, monkeypatch):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        first = await add_repository(sessions, queue_job=False)
+        second = await add_repository(sessions, RepositoryStatusEnum.PROCESSING, "b" * 40, queue_job=False)
+        real_enqueue = queue_module.enqueue_job
+        raced = []
+
+        async def racing_enqueue(db, repository_id, user_id, kind):
+            if not raced:
+                # Another process queued this repository between the scan and the insert
+                raced.append(repository_id)
+                for _ in range(2):
+                    db.add(IngestionJob(repository_id=repository_id, user_id=user_id, kind=kind,
+                                        status=IngestionJobStatusEnum.QUEUED, attempts=0, max_attempts=3))
+                return None
+            return await real_enqueue(db, repository_id, user_id, kind)
+
+        monkeypatch.setattr(queue_module, "enqueue_job", racing_enqueue)
+        assert await IngestionQueue(sessions, "worker-a").recover_orphaned_repositories() == 1
+        assert raced == [first]
+        assert (await get_job(sessions, second)).kind == IngestionJobKindEnum.SYNC
+        await engine.dispose()
+
+    run(scenario())
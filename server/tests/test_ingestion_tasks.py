@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.models.repository import Repository, RepositoryStatusEnum
+from app.workers import tasks
+
+from .test_ingestion_queue import add_repository, make_sessions
+
+
+async def get_repository(sessions, repository_id):
+    async with sessions() as db:
+        return await db.get(Repository, repository_id)
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine, sessions = asyncio.run(make_sessions(tmp_path))
+    monkeypatch.setattr(tasks, "AsyncSessionLocal", sessions)
+    yield sessions
+    asyncio.run(engine.dispose())
+
+
+def test_failed_sync_leaves_a_ready_repository_ready(sessions, monkeypatch):
+    class FailingGitHub(tasks.GitHubService):
+        async def clone_repository(self, github_url):
+            raise RuntimeError("fetch timed out")
+
+    async def fake_service():
+        return object()
+
+    monkeypatch.setattr(tasks, "GitHubService", FailingGitHub)
+    monkeypatch.setattr(tasks.registry, "get_embedding_service", fake_service)
+    monkeypatch.setattr(tasks.registry, "get_vector_service", fake_service)
+
+    async def scenario():
+        repository_id = await add_repository(sessions, RepositoryStatusEnum.READY, last_indexed_commit="a" * 40, queue_job=False)
+        with pytest.raises(RuntimeError):
+            await tasks.sync_repository_background(repository_id, "user")
+        during = await get_repository(sessions, repository_id)
+
+        await tasks.note_repository_retry(repository_id, "fetch timed out", 1, 3)
+        retrying = await get_repository(sessions, repository_id)
+        await tasks.mark_repository_failed(repository_id, "fetch timed out")
+        return during, retrying, await get_repository(sessions, repository_id)
+
+    during, retrying, failed = asyncio.run(scenario())
+    assert during.status == RepositoryStatusEnum.READY
+    assert retrying.status == RepositoryStatusEnum.READY
+    assert retrying.error_message == "Attempt 1/3 failed, retrying: fetch timed out"
+    assert failed.status == RepositoryStatusEnum.READY
+    assert failed.error_message == "Sync failed: fetch timed out"
+    assert failed.last_indexed_commit == "a" * 40
+
+
+def test_failures_of_unindexed_repositories_still_change_status(sessions):
+    async def scenario():
+        repository_id = await add_repository(sessions, RepositoryStatusEnum.PROCESSING, queue_job=False)
+        await tasks.note_repository_retry(repository_id, "clone failed", 1, 3)
+        retrying = await get_repository(sessions, repository_id)
+        await tasks.mark_repository_failed(repository_id, "clone failed")
+        return retrying, await get_repository(sessions, repository_id)
+
+    retrying, failed = asyncio.run(scenario())
+    assert retrying.status == RepositoryStatusEnum.PENDING
+    assert failed.status == RepositoryStatusEnum.FAILED
+    assert failed.error_message == "clone failed"
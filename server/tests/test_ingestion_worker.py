@@ -0,0 +1,39 @@
+import asyncio
+
+from app.models.ingestion_job import IngestionJobKindEnum, IngestionJobStatusEnum
+from app.workers import ingestion_worker
+from app.workers.ingestion_worker import IngestionWorker
+from app.workers.queue import IngestionQueue
+
+from .test_ingestion_queue import add_repository, get_job, make_sessions
+
+
+def test_stop_releases_jobs_while_every_slot_is_busy(tmp_path, monkeypatch):
+    async def scenario():
+        engine, sessions = await make_sessions(tmp_path)
+        repository_ids = [await add_repository(sessions) for _ in range(2)]
+        running = asyncio.Event()
+
+        async def slow_index(repository_id, user_id):
+            running.set()
+            await asyncio.sleep(3600)
+
+        monkeypatch.setitem(ingestion_worker.TASKS, IngestionJobKindEnum.INDEX, slow_index)
+        worker = IngestionWorker(concurrency=1, worker_id="worker-a")
+        worker.queue = IngestionQueue(sessions, "worker-a")
+
+        run_task = asyncio.create_task(worker.run())
+        await asyncio.wait_for(running.wait(), 5)
+        # Let the loop block on the full semaphore before stopping
+        await asyncio.sleep(0.05)
+        worker.stop()
+        await asyncio.wait_for(run_task, 5)
+
+        jobs = [await get_job(sessions, repository_id) for repository_id in repository_ids]
+        await engine.dispose()
+        return jobs
+
+    jobs = asyncio.run(scenario())
+    assert [job.status for job in jobs] == [IngestionJobStatusEnum.QUEUED] * 2
+    assert [job.attempts for job in jobs] == [0, 0]
+    assert all(job.locked_by is None for job in jobs)
@@ -0,0 +1,126 @@
+import asyncio
+
+from app.services import lexical_index
+from app.services.lexical_index import LexicalIndex, tokenize
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def chunk(file_path, content, chunk_index=0):
+    return {'file_path': file_path, 'chunk_index': chunk_index, 'start_line': 10 * chunk_index + 1, 'end_line': 10 * chunk_index + 5,
+            'chunk_type': 'function', 'content': content, 'content_length': len(content)}
+
+
+CHUNKS = [
+    chunk("app/auth.py", "def verify_repository_ownership(user, repo):\n    return repo.owner == user"),
+    chunk("app/auth.py", "def hash_password(password):\n    return bcrypt(password)", 1),
+    chunk("app/queue.py", "def claim_job(worker):\n    job = next_job()\n    return job"),
+    chunk("app/api.py", "def list_repositories(user):\n    return verify_repository_ownership(user, None)"),
+]
+
+
+def files(results):
+    return [(r['file_path'], r['start_line'] // 10) for r in results]
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("verifyRepositoryOwnership") == ["verifyrepositoryownership", "verify", "repository", "ownership"]
+    assert tokenize("verify_repository_ownership") == ["verify_repository_ownership", "verify", "repository", "ownership"]
+    assert tokenize("HTTPServer parseJSON2") == ["httpserver", "http", "server", "parsejson2", "parse", "json"]
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("where is the code that does x") == []
+    assert tokenize("__init__ _private") == ["init", "private"]
+
+
+def test_definition_outranks_use(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    run(index.add("ns", CHUNKS))
+
+    results = run(index.search("ns", "where is verifyRepositoryOwnership defined"))
+    assert files(results) == [("app/auth.py", 0), ("app/api.py", 0)]
+    assert results[0]['keyword_score'] > results[1]['keyword_score'] > 0
+    assert results[0]['similarity'] == 0.0
+
+
+def test_delete_files_and_reindex(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    run(index.add("ns", CHUNKS))
+    run(index.delete_files("ns", ["app/auth.py"]))
+
+    assert files(run(index.search("ns", "verify_repository_ownership"))) == [("app/api.py", 0)]
+    assert run(index.search("ns", "hash_password")) == []
+
+    run(index.add("ns", [chunk("app/auth.py", "def hash_password(password, salt): pass")]))
+    assert files(run(index.search("ns", "hash_password"))) == [("app/auth.py", 0)]
+
+
+def test_reused_id_replaces_document(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    run(index.add("ns", CHUNKS))
+    run(index.add("ns", [chunk("app/queue.py", "def release_job(worker): pass")]))
+
+    assert run(index.search("ns", "claim")) == []
+    assert files(run(index.search("ns", "release_job"))) == [("app/queue.py", 0)]
+
+
+def test_reader_sees_other_process_writes(tmp_path):
+    reader = LexicalIndex(str(tmp_path))
+    writer = LexicalIndex(str(tmp_path))
+    run(writer.add("ns", CHUNKS[:2]))
+    assert files(run(reader.search("ns", "hash_password"))) == [("app/auth.py", 1)]
+
+    run(writer.add("ns", CHUNKS[2:]))
+    run(writer.delete_files("ns", ["app/auth.py"]))
+    assert run(reader.search("ns", "hash_password")) == []
+    assert files(run(reader.search("ns", "claim_job"))) == [("app/queue.py", 0)]
+
+    run(writer.delete_namespace("ns"))
+    assert run(reader.search("ns", "claim_job")) == []
+
+
+def test_compaction_keeps_live_documents(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    many = [chunk(f"pkg/module_{i}.py", f"def handler_{i}(request): return request") for i in range(1500)]
+    run(index.add("ns", many))
+    run(index.delete_files("ns", [f"pkg/module_{i}.py" for i in range(1000)]))
+
+    with open(tmp_path / "ns" / "postings.jsonl") as f:
+        assert sum(1 for _ in f) == 500
+    for view in (index, LexicalIndex(str(tmp_path))):
+        assert files(run(view.search("ns", "handler_1200", top_k=1))) == [("pkg/module_1200.py", 0)]
+        assert files(run(view.search("ns", "handler_5", top_k=1))) != [("pkg/module_5.py", 0)]
+        assert len(run(view.search("ns", "request", top_k=2000))) == 500
+
+
+def test_cold_load_starts_from_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "_SNAPSHOT_EVERY_BYTES", 1)
+    writer = LexicalIndex(str(tmp_path))
+    run(writer.add("ns", CHUNKS[:3]))
+    run(writer.delete_files("ns", ["app/queue.py"]))
+    monkeypatch.setattr(lexical_index, "_SNAPSHOT_EVERY_BYTES", 1 << 30)
+    run(writer.add("ns", CHUNKS[3:]))
+
+    reader = LexicalIndex(str(tmp_path))
+    assert files(run(reader.search("ns", "verify_repository_ownership"))) == [("app/auth.py", 0), ("app/api.py", 0)]
+    assert run(reader.search("ns", "claim_job")) == []
+    ns = reader._namespace("ns")
+    assert 0 < ns._snapshot_offset < ns._offset
+    assert ns.live_count == 3
+
+
+def test_snapshot_of_replaced_log_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "_SNAPSHOT_EVERY_BYTES", 1)
+    run(LexicalIndex(str(tmp_path)).add("ns", CHUNKS[:2]))
+    snapshot = (tmp_path / "ns" / "postings.snapshot").read_bytes()
+
+    run(LexicalIndex(str(tmp_path)).delete_namespace("ns"))
+    run(LexicalIndex(str(tmp_path)).add("ns", CHUNKS[2:3]))
+    (tmp_path / "ns" / "postings.snapshot").write_bytes(snapshot)
+
+    reader = LexicalIndex(str(tmp_path))
+    assert run(reader.search("ns", "hash_password")) == []
+    assert files(run(reader.search("ns", "claim_job"))) == [("app/queue.py", 0)]
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.services import local_vector_store
+from app.services.local_vector_store import LocalVectorStore, _normalize, _quantize
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_chunks(vectors, prefix="f"):
+    return [
+        {'file_path': f"{prefix}{i}.py", 'chunk_index': 0, 'start_line': 1, 'end_line': 10,
+         'chunk_type': 'function', 'content': f"def f{i}(): pass", 'content_length': 16, 'embedding': vector}
+        for i, vector in enumerate(vectors)
+    ]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(50, 32)).astype(np.float32)
+
+
+def top_file(store, query, namespace="ns", top_k=1):
+    return [r['file_path'] for r in run(store.search_similar_code(namespace, query, top_k))]
+
+
+def test_search_finds_nearest_vector(tmp_path, vectors):
+    store = LocalVectorStore(str(tmp_path))
+    run(store.store_embeddings("ns", make_chunks(vectors)))
+    assert top_file(store, vectors[7]) == ["f7.py"]
+
+    results = run(store.search_similar_code("ns", vectors[7], 3))
+    assert results[0]['similarity'] == pytest.approx(1.0, abs=1e-5)
+    assert results[0]['vector_id'].startswith("ns_")
+
+
+def test_reused_id_replaces_old_row(tmp_path, vectors):
+    store = LocalVectorStore(str(tmp_path))
+    run(store.store_embeddings("ns", make_chunks(vectors[:2])))
+    # f0.py chunk 0 again, with a different embedding
+    run(store.store_embeddings("ns", make_chunks([vectors[10]])))
+
+    results = run(store.search_similar_code("ns", vectors[10], 10))
+    assert [r['file_path'] for r in results] == ["f0.py", "f1.py"]
+    assert results[0]['similarity'] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_tombstones_replay_on_reload(tmp_path, vectors):
+    store = LocalVectorStore(str(tmp_path))
+    run(store.store_embeddings("ns", make_chunks(vectors[:5])))
+    assert run(store.delete_file_vectors("ns", ["f1.py", "f2.py"])) == 2
+    # Deleted and then indexed again: the tombstone must not hide the new row
+    run(store.store_embeddings("ns", make_chunks(vectors[:3])[2:]))
+
+    reopened = LocalVectorStore(str(tmp_path))
+    files = [r['file_path'] for r in run(reopened.search_similar_code("ns", vectors[0], 10))]
+    assert sorted(files) == ["f0.py", "f2.py", "f3.py", "f4.py"]
+
+
+def test_compaction_drops_dead_rows(tmp_path):
+    vectors = np.random.default_rng(1).normal(size=(1500, 16)).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path))
+    run(store.store_embeddings("ns", make_chunks(vectors)))
+    run(store.delete_file_vectors("ns", [f"f{i}.py" for i in range(1000)]))
+
+    path = store._path("ns")
+    assert not os.path.exists(os.path.join(path, "tombstones.log"))
+    with open(os.path.join(path, "records.jsonl")) as f:
+        assert sum(1 for _ in f) == 500
+    assert os.path.getsize(os.path.join(path, "vectors.f32")) == 500 * 16 * 4
+
+    for store_view in (store, LocalVectorStore(str(tmp_path))):
+        assert top_file(store_view, vectors[1200]) == ["f1200.py"]
+        assert len(run(store_view.search_similar_code("ns", vectors[0], 1000))) == 500
+
+
+def test_reader_sees_other_process_writes(tmp_path, vectors):
+    reader = LocalVectorStore(str(tmp_path))
+    writer = LocalVectorStore(str(tmp_path))
+    assert top_file(reader, vectors[3]) == []
+
+    run(writer.store_embeddings("ns", make_chunks(vectors[:10])))
+    assert top_file(reader, vectors[3]) == ["f3.py"]
+
+    run(writer.delete_file_vectors("ns", ["f3.py"]))
+    assert top_file(reader, vectors[3]) != ["f3.py"]
+
+    run(writer.delete_namespace("ns"))
+    assert top_file(reader, vectors[3]) == []
+
+    run(writer.store_embeddings("ns", make_chunks(vectors[20:22], prefix="g")))
+    assert top_file(reader, vectors[21]) == ["g1.py"]
+
+
+def test_reader_reloads_after_other_process_compacts(tmp_path):
+    vectors = np.random.default_rng(2).normal(size=(1500, 16)).astype(np.float32)
+    reader = LocalVectorStore(str(tmp_path))
+    writer = LocalVectorStore(str(tmp_path))
+    run(writer.store_embeddings("ns", make_chunks(vectors)))
+    assert top_file(reader, vectors[1300]) == ["f1300.py"]
+
+    run(writer.delete_file_vectors("ns", [f"f{i}.py" for i in range(1100)]))
+    assert top_file(reader, vectors[1300]) == ["f1300.py"]
+    assert len(run(reader.search_similar_code("ns", vectors[0], 2000))) == 400
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_search_matches_float32(tmp_path, vectors, dtype):
+    exact = LocalVectorStore(str(tmp_path / "f32"))
+    compact = LocalVectorStore(str(tmp_path / dtype), dtype=dtype)
+    run(exact.store_embeddings("ns", make_chunks(vectors)))
+    run(compact.store_embeddings("ns", make_chunks(vectors)))
+
+    for row in range(0, 50, 7):
+        assert top_file(compact, vectors[row]) == [f"f{row}.py"]
+        expected = run(exact.search_similar_code("ns", vectors[row], 5))
+        got = run(compact.search_similar_code("ns", vectors[row], 5))
+        np.testing.assert_allclose([r['similarity'] for r in got], [r['similarity'] for r in expected], atol=0.02)
+
+    # The namespace keeps its dtype whatever the default of the process opening it
+    with open(os.path.join(compact._path("ns"), "info.json")) as f:
+        assert json.load(f)["dtype"] == dtype
+    assert top_file(LocalVectorStore(str(tmp_path / dtype), dtype="float32"), vectors[14]) == ["f14.py"]
+
+
+def test_int8_quantization_round_trip():
+    unit = np.random.default_rng(3).normal(size=(20, 64)).astype(np.float32)
+    unit /= np.linalg.norm(unit, axis=1, keepdims=True)
+    stored, scales = _quantize(unit, "int8")
+    assert stored.dtype == np.int8 and scales.shape == (20,)
+    assert np.abs(stored).max() == 127
+    np.testing.assert_allclose(stored * scales[:, None], unit, atol=scales.max())
+
+
+def test_ivf_search_finds_nearest(tmp_path):
+    vectors = np.random.default_rng(4).normal(size=(2000, 16)).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path), dtype="int8")
+    store.exact_threshold = 0
+    store.nprobe = 64
+    run(store.store_embeddings("ns", make_chunks(vectors)))
+    assert top_file(store, vectors[1234]) == ["f1234.py"]
+
+
+def test_unknown_dtype_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        LocalVectorStore(str(tmp_path), dtype="bfloat16")
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_block_scoring_matches_one_matrix_product(tmp_path, monkeypatch, dtype):
+    monkeypatch.setattr(local_vector_store, "_SCORE_BLOCK", 7)
+    vectors = np.random.default_rng(5).normal(size=(40, 24)).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path), dtype=dtype)
+    run(store.store_embeddings("ns", make_chunks(vectors)))
+    ns = store._namespaces["ns"]
+
+    query = _normalize(vectors[3])
+    expected = ns.read(slice(None)) @ query
+    np.testing.assert_allclose(ns._scores(query), expected, rtol=1e-5, atol=1e-6)
+    rows = np.array([39, 0, 17, 8, 22, 5, 31, 12, 2], dtype=np.int64)
+    np.testing.assert_allclose(ns._scores(query, rows), expected[rows], rtol=1e-5, atol=1e-6)
+
+
+def test_embeddings_may_be_lists_or_float64(tmp_path, vectors):
+    store = LocalVectorStore(str(tmp_path))
+    chunks = make_chunks(vectors[:3])
+    chunks[0]['embedding'] = chunks[0]['embedding'].tolist()
+    chunks[1]['embedding'] = chunks[1]['embedding'].astype(np.float64)
+    run(store.store_embeddings("ns", chunks))
+    assert top_file(store, vectors[0].tolist()) == ["f0.py"]
+    assert top_file(store, vectors[1]) == ["f1.py"]
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine, select
+
+from app.utils.pagination import MAX_PAGE_SIZE, clamp_limit, decode_cursor, encode_cursor, keyset_before, page_of
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 9, 30, 12, 345678)
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2024, 1, 1), 1)[:-3]])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_clamp_limit():
+    assert clamp_limit(0) == 1
+    assert clamp_limit(20) == 20
+    assert clamp_limit(10_000) == MAX_PAGE_SIZE
+
+
+def test_page_of_returns_a_cursor_only_when_more_rows_exist():
+    rows = [SimpleNamespace(id=i, created_at=datetime(2024, 1, 1) - timedelta(minutes=i)) for i in range(4)]
+    page, cursor = page_of(rows, 3)
+    assert page == rows[:3]
+    assert decode_cursor(cursor) == (rows[2].created_at, 2)
+    assert page_of(rows[:3], 3) == (rows[:3], None)
+    assert page_of([], 3) == ([], None)
+
+
+def test_keyset_pages_walk_every_row_once():
+    metadata = MetaData()
+    messages = Table("messages", metadata, Column("id", Integer, primary_key=True), Column("created_at", DateTime))
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    # Pairs of rows share a timestamp, so the id has to break ties
+    with engine.begin() as conn:
+        conn.execute(messages.insert(), [{"id": i, "created_at": start + timedelta(seconds=i // 2)} for i in range(1, 12)])
+
+    seen, cursor = [], None
+    assert keyset_before(messages.c.created_at, messages.c.id, None) is None
+    with engine.connect() as conn:
+        while True:
+            query = select(messages).order_by(messages.c.created_at.desc(), messages.c.id.desc()).limit(4)
+            condition = keyset_before(messages.c.created_at, messages.c.id, cursor)
+            if condition is not None:
+                query = query.where(condition)
+            page, cursor = page_of(conn.execute(query).all(), 3)
+            seen.extend(row.id for row in page)
+            if cursor is None:
+                break
+
+    assert seen == list(range(11, 0, -1))
@@ -0,0 +1,77 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.query_batcher import QueryBatcher
+
+
+class FakeEncoder:
+    def __init__(self, delay=0.0, error=None):
+        self.calls = []
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_share_one_batch():
+    encoder = FakeEncoder()
+
+    async def scenario():
+        batcher = QueryBatcher(encoder, max_batch_size=8, window_ms=5)
+        return await asyncio.gather(*(batcher.submit(text) for text in ["a", "bb", "a", "cccc"]))
+
+    results = asyncio.run(scenario())
+    assert encoder.calls == [["a", "bb", "cccc"]]
+    assert [row[0] for row in results] == [1.0, 2.0, 1.0, 4.0]
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    encoder = FakeEncoder()
+
+    async def scenario():
+        batcher = QueryBatcher(encoder, max_batch_size=2, window_ms=10_000)
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(text) for text in ["a", "b", "c", "d"])), 1)
+
+    asyncio.run(scenario())
+    assert encoder.calls == [["a", "b"], ["c", "d"]]
+
+
+def test_encode_errors_reach_every_caller():
+    encoder = FakeEncoder(error=ValueError("model failed"))
+
+    async def scenario():
+        batcher = QueryBatcher(encoder, window_ms=1)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+def test_close_cancels_in_flight_batches_and_fails_pending_queries():
+    encoder = FakeEncoder(delay=10)
+
+    async def scenario():
+        batcher = QueryBatcher(encoder, max_batch_size=1, window_ms=10_000)
+        in_flight = asyncio.ensure_future(batcher.submit("a"))
+        await asyncio.sleep(0.01)
+        assert len(batcher._tasks) == 1
+
+        batcher.max_batch_size = 8
+        waiting = asyncio.ensure_future(batcher.submit("b"))
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(batcher.close(), 1)
+
+        assert not batcher._tasks
+        assert in_flight.cancelled()
+        with pytest.raises(RuntimeError):
+            await waiting
+
+    asyncio.run(scenario())
+    assert encoder.calls == [["a"]]
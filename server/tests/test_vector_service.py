@@ -0,0 +1,27 @@
+import pytest
+
+from app.services.vector_service import reciprocal_rank_fusion
+
+
+def hit(file_path, start_line, **extra):
+    return {'file_path': file_path, 'start_line': start_line, 'end_line': start_line + 9, **extra}
+
+
+def test_fusion_rewards_chunks_both_retrievers_found():
+    vector = [hit("a.py", 1, similarity=0.9), hit("b.py", 1, similarity=0.8), hit("c.py", 1, similarity=0.7)]
+    keyword = [hit("c.py", 1, keyword_score=7.5), hit("d.py", 1, keyword_score=3.0)]
+
+    fused = reciprocal_rank_fusion(vector, keyword, k=60)
+
+    assert [(r['file_path'], r['match']) for r in fused] == [
+        ("c.py", "both"), ("a.py", "vector"), ("b.py", "vector"), ("d.py", "keyword"),
+    ]
+    assert fused[0]['fused_score'] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[0]['similarity'] == 0.7
+    assert fused[0]['keyword_score'] == 7.5
+
+
+def test_fusion_keys_chunks_by_file_and_line_range():
+    fused = reciprocal_rank_fusion([hit("a.py", 1)], [hit("a.py", 11)], k=60)
+    assert [(r['start_line'], r['match']) for r in fused] == [(1, "vector"), (11, "keyword")]
+    assert reciprocal_rank_fusion([], [], k=60) == []